@@ -0,0 +1,106 @@
+from datetime import datetime, timezone
+import os
+import time
+import argparse
+import boto3
+from common.metrics import METRICS
+from collector.stub_api import StubSSVApi
+from collector.dynamodb_writer import DEFAULT_MAX_WORKERS
+from collector.records import parse_period
+from ssv_performance_log_dyndb import fetch_and_filter_data, update_dynamodb_performance_data
+
+BENCHMARK_TABLE = 'SSVPerformanceBenchmark'
+
+
+# Starts an in-process DynamoDB backend (moto) and creates the performance table in
+# it. Returns the mock, to be stopped when the benchmark ends.
+def start_dynamodb(table_name):
+    try:
+        from moto import mock_aws
+    except ImportError:
+        raise SystemExit("The benchmark needs moto for its local DynamoDB: pip install 'moto[dynamodb]'")
+
+    # Dummy credentials, so that nothing can reach a real AWS account
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_SESSION_TOKEN'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')
+
+    mock = mock_aws()
+    mock.start()
+    boto3.resource('dynamodb').create_table(
+        TableName=table_name,
+        KeySchema=[{'AttributeName': 'OperatorID', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'OperatorID', 'AttributeType': 'N'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    return mock
+
+
+# Number of DynamoDB requests made by the collector, from the storage metrics
+def write_calls():
+    return sum(stats['pages'] for name, stats in METRICS.summary().items() if name.startswith('collector.'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the collector against a local SSV API stand-in and DynamoDB.')
+    parser.add_argument('--operators', type=int, default=1000,
+                        help='Number of synthetic operators served (default: 1000).')
+    parser.add_argument('-p', '--period', type=parse_period, action='append', dest='periods', metavar='PERIOD[:ATTRIBUTE]',
+                        help='A reporting period to collect, as for ssv_performance_log_dyndb.py (default: 24h and 30d).')
+    parser.add_argument('--page_size', type=int, default=100,
+                        help='The number of items per page for API queries (default: 100).')
+    parser.add_argument('--requests_per_minute', type=float, default=6000,
+                        help='Maximum API request rate (default: 6000, so the stand-in latency dominates).')
+    parser.add_argument('--write_workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f'Number of concurrent DynamoDB writers (default: {DEFAULT_MAX_WORKERS}).')
+    parser.add_argument('--latency_ms', type=float, default=50,
+                        help='Latency added to each API response in milliseconds (default: 50).')
+    parser.add_argument('--throttle_rate', type=float, default=0.0,
+                        help='Share of API requests answered with HTTP 429 (default: 0).')
+    parser.add_argument('--error_rate', type=float, default=0.0,
+                        help='Share of API requests answered with HTTP 500 (default: 0).')
+    parser.add_argument('--retry_after', type=float, default=0.5,
+                        help='Retry-After in seconds sent with HTTP 429 (default: 0.5).')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for the synthetic dataset and injected failures (default: 0).')
+    parser.add_argument('--runs', type=int, default=1,
+                        help='Number of write passes over the same table; later passes update existing items (default: 1).')
+    args = parser.parse_args()
+
+    periods = dict(args.periods or [parse_period('24h'), parse_period('30d')])
+    target_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    stub = StubSSVApi(args.operators, latency=args.latency_ms / 1000, throttle_rate=args.throttle_rate,
+                      error_rate=args.error_rate, retry_after=args.retry_after, seed=args.seed).start()
+    mock = start_dynamodb(BENCHMARK_TABLE)
+
+    try:
+        start = time.perf_counter()
+        operators = fetch_and_filter_data(stub.url(), list(periods), args.page_size, args.requests_per_minute)
+        fetch_time = time.perf_counter() - start
+
+        results = []
+        for run in range(1, max(1, args.runs) + 1):
+            METRICS.reset()
+            start = time.perf_counter()
+            written, failed = update_dynamodb_performance_data(BENCHMARK_TABLE, operators, target_date, periods,
+                                                               overwrite=True, write_workers=args.write_workers)
+            results.append((run, time.perf_counter() - start, written, len(failed), write_calls()))
+    finally:
+        mock.stop()
+        stub.stop()
+
+    print()
+    print(f"Fetch: {len(operators)} operators in {fetch_time:.2f}s ({len(operators) / fetch_time:.1f} operators/s), "
+          f"{stub.requests} API calls ({stub.throttled} throttled, {stub.errors} errors)")
+    for run, write_time, written, failed, calls in results:
+        print(f"Write run {run}: {written} operators in {write_time:.2f}s ({written / write_time:.1f} operators/s), "
+              f"{calls} write calls, {failed} failed")
+
+    total_time = fetch_time + results[0][1]
+    print(f"End to end: {len(operators) / total_time:.1f} operators/s")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,57 @@
+import boto3
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+from common.config import CHECKPOINT_OPERATOR_ID
+from common.metrics import METRICS
+
+
+# Progress of a collector run, stored as an item in the performance table so that an
+# interrupted run can be resumed: the date being collected, the next page to crawl,
+# the number of operators written so far and the IDs of operators that failed. Pages
+# before next_page have been crawled and written.
+class RunCheckpoint:
+
+    def __init__(self, table_name):
+        self.table = boto3.resource('dynamodb').Table(table_name)
+
+
+    # Returns the stored checkpoint as a dict, or None if there is none
+    def load(self):
+        try:
+            response = self.table.get_item(Key={'OperatorID': CHECKPOINT_OPERATOR_ID}, ConsistentRead=True,
+                                           ReturnConsumedCapacity='TOTAL')
+            METRICS.add_response(response)
+        except ClientError as e:
+            print(f"Failed to load checkpoint: {e}")
+            return None
+
+        item = response.get('Item')
+        if not item:
+            return None
+
+        return {
+            'target_date': item['TargetDate'],
+            'next_page': int(item['NextPage']),
+            'written': int(item.get('Written', 0)),
+            'failed': [int(operator_id) for operator_id in item.get('Failed', [])]
+        }
+
+
+    def save(self, target_date, next_page, written, failed):
+        response = self.table.put_item(
+            Item={
+                'OperatorID': CHECKPOINT_OPERATOR_ID,
+                'TargetDate': target_date,
+                'NextPage': next_page,
+                'Written': written,
+                'Failed': list(failed),
+                'Updated': datetime.now(timezone.utc).isoformat()
+            },
+            ReturnConsumedCapacity='TOTAL'
+        )
+        METRICS.add_response(response, write=True)
+
+
+    def delete(self):
+        response = self.table.delete_item(Key={'OperatorID': CHECKPOINT_OPERATOR_ID}, ReturnConsumedCapacity='TOTAL')
+        METRICS.add_response(response, write=True)
\ No newline at end of file
@@ -0,0 +1,361 @@
+import time
+import random
+import threading
+import boto3
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.types import Binary
+from botocore.exceptions import ClientError
+from common.config import WATERMARK_OPERATOR_ID, FIELD_LATEST_DATE_PREFIX, FIELD_WATERMARK_UPDATED
+from common.metrics import METRICS
+from common.hourly_history import HourlyHistory
+
+# Number of threads writing batches concurrently, and operators per batch
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_BATCH_SIZE = 25
+
+# Retry behaviour for throttled or failed writes
+WRITE_MAX_RETRIES = 5
+WRITE_BASE_DELAY = 0.2
+WRITE_RETRYABLE_ERRORS = {
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+    'InternalServerError',
+    'ServiceUnavailable'
+}
+
+# Maximum number of conditional writes per operator when performance maps are missing
+MAP_WRITE_MAX_ATTEMPTS = 3
+
+# Maximum keys per BatchGetItem request
+BATCH_GET_MAX_KEYS = 100
+
+# DynamoDB type descriptors, used to read items returned in low-level format with a
+# failed condition check
+DYNDB_TYPE_DESCRIPTORS = {'S', 'N', 'B', 'SS', 'NS', 'BS', 'M', 'L', 'NULL', 'BOOL'}
+
+
+# An operator update: top-level attributes to set (e.g. Name, ValidatorCount) and
+# the performance value for each performance attribute (e.g. Performance24h) to be
+# stored under the date key
+class OperatorUpdate:
+
+    def __init__(self, operator_id, attributes, performance):
+        self.operator_id = operator_id
+        self.attributes = attributes
+        self.performance = performance
+
+
+# Writes operator performance data to the performance table. Each operator is written
+# with a single update that sets its attributes and the date key in each performance
+# map, conditional on the maps existing. Operators that are new or missing a map take
+# a second conditional write that creates the map. Operators are split into batches,
+# and batches are written concurrently on a bounded thread pool.
+class DynamoDBWriter:
+
+    def __init__(self, table_name, max_workers=DEFAULT_MAX_WORKERS, batch_size=DEFAULT_BATCH_SIZE):
+        self.table_name = table_name
+        self.max_workers = max(1, max_workers)
+        self.batch_size = max(1, batch_size)
+        self._local = threading.local()
+
+
+    # boto3 resources are not thread safe, so each writer thread gets its own
+    @property
+    def table(self):
+        if not hasattr(self._local, 'table'):
+            self._local.table = boto3.session.Session().resource('dynamodb').Table(self.table_name)
+        return self._local.table
+
+
+    # Writes all updates and returns the number written and the IDs of operators
+    # that could not be written. Failures are reported but do not stop other writes.
+    def write_operators(self, updates, date_key, overwrite=False):
+        def write(update):
+            with METRICS.measure('collector.write_operator'):
+                self.write_operator(update, date_key, overwrite)
+            return True
+
+        written, _, failed, batches = self._run_batches(list(updates), write, lambda update: f"operator {update.operator_id}",
+                                                      lambda update: update.operator_id)
+
+        print(f"Wrote {written} operators in {batches} batches, {len(failed)} failed")
+        return written, failed
+
+
+    # Runs update_item with each dict of arguments in updates, concurrently in batches.
+    # Returns the number of items updated, the number skipped because their condition
+    # failed, and the keys of items that could not be updated.
+    def update_items(self, updates, operation='collector.update_item'):
+        def update_item(kwargs):
+            with METRICS.measure(operation):
+                try:
+                    self._update(**kwargs)
+                    return True
+                except ClientError as e:
+                    if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                        return False
+                    raise
+
+        written, skipped, failed, _ = self._run_batches(list(updates), update_item, lambda kwargs: f"item {kwargs['Key']}",
+                                                  lambda kwargs: kwargs['Key'])
+        return written, skipped, failed
+
+
+    # Sets the value for one hour in the hourly history attribute of each operator in
+    # values, a dict of operator IDs to performance values. The current histories are
+    # read with BatchGetItem, and each operator is written with an update conditional on
+    # its history being unchanged; if another writer got there first, the history
+    # returned with the failed condition is used for the next attempt. Operators without
+    # an item, i.e. never written by a daily run, are skipped rather than created with
+    # only an hourly history. Returns the number of operators written, the number
+    # skipped as already holding the value or without an item, and the IDs of operators
+    # that could not be written.
+    def write_hourly(self, values, hour, attribute_name):
+        histories = self._read_attribute(list(values), attribute_name)
+
+        def write(operator_id):
+            with METRICS.measure('collector.write_hourly'):
+                return self._write_history(operator_id, attribute_name, hour, values[operator_id],
+                                           histories.get(operator_id))
+
+        written, skipped, failed, batches = self._run_batches(sorted(values), write, lambda op_id: f"operator {op_id}",
+                                                              lambda op_id: op_id)
+
+        print(f"Wrote {attribute_name} for {written} operators in {batches} batches, {skipped} skipped, {len(failed)} failed")
+        return written, skipped, failed
+
+
+    def _write_history(self, operator_id, attribute_name, hour, value, current):
+        for attempt in range(MAP_WRITE_MAX_ATTEMPTS):
+            try:
+                history = HourlyHistory.decode(current)
+            except ValueError:
+                history = HourlyHistory()
+            if not history.set(hour, value):
+                return False
+
+            encoded = history.encode()
+            if encoded == current:
+                return False
+
+            kwargs = {
+                'Key': {'OperatorID': operator_id},
+                'UpdateExpression': 'SET #h = :history',
+                'ExpressionAttributeNames': {'#h': attribute_name},
+                'ExpressionAttributeValues': {':history': encoded},
+                'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+            }
+            if current is None:
+                kwargs['ConditionExpression'] = ('attribute_exists(OperatorID) AND '
+                                                 '(attribute_not_exists(#h) OR NOT attribute_type(#h, :binary_type))')
+                kwargs['ExpressionAttributeValues'][':binary_type'] = 'B'
+            else:
+                kwargs['ConditionExpression'] = 'attribute_exists(OperatorID) AND #h = :current'
+                kwargs['ExpressionAttributeValues'][':current'] = current
+
+            try:
+                self._update(**kwargs)
+                return True
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                if not e.response.get('Item'):
+                    return False
+                if attempt == MAP_WRITE_MAX_ATTEMPTS - 1:
+                    raise
+                current = e.response['Item'].get(attribute_name, {}).get('B')
+
+
+    # Returns a dict of operator IDs to the binary value of an attribute, for the
+    # operators that have it, read in chunks of BATCH_GET_MAX_KEYS keys. Values of
+    # any other type are left out, and are replaced when written.
+    def _read_attribute(self, operator_ids, attribute_name):
+        client = self.table.meta.client
+        values = {}
+
+        for start in range(0, len(operator_ids), BATCH_GET_MAX_KEYS):
+            keys = [{'OperatorID': op_id} for op_id in operator_ids[start:start + BATCH_GET_MAX_KEYS]]
+            request_items = {self.table_name: {
+                'Keys': keys,
+                'ProjectionExpression': 'OperatorID, #h',
+                'ExpressionAttributeNames': {'#h': attribute_name}
+            }}
+
+            for attempt in range(WRITE_MAX_RETRIES + 1):
+                with METRICS.measure('collector.read_hourly'):
+                    response = client.batch_get_item(RequestItems=request_items, ReturnConsumedCapacity='TOTAL')
+                    METRICS.add_response(response)
+
+                for item in response.get('Responses', {}).get(self.table_name, []):
+                    value = item.get(attribute_name)
+                    if isinstance(value, Binary):
+                        values[int(item['OperatorID'])] = value.value
+
+                request_items = response.get('UnprocessedKeys')
+                if not request_items:
+                    break
+                if attempt == WRITE_MAX_RETRIES:
+                    raise ClientError({'Error': {'Code': 'UnprocessedKeys', 'Message': 'Keys still unprocessed after retries'}},
+                                      'BatchGetItem')
+                time.sleep(WRITE_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+        return values
+
+
+    # Splits items into batches and runs write(item) for each on the thread pool. write
+    # returns False for items it skipped. Returns the number written, the number
+    # skipped, the keys of the items that raised and the number of batches.
+    def _run_batches(self, items, write, describe, key):
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+        written = skipped = 0
+        failed = []
+
+        def run(batch):
+            batch_written = batch_skipped = 0
+            batch_failed = []
+
+            for item in batch:
+                try:
+                    if write(item):
+                        batch_written += 1
+                    else:
+                        batch_skipped += 1
+                except Exception as e:
+                    print(f"Failed to write {describe(item)}: {e}")
+                    batch_failed.append(key(item))
+
+            return batch_written, batch_skipped, batch_failed
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for batch_written, batch_skipped, batch_failed in executor.map(run, batches):
+                written += batch_written
+                skipped += batch_skipped
+                failed.extend(batch_failed)
+
+        return written, skipped, failed, len(batches)
+
+
+    # Writes one operator. The first write assumes all performance maps exist. If the
+    # condition fails, the item returned with the failure shows which maps are missing,
+    # and the next write creates those maps with the date key already set.
+    def write_operator(self, update, date_key, overwrite=False):
+        existing_maps = set(update.performance)
+
+        for attempt in range(MAP_WRITE_MAX_ATTEMPTS):
+            try:
+                self._update(**self._build_update(update, date_key, overwrite, existing_maps))
+                return
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException' or attempt == MAP_WRITE_MAX_ATTEMPTS - 1:
+                    raise
+                old_item = e.response.get('Item') or {}
+                existing_maps = {attribute for attribute in update.performance if self._is_map(old_item.get(attribute))}
+
+
+    # Builds update_item arguments setting the operator attributes and the date key in
+    # each performance map. Maps in existing_maps are updated in place; others are
+    # created (or replaced, if not a map) with the date key as their only entry.
+    @staticmethod
+    def _build_update(update, date_key, overwrite, existing_maps):
+        set_clauses = []
+        conditions = []
+        names = {}
+        values = {':map_type': 'M'}
+
+        for i, (attribute, value) in enumerate(update.attributes.items()):
+            names[f'#a{i}'] = attribute
+            values[f':a{i}'] = value
+            set_clauses.append(f'#a{i} = :a{i}')
+
+        for i, (attribute, value) in enumerate(update.performance.items()):
+            names[f'#p{i}'] = attribute
+
+            if attribute in existing_maps:
+                names['#date'] = date_key
+                values[f':p{i}'] = value
+                if overwrite:
+                    set_clauses.append(f'#p{i}.#date = :p{i}')
+                else:
+                    set_clauses.append(f'#p{i}.#date = if_not_exists(#p{i}.#date, :p{i})')
+                conditions.append(f'attribute_type(#p{i}, :map_type)')
+            else:
+                values[f':m{i}'] = {date_key: value}
+                set_clauses.append(f'#p{i} = :m{i}')
+                conditions.append(f'(attribute_not_exists(#p{i}) OR NOT attribute_type(#p{i}, :map_type))')
+
+        kwargs = {
+            'Key': {'OperatorID': update.operator_id},
+            'UpdateExpression': 'SET ' + ', '.join(set_clauses),
+            'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': values
+        }
+        if conditions:
+            kwargs['ConditionExpression'] = ' AND '.join(conditions)
+            kwargs['ReturnValuesOnConditionCheckFailure'] = 'ALL_OLD'
+        else:
+            del values[':map_type']
+
+        return kwargs
+
+
+    # Records the latest date written for each attribute in the watermark item, so that
+    # readers can find the latest data date without scanning the table. The date only
+    # moves forward. The update timestamp changes on every run unless touch_updated is
+    # False, as for hourly runs, which leave the daily data unchanged.
+    def update_watermark(self, attribute_names, date_key, touch_updated=True):
+        for attribute_name in attribute_names:
+            try:
+                self._update(
+                    Key={'OperatorID': WATERMARK_OPERATOR_ID},
+                    UpdateExpression='SET #latest = :date',
+                    ConditionExpression='attribute_not_exists(#latest) OR #latest <= :date',
+                    ExpressionAttributeNames={'#latest': FIELD_LATEST_DATE_PREFIX + attribute_name},
+                    ExpressionAttributeValues={':date': date_key}
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    print(f"Failed to update latest date watermark for {attribute_name}: {e}")
+
+        if not touch_updated:
+            return
+
+        try:
+            self._update(
+                Key={'OperatorID': WATERMARK_OPERATOR_ID},
+                UpdateExpression='SET #updated = :updated',
+                ExpressionAttributeNames={'#updated': FIELD_WATERMARK_UPDATED},
+                ExpressionAttributeValues={':updated': datetime.now(timezone.utc).isoformat()}
+            )
+        except ClientError as e:
+            print(f"Failed to update watermark timestamp: {e}")
+
+
+    # update_item with consumed capacity reporting and retries for throttled requests.
+    # Failed requests are reported too, as a failed condition check still consumes
+    # write capacity.
+    def _update(self, **kwargs):
+        for attempt in range(WRITE_MAX_RETRIES + 1):
+            try:
+                response = self.table.update_item(ReturnConsumedCapacity='TOTAL', **kwargs)
+                METRICS.add_response(response, write=True)
+                return response
+            except ClientError as e:
+                METRICS.add_response({'ConsumedCapacity': e.response.get('ConsumedCapacity')}, write=True)
+                if e.response['Error']['Code'] not in WRITE_RETRYABLE_ERRORS or attempt == WRITE_MAX_RETRIES:
+                    raise
+                time.sleep(WRITE_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+    # True if an item attribute is a map, whether in resource format (dict) or the
+    # low-level format returned with failed condition checks ({'M': {...}})
+    @staticmethod
+    def _is_map(value):
+        if not isinstance(value, dict):
+            return False
+        if len(value) == 1:
+            (key,) = value
+            if key in DYNDB_TYPE_DESCRIPTORS:
+                return key == 'M'
+        return True
\ No newline at end of file
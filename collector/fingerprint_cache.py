@@ -0,0 +1,108 @@
+import os
+import json
+from .dynamodb_writer import OperatorUpdate
+
+# Operator attribute holding the date the operator was last written
+LAST_UPDATED = 'last_updated'
+
+# Local record of what the collector last wrote for each operator: the operator
+# attributes and, for each performance attribute, the latest date and value written.
+# Used to drop unchanged attributes from updates, and to skip operators with nothing
+# to write. last_updated is written whenever it advances, even if nothing else
+# changed, as cleanup of outdated records reads it from the table. The cache also
+# keeps the date each operator was last written. The cache file is JSON, keyed by
+# operator ID, and belongs to one table.
+#
+# The cache only reflects writes made through it. Operators changed by other writes
+# must be forgotten, and the file removed if the table is changed by anything else.
+class FingerprintCache:
+
+    def __init__(self, path, table_name):
+        self.path = path
+        self.table_name = table_name
+        self.operators = {}
+
+        self.skipped_operators = 0
+        self.skipped_attributes = 0
+
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as file:
+                    data = json.load(file)
+                if data.get('table') == table_name:
+                    self.operators = data.get('operators', {})
+                else:
+                    print(f"Ignoring fingerprint cache {path} for table {data.get('table')}")
+            except (OSError, ValueError) as e:
+                print(f"Unable to read fingerprint cache {path}: {e}")
+
+
+    # Returns an OperatorUpdate holding only the attributes and performance values
+    # that differ from the last write, plus last_updated if it is later than the last
+    # written, or None if there is nothing to write. Without overwrite, a performance
+    # value is never rewritten once its date is written.
+    def filter_update(self, update, date_key, overwrite=False):
+        entry = self.operators.get(str(update.operator_id), {})
+        cached_attributes = entry.get('attributes', {})
+        cached_performance = entry.get('performance', {})
+
+        attributes = {name: value for name, value in update.attributes.items()
+                      if name != LAST_UPDATED and cached_attributes.get(name) != self._fingerprint(value)}
+        if LAST_UPDATED in update.attributes and update.attributes[LAST_UPDATED] > entry.get(LAST_UPDATED, ''):
+            attributes[LAST_UPDATED] = update.attributes[LAST_UPDATED]
+
+        performance = {}
+        for attribute, value in update.performance.items():
+            cached_date, cached_value = cached_performance.get(attribute, (None, None))
+            if cached_date != date_key or (overwrite and cached_value != self._fingerprint(value)):
+                performance[attribute] = value
+
+        self.skipped_attributes += len(update.attributes) - len(attributes) + len(update.performance) - len(performance)
+
+        if not attributes and not performance:
+            self.skipped_operators += 1
+            return None
+
+        return OperatorUpdate(update.operator_id, attributes, performance)
+
+
+    # Records a successful write of update for date_key
+    def record(self, update, date_key):
+        entry = self.operators.setdefault(str(update.operator_id), {'attributes': {}, 'performance': {}})
+        entry['last_seen'] = max(entry.get('last_seen', date_key), date_key)
+
+        for name, value in update.attributes.items():
+            if name == LAST_UPDATED:
+                entry[LAST_UPDATED] = max(entry.get(LAST_UPDATED, value), value)
+            else:
+                entry['attributes'][name] = self._fingerprint(value)
+
+        for attribute, value in update.performance.items():
+            cached_date, _ = entry['performance'].get(attribute, (None, None))
+            if cached_date is None or cached_date <= date_key:
+                entry['performance'][attribute] = [date_key, self._fingerprint(value)]
+
+
+    # Returns whether the operator was written on or after date_key
+    def seen_since(self, operator_id, date_key):
+        return self.operators.get(str(operator_id), {}).get('last_seen', '') >= date_key
+
+
+    # Drops the cached entry for an operator changed outside the cache
+    def forget(self, operator_id):
+        self.operators.pop(str(operator_id), None)
+
+
+    # Writes the cache to a temporary file and renames it over the cache file
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump({'table': self.table_name, 'operators': self.operators}, file)
+        os.replace(tmp_path, self.path)
+
+
+    # Values are compared as their type and string form, so that Decimal, int and bool
+    # values survive the JSON round trip and 1 is not mistaken for True
+    @staticmethod
+    def _fingerprint(value):
+        return f"{type(value).__name__}:{value}"
\ No newline at end of file
@@ -0,0 +1,124 @@
+import queue
+import threading
+
+# Number of items buffered between the producer thread and the consumer
+DEFAULT_QUEUE_SIZE = 2
+
+
+class _End:
+
+    def __init__(self, error=None):
+        self.error = error
+
+
+# Iterates over iterable on a background thread and yields its items through a
+# bounded queue, so that producing the next items (e.g. fetching API pages) overlaps
+# with consuming the current one (e.g. writing it to DynamoDB). The producer blocks
+# once maxsize items are waiting. Errors raised by the producer are re-raised in the
+# consumer. If the consumer stops early, the producer is stopped and iterable closed.
+def prefetch(iterable, maxsize=DEFAULT_QUEUE_SIZE):
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        error = None
+        try:
+            for item in iterable:
+                if not put(item):
+                    break
+        except Exception as e:
+            error = e
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+        put(_End(error))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = items.get()
+            if isinstance(item, _End):
+                if item.error is not None:
+                    raise item.error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+# Delivers each record to several sinks (see collector.sinks). Every sink has its own
+# bounded queue and thread, so a slow sink only holds back the crawl once its queue is
+# full, and records are passed to sink.write_batch in batches of sink.batch_size. A
+# sink that raises is reported and dropped; the other sinks carry on.
+class FanOut:
+
+    def __init__(self, sinks, maxsize=DEFAULT_QUEUE_SIZE):
+        self.sinks = list(sinks)
+        self.errors = {}
+        self._queues = [queue.Queue(maxsize=maxsize) for _ in self.sinks]
+        self._batches = [[] for _ in self.sinks]
+        self._threads = [threading.Thread(target=self._consume, args=(sink, items), daemon=True)
+                         for sink, items in zip(self.sinks, self._queues)]
+        for thread in self._threads:
+            thread.start()
+
+
+    # Queues a record for every sink still running
+    def write(self, record):
+        for i, sink in enumerate(self.sinks):
+            if sink.name in self.errors:
+                continue
+            batch = self._batches[i]
+            batch.append(record)
+            if len(batch) >= sink.batch_size:
+                self._queues[i].put(batch)
+                self._batches[i] = []
+
+
+    # Flushes the remaining records, closes every sink and waits for them to finish.
+    # Returns the sinks that failed, mapped to their error.
+    def close(self):
+        for i, items in enumerate(self._queues):
+            if self._batches[i]:
+                items.put(self._batches[i])
+                self._batches[i] = []
+            items.put(_End())
+
+        for thread in self._threads:
+            thread.join()
+        return self.errors
+
+
+    def _consume(self, sink, items):
+        failed = False
+        while True:
+            batch = items.get()
+            if isinstance(batch, _End):
+                break
+            if failed:
+                continue
+            try:
+                sink.write_batch(batch)
+            except Exception as e:
+                print(f"{sink.name} failed: {e}")
+                self.errors[sink.name] = e
+                failed = True
+
+        if not failed:
+            try:
+                sink.close()
+            except Exception as e:
+                print(f"{sink.name} failed to close: {e}")
+                self.errors[sink.name] = e
\ No newline at end of file
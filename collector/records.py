@@ -0,0 +1,34 @@
+import argparse
+from decimal import Decimal
+from common.config import *
+
+
+# Parses PERIOD[:ATTRIBUTE] command line values, e.g. 24h:Performance24h. The
+# attribute defaults to the one configured for the period.
+def parse_period(value):
+    time_period, _, attribute_name = value.partition(':')
+    if time_period not in PERFORMANCE_PERIOD_FIELDS:
+        raise argparse.ArgumentTypeError(f"unknown period {time_period}, expected one of {', '.join(PERFORMANCE_PERIOD_FIELDS)}")
+    return time_period, attribute_name or PERFORMANCE_PERIOD_FIELDS[time_period]
+
+
+# Converts an operator from the SSV API into a record in the same shape as the rows
+# returned by the storage layer, with a single date in each performance attribute.
+# periods maps SSV API reporting periods to performance attributes. Performance is
+# converted from a percentage to a Decimal fraction.
+def normalize_operator(op, periods, target_date):
+    record = {
+        FIELD_OPERATOR_ID: int(op["id"]),
+        FIELD_OPERATOR_NAME: op.get("name", ""),
+        FIELD_IS_VO: op.get("type", "") == "verified_operator",
+        FIELD_IS_PRIVATE: bool(op.get("is_private", False)),
+        FIELD_VALIDATOR_COUNT: int(op.get("validators_count") or 0),
+        FIELD_ADDRESS: op.get("owner_address", "")
+    }
+
+    performance = op.get("performance") or {}
+    for time_period, attribute_name in periods.items():
+        value = performance.get(time_period)
+        record[attribute_name] = {} if value is None else {target_date: Decimal(str(value)) / Decimal(100)}
+
+    return record
\ No newline at end of file
@@ -0,0 +1,232 @@
+import os
+import csv
+from typing import List, Dict, Any
+from common.config import *
+from .dynamodb_writer import DynamoDBWriter, OperatorUpdate, DEFAULT_MAX_WORKERS
+
+
+# Destination for normalized operator records (see collector.records). Sinks receive
+# records in batches of up to batch_size from their own thread, and close() is
+# called once after the last batch.
+class Sink:
+    name = 'sink'
+    batch_size = 100
+
+    def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+# Writes records to the DynamoDB performance table with one conditional update per
+# operator, then updates the latest date watermark for the attributes written
+class DynamoDBSink(Sink):
+    name = 'DynamoDB'
+
+    def __init__(self, table_name, target_date, attributes, overwrite=False, write_workers=DEFAULT_MAX_WORKERS,
+                 fingerprint_cache=None):
+        self.writer = DynamoDBWriter(table_name, max_workers=write_workers)
+        self.target_date = target_date
+        self.attributes = attributes
+        self.overwrite = overwrite
+        self.fingerprint_cache = fingerprint_cache
+        self.written = 0
+        self.failed = []
+
+
+    def write_batch(self, records):
+        updates = [self._operator_update(record) for record in records]
+
+        if self.fingerprint_cache:
+            updates = [update for update in (self.fingerprint_cache.filter_update(update, self.target_date, self.overwrite)
+                                             for update in updates) if update]
+
+        written, failed = self.writer.write_operators(updates, self.target_date, self.overwrite)
+        self.written += written
+        self.failed.extend(failed)
+
+        if self.fingerprint_cache:
+            failed_ids = set(failed)
+            for update in updates:
+                if update.operator_id not in failed_ids:
+                    self.fingerprint_cache.record(update, self.target_date)
+
+
+    def close(self):
+        if self.fingerprint_cache:
+            self.fingerprint_cache.save()
+        self.writer.update_watermark(self.attributes, self.target_date)
+        print(f"DynamoDB: wrote {self.written} operators, {len(self.failed)} failed")
+
+
+    def _operator_update(self, record):
+        return OperatorUpdate(
+            record[FIELD_OPERATOR_ID],
+            {
+                'Name': record[FIELD_OPERATOR_NAME],
+                'ValidatorCount': record[FIELD_VALIDATOR_COUNT],
+                'isVO': 1 if record[FIELD_IS_VO] else 0,
+                'Address': record[FIELD_ADDRESS],
+                'isPrivate': record[FIELD_IS_PRIVATE],
+                'last_updated': self.target_date
+            },
+            {attribute: record[attribute][self.target_date] for attribute in self.attributes
+             if self.target_date in record.get(attribute, {})}
+        )
+
+
+# Imports records into a local SQLite database (see storage.storage_sqlite)
+class SQLiteSink(Sink):
+    name = 'SQLite'
+    batch_size = 500
+
+    def __init__(self, database, target_date):
+        from storage.storage_sqlite import SQLiteStorage
+        self.storage = SQLiteStorage(database=database)
+        self.target_date = target_date
+        self.written = 0
+
+
+    def write_batch(self, records):
+        self.storage.import_performance_data({record[FIELD_OPERATOR_ID]: record for record in records},
+                                             last_updated=self.target_date)
+        self.written += len(records)
+
+
+    def close(self):
+        self.storage.connection.close()
+        print(f"SQLite: imported {self.written} operators into {self.storage.database}")
+
+
+# Adds a column for the target date to a CSV file in the format kept by
+# ssv_performance_log.py: operator ID, name, validator count, then one column of
+# performance per date. Only operators already listed in an existing file are
+# updated; a new file lists every operator.
+class CSVSink(Sink):
+    name = 'CSV'
+    batch_size = 1000
+
+    COL_HEADER_ID = 'ID'
+    COL_HEADER_NAME = 'Name'
+    COL_HEADER_VALIDATOR_COUNT = 'Validator Count'
+
+    def __init__(self, path, attribute, target_date):
+        self.path = path
+        self.attribute = attribute
+        self.target_date = target_date
+        self.name = f"CSV {path}"
+        self.operators = {}
+
+
+    def write_batch(self, records):
+        for record in records:
+            value = record.get(self.attribute, {}).get(self.target_date)
+            self.operators[record[FIELD_OPERATOR_ID]] = (
+                record[FIELD_OPERATOR_NAME],
+                record[FIELD_VALIDATOR_COUNT],
+                '' if value is None else "{:.2%}".format(value)
+            )
+
+
+    def close(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, 'r', newline='') as file:
+                data = list(csv.reader(file))
+            header, rows = data[0], data[1:]
+        else:
+            header = [self.COL_HEADER_ID, self.COL_HEADER_NAME, self.COL_HEADER_VALIDATOR_COUNT]
+            rows = [[str(op_id)] for op_id in sorted(self.operators)]
+
+        if self.target_date in header:
+            date_index = header.index(self.target_date)
+        else:
+            header.append(self.target_date)
+            date_index = len(header) - 1
+
+        for row in rows:
+            row.extend([''] * (len(header) - len(row)))
+            name, validator_count, performance = self.operators.get(int(row[0]), (None, None, ''))
+            if name is not None:
+                row[1] = name
+                row[2] = validator_count
+            row[date_index] = performance
+
+        rows.sort(key=lambda row: int(row[0]))
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', newline='') as file:
+            csv.writer(file).writerows([header] + rows)
+        os.replace(tmp_path, self.path)
+        print(f"CSV: updated {len(rows)} operators in {self.path}")
+
+
+# Sets the target date column of a Google Sheet worksheet in the layout written by
+# update_google_sheet.py (operator details, then one column per date, newest first),
+# without reading the performance history back from DynamoDB. Operators not yet in
+# the worksheet are added, and the worksheet is cleared and rewritten in full.
+class GoogleSheetSink(Sink):
+    name = 'Google Sheets'
+    batch_size = 1000
+
+    HEADER = ['OperatorID', 'Name', 'isVO', 'isPrivate', 'ValidatorCount', 'Address']
+
+    def __init__(self, credentials_file, document, worksheet, attribute, target_date):
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+
+        scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+        credentials = ServiceAccountCredentials.from_json_keyfile_name(credentials_file, scope)
+        self.worksheet = gspread.authorize(credentials).open(document).worksheet(worksheet)
+        self.attribute = attribute
+        self.target_date = target_date
+        self.name = f"Google Sheets {document}/{worksheet}"
+        self.records = {}
+
+
+    def write_batch(self, records):
+        for record in records:
+            self.records[record[FIELD_OPERATOR_ID]] = record
+
+
+    def close(self):
+        values = self.worksheet.get_all_values()
+        header = values[0] if values else list(self.HEADER)
+        rows = values[1:]
+        details = len(self.HEADER)
+
+        if self.target_date not in header:
+            header.insert(details, self.target_date)
+            for row in rows:
+                row.insert(details, '')
+        date_index = header.index(self.target_date)
+
+        rows_by_id = {}
+        for row in rows:
+            row.extend([''] * (len(header) - len(row)))
+            try:
+                rows_by_id[int(row[0])] = row
+            except ValueError:
+                continue
+
+        for op_id, record in self.records.items():
+            row = rows_by_id.get(op_id)
+            if row is None:
+                row = [''] * len(header)
+                rows_by_id[op_id] = row
+            row[:details] = [
+                op_id,
+                record[FIELD_OPERATOR_NAME],
+                1 if record[FIELD_IS_VO] else 0,
+                1 if record[FIELD_IS_PRIVATE] else 0,
+                record[FIELD_VALIDATOR_COUNT],
+                record[FIELD_ADDRESS]
+            ]
+            value = record.get(self.attribute, {}).get(self.target_date)
+            row[date_index] = None if value is None else float(value)
+
+        # Clear the worksheet first, as update_google_sheet.py does, so that no cells are
+        # left beyond the rows and columns written
+        spreadsheet = [header] + [rows_by_id[op_id] for op_id in sorted(rows_by_id)]
+        self.worksheet.clear()
+        self.worksheet.update(values=spreadsheet, range_name='A1', value_input_option='USER_ENTERED')
+        print(f"Google Sheets: updated {len(self.records)} operators in {self.name}")
\ No newline at end of file
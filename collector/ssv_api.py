@@ -0,0 +1,165 @@
+import time
+import random
+import threading
+import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+# Default request rate limit for the SSV API
+REQUESTS_PER_MINUTE = 10
+
+# Number of pages fetched concurrently
+DEFAULT_MAX_WORKERS = 4
+
+# Retry behaviour for rate limited (429) and failed (5xx, connection error) requests
+API_MAX_RETRIES = 5
+API_BASE_DELAY = 2.0
+API_MAX_DELAY = 60.0
+API_REQUEST_TIMEOUT = 30
+
+API_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+# Thread-safe token bucket. Tokens are added at rate_per_minute up to burst tokens;
+# acquire() blocks until a token is available.
+class TokenBucket:
+
+    def __init__(self, rate_per_minute, burst=1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+# Client for the paginated SSV API operators endpoint. Pages are fetched concurrently
+# on a thread pool under a shared token bucket, over a single pooled HTTP session
+# (keep-alive, gzip). Rate limited and failed requests are retried with exponential
+# backoff, honouring Retry-After.
+#
+# base_url is the operators URL including any query string, e.g.
+# https://api.ssv.network/api/v4/mainnet/operators/?validatorsCount=true
+class SSVApiClient:
+
+    def __init__(self, base_url, page_size=100, requests_per_minute=REQUESTS_PER_MINUTE,
+                 max_workers=DEFAULT_MAX_WORKERS, burst=None):
+        self.base_url = base_url
+        self.page_size = page_size
+        self.max_workers = max(1, max_workers)
+        self.limiter = TokenBucket(requests_per_minute, burst if burst is not None else self.max_workers)
+
+        self.session = requests.Session()
+        self.session.headers.update({'Accept': 'application/json', 'Accept-Encoding': 'gzip, deflate'})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+
+
+    # Returns the decoded JSON response for one page of operators
+    def fetch_page(self, page):
+        params = {'page': page, 'perPage': self.page_size}
+
+        for attempt in range(API_MAX_RETRIES + 1):
+            self.limiter.acquire()
+            with self._stats_lock:
+                self.requests += 1
+
+            try:
+                response = self.session.get(self.base_url, params=params, timeout=API_REQUEST_TIMEOUT)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == API_MAX_RETRIES:
+                    raise
+                delay = self._backoff_delay(attempt)
+                print(f"Request for page {page} failed ({e}), retrying in {delay:.1f}s")
+            else:
+                if response.status_code not in API_RETRYABLE_STATUS or attempt == API_MAX_RETRIES:
+                    response.raise_for_status()
+                    return response.json()
+                delay = self._retry_after(response) or self._backoff_delay(attempt)
+                print(f"Page {page} returned HTTP {response.status_code}, retrying in {delay:.1f}s")
+
+            with self._stats_lock:
+                self.retries += 1
+            time.sleep(delay)
+
+
+    # Yields (page number, operators) for every page from start_page onwards, in page
+    # order. The first page is fetched alone to read the page count from its pagination
+    # block; the remaining pages are fetched concurrently, a few pages ahead. Without a
+    # page count, pages are fetched one at a time until an empty page is returned.
+    def iter_pages(self, start_page=1):
+        data = self.fetch_page(start_page)
+        operators = data.get('operators') or []
+        if not operators:
+            return
+        yield start_page, operators
+
+        pages = (data.get('pagination') or {}).get('pages')
+        if not pages:
+            page = start_page + 1
+            while True:
+                operators = self.fetch_page(page).get('operators') or []
+                if not operators:
+                    return
+                yield page, operators
+                page += 1
+
+        # At most max_workers pages are in flight or waiting to be consumed at a time
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+            next_page = start_page + 1
+            try:
+                while pending or next_page <= pages:
+                    while next_page <= pages and len(pending) < self.max_workers:
+                        pending.append((next_page, executor.submit(self.fetch_page, next_page)))
+                        next_page += 1
+
+                    page, future = pending.popleft()
+                    operators = future.result().get('operators') or []
+                    if operators:
+                        yield page, operators
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+
+    # Returns all operators from all pages
+    def fetch_operators(self):
+        return [op for _, operators in self.iter_pages() for op in operators]
+
+
+    def close(self):
+        self.session.close()
+
+
+    @staticmethod
+    def _retry_after(response):
+        try:
+            return min(API_MAX_DELAY, max(0.0, float(response.headers.get('Retry-After', ''))))
+        except ValueError:
+            return None
+
+
+    @staticmethod
+    def _backoff_delay(attempt):
+        return min(API_MAX_DELAY, API_BASE_DELAY * (2 ** attempt)) * random.uniform(0.5, 1.0)
\ No newline at end of file
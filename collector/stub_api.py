@@ -0,0 +1,147 @@
+import json
+import time
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Path of the operators endpoint served by the stand-in, as on api.ssv.network
+STUB_OPERATORS_PATH = '/api/v4/{network}/operators/'
+
+# Share of synthetic operators that are verified, private or have no validators
+STUB_VO_SHARE = 0.3
+STUB_PRIVATE_SHARE = 0.1
+STUB_INACTIVE_SHARE = 0.2
+
+
+# Local stand-in for the SSV API operators endpoint, serving a synthetic dataset with
+# the same paging contract (page, perPage, pagination.pages). Latency, rate limiting
+# (HTTP 429 with Retry-After) and server errors (HTTP 500) can be injected, at random
+# with a fixed seed so runs are repeatable. Counts the requests served.
+#
+# stub = StubSSVApi(operators=5000, latency=0.05, throttle_rate=0.1).start()
+# client = SSVApiClient(stub.url('mainnet'))
+class StubSSVApi:
+
+    def __init__(self, operators=1000, latency=0.0, throttle_rate=0.0, error_rate=0.0, retry_after=0.5,
+                 seed=0, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.operators = self._generate_operators(operators, random.Random(seed))
+
+        self._random = random.Random(seed + 1)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+    # Operators URL for a network, with the query string used by the collectors
+    def url(self, network='mainnet'):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{STUB_OPERATORS_PATH.format(network=network)}?validatorsCount=true"
+
+
+    # Returns the status code for the next request: 200, or an injected 429 or 500
+    def _next_status(self):
+        with self._lock:
+            self.requests += 1
+            roll = self._random.random()
+            if roll < self.throttle_rate:
+                self.throttled += 1
+                return 429
+            if roll < self.throttle_rate + self.error_rate:
+                self.errors += 1
+                return 500
+            return 200
+
+
+    def _page(self, page, per_page):
+        pages = max(1, -(-len(self.operators) // per_page))
+        start = (page - 1) * per_page
+        return {
+            'operators': self.operators[start:start + per_page] if page >= 1 else [],
+            'pagination': {'total': len(self.operators), 'pages': pages, 'page': page, 'per_page': per_page}
+        }
+
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if not url.path.rstrip('/').endswith('/operators'):
+                    self._send(404, {'error': 'not found'})
+                    return
+
+                query = parse_qs(url.query)
+                try:
+                    page = int(query.get('page', ['1'])[0])
+                    per_page = int(query.get('perPage', ['10'])[0])
+                except ValueError:
+                    self._send(400, {'error': 'invalid paging parameters'})
+                    return
+
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                status = stub._next_status()
+                if status == 429:
+                    self._send(429, {'error': 'rate limited'}, {'Retry-After': str(stub.retry_after)})
+                elif status == 500:
+                    self._send(500, {'error': 'internal error'})
+                else:
+                    self._send(200, stub._page(page, max(1, per_page)))
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+    # Synthetic operators in the shape returned by the SSV API
+    @staticmethod
+    def _generate_operators(count, rng):
+        operators = []
+        for op_id in range(1, count + 1):
+            active = rng.random() >= STUB_INACTIVE_SHARE
+            operators.append({
+                'id': op_id,
+                'name': f"Operator {op_id}",
+                'type': 'verified_operator' if rng.random() < STUB_VO_SHARE else 'operator',
+                'is_private': rng.random() < STUB_PRIVATE_SHARE,
+                'validators_count': rng.randint(1, 500) if active else 0,
+                'owner_address': f"0x{rng.getrandbits(160):040x}",
+                'performance': {period: round(rng.uniform(90, 100), 4) if active else 0
+                                for period in ('1h', '24h', '30d', '90d')}
+            })
+        return operators
\ No newline at end of file
@@ -1,6 +1,36 @@
 MAX_DISCORD_MESSAGE_LENGTH = 1800
 
 DYNDB_SUB_TABLE = 'SSVPerformanceSubscriptions'
+DYNDB_SUB_TYPE_INDEX = 'SubscriptionType-index'
+
+# Performance table GSI with partition key isVO (Number) and sort key last_updated
+# (String), used by the collector to find operators that are no longer reported
+DYNDB_PERF_STALENESS_INDEX = 'isVO-last_updated-index'
+
+# Maximum age, in seconds, of the in-memory subscription indexes before they are reloaded
+SUBSCRIPTION_INDEX_TTL = 3600
+
+# Maximum number of threads used to run blocking storage calls for the bot
+STORAGE_ASYNC_WORKERS = 8
+
+# Interval between storage metrics summaries in the bot log
+STORAGE_METRICS_INTERVAL_HOURS = 1
+
+# Daily direct messages: maximum number of users messaged concurrently, and retries
+# with exponential backoff (in seconds) for rate limited or failed Discord requests
+DM_MAX_CONCURRENCY = 5
+DM_MAX_RETRIES = 3
+DM_RETRY_BASE_DELAY = 1.0
+
+# Discord user lookups: maximum cached entries, seconds a resolved user is reused,
+# and seconds a user that could not be found or messaged (deleted, DMs closed) is
+# skipped before being looked up again
+USER_CACHE_MAX_SIZE = 10000
+USER_CACHE_TTL = 6 * 3600
+USER_CACHE_NEGATIVE_TTL = 3 * 24 * 3600
+
+# Maximum number of pre-rendered operator messages kept in memory by the bot
+RENDER_CACHE_MAX_SIZE = 20000
 
 OPERATOR_24H_HISTORY_COUNT = 7
 
@@ -15,5 +45,47 @@ FIELD_PERF_DATA_24H = 'Performance24h'
 FIELD_PERF_DATA_30D = 'Performance30d'
 FIELD_PERF_DATA_90D = 'Performance90d'
 
+# Default performance attribute for each SSV API reporting period collected daily
+PERFORMANCE_PERIOD_FIELDS = {
+    '24h': FIELD_PERF_DATA_24H,
+    '30d': FIELD_PERF_DATA_30D,
+    '90d': FIELD_PERF_DATA_90D
+}
+
+# Operator attributes returned by the storage layer, and the subset that hold
+# date-keyed performance data
+PERFORMANCE_ITEM_FIELDS = [FIELD_OPERATOR_ID, FIELD_OPERATOR_NAME, FIELD_IS_VO, FIELD_IS_PRIVATE,
+                           FIELD_VALIDATOR_COUNT, FIELD_ADDRESS, FIELD_PERF_DATA_24H, FIELD_PERF_DATA_30D,
+                           FIELD_PERF_DATA_1H]
+PERFORMANCE_DATA_FIELDS = [FIELD_PERF_DATA_24H, FIELD_PERF_DATA_30D]
+
+# SSV API reporting periods collected hourly, and their performance attributes. The
+# performance table keeps the last PERFORMANCE_HOURLY_HISTORY hours of each in a
+# fixed-size binary ring buffer (see common/hourly_history.py). The storage layer
+# returns them like the date-keyed fields, keyed by hour, e.g. '2024-06-18T13:00'.
+PERFORMANCE_HOURLY_PERIOD_FIELDS = {
+    '1h': FIELD_PERF_DATA_1H
+}
+PERFORMANCE_HOURLY_FIELDS = [FIELD_PERF_DATA_1H]
+PERFORMANCE_HOURLY_HISTORY = 168
+
+# Performance table item written by the collectors to record the latest date written
+# for each performance attribute, e.g. LatestPerformance24h = '2024-06-18'
+WATERMARK_OPERATOR_ID = -1
+FIELD_LATEST_DATE_PREFIX = 'Latest'
+FIELD_WATERMARK_UPDATED = 'WatermarkUpdated'
+
+# Performance table item holding the progress of an incomplete Lambda collector run.
+# Like the watermark, it has a negative operator ID and is skipped by readers.
+CHECKPOINT_OPERATOR_ID = -2
+
 ALERTS_THRESHOLDS_24H = {0.95, 0.75}
-ALERTS_THRESHOLDS_30D = {0.95}
\ No newline at end of file
+ALERTS_THRESHOLDS_30D = {0.95}
+
+# Periods checked for threshold alerts, in the order they are reported: the period
+# label, the performance attribute holding its data points, and its thresholds. Add
+# e.g. '1h': (FIELD_PERF_DATA_1H, {0.5}) to alert on other periods.
+ALERTS_PERIODS = {
+    '24h': (FIELD_PERF_DATA_24H, ALERTS_THRESHOLDS_24H),
+    '30d': (FIELD_PERF_DATA_30D, ALERTS_THRESHOLDS_30D)
+}
\ No newline at end of file
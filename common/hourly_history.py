@@ -0,0 +1,102 @@
+import math
+import struct
+from functools import lru_cache
+from datetime import datetime, timezone, timedelta
+from common.config import PERFORMANCE_HOURLY_HISTORY
+
+# Fixed-size ring buffer of hourly performance values, stored as one binary attribute
+# per operator so that item size and read cost do not grow with the history.
+#
+# Layout (big-endian):
+#   header  format version, slot count, newest hour (hours since the Unix epoch, UTC)
+#   slots   one float32 per slot; hour h is stored in slot h % slot count
+#
+# Slots are NaN for hours that were not collected. Values older than the newest hour
+# minus the slot count have been overwritten and are never returned.
+
+HISTORY_VERSION = 1
+
+HEADER = struct.Struct('>BHI')
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+# Hours since the Unix epoch of a datetime. Naive datetimes are taken as UTC.
+def epoch_hour(value):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int((value - EPOCH).total_seconds() // 3600)
+
+
+# The storage key of an hour, e.g. '2024-06-18T13:00'
+@lru_cache(maxsize=4096)
+def hour_key(hour):
+    return (EPOCH + timedelta(hours=hour)).strftime('%Y-%m-%dT%H:00')
+
+
+class HourlyHistory:
+
+    def __init__(self, slots=PERFORMANCE_HOURLY_HISTORY):
+        self.slots = slots
+        self.newest = None
+        self.values = [math.nan] * slots
+
+
+    # Decodes an encoded history (bytes, or a boto3 Binary). Returns an empty history
+    # for None, and raises ValueError for data in an unknown format.
+    @classmethod
+    def decode(cls, data, slots=PERFORMANCE_HOURLY_HISTORY):
+        if data is None:
+            return cls(slots)
+        data = bytes(getattr(data, 'value', data))
+
+        try:
+            version, slot_count, newest = HEADER.unpack_from(data)
+        except struct.error:
+            raise ValueError("hourly history is too short")
+        if version != HISTORY_VERSION or len(data) != HEADER.size + slot_count * 4:
+            raise ValueError(f"unsupported hourly history version {version} or length {len(data)}")
+
+        history = cls(slot_count)
+        if slot_count:
+            history.newest = newest
+            history.values = list(struct.unpack_from(f'>{slot_count}f', data, HEADER.size))
+        return history
+
+
+    def encode(self):
+        return HEADER.pack(HISTORY_VERSION, self.slots, self.newest or 0) + struct.pack(f'>{self.slots}f', *self.values)
+
+
+    # Sets the value for an hour. Moving the newest hour forward clears the slots of any
+    # hours skipped in between. Returns False, without changing the history, for an
+    # hour older than the history holds.
+    def set(self, hour, value):
+        if self.newest is not None and hour <= self.newest - self.slots:
+            return False
+
+        if self.newest is None or hour > self.newest:
+            first = hour - self.slots + 1 if self.newest is None else max(self.newest + 1, hour - self.slots + 1)
+            for skipped in range(first, hour):
+                self.values[skipped % self.slots] = math.nan
+            self.newest = hour
+
+        self.values[hour % self.slots] = math.nan if value is None else float(value)
+        return True
+
+
+    # Yields (hour, value) for the hours with a value, newest first, limited to the
+    # last `hours` hours ending at the newest hour if given
+    def items(self, hours=None):
+        if self.newest is None:
+            return
+        for hour in range(self.newest, self.newest - min(hours or self.slots, self.slots), -1):
+            value = self.values[hour % self.slots]
+            if not math.isnan(value):
+                yield hour, value
+
+
+    # Returns a dict of hour keys to values, rounded back to the six decimal places
+    # written by the collectors
+    def to_dict(self, hours=None):
+        return {hour_key(hour): round(value, 6) for hour, value in self.items(hours)}
\ No newline at end of file
@@ -0,0 +1,161 @@
+import time
+import logging
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+
+# Per-call counters for a single storage operation. DynamoDB responses are added
+# with add_response(), which may be called from several threads for one call
+# (e.g. parallel scan segments).
+class CallMetrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pages = 0
+        self.items_scanned = 0
+        self.items_returned = 0
+        self.rcu = 0.0
+        self.wcu = 0.0
+
+    # Adds page, item and consumed capacity counts from a DynamoDB response. Requests
+    # must pass ReturnConsumedCapacity='TOTAL' for capacity to be reported.
+    def add_response(self, response, write=False):
+        consumed = response.get('ConsumedCapacity') or []
+        if isinstance(consumed, dict):
+            consumed = [consumed]
+
+        rcu = wcu = 0.0
+        for capacity in consumed:
+            if 'ReadCapacityUnits' in capacity or 'WriteCapacityUnits' in capacity:
+                rcu += capacity.get('ReadCapacityUnits', 0.0)
+                wcu += capacity.get('WriteCapacityUnits', 0.0)
+            elif write:
+                wcu += capacity.get('CapacityUnits', 0.0)
+            else:
+                rcu += capacity.get('CapacityUnits', 0.0)
+
+        if 'ScannedCount' in response:
+            scanned = response['ScannedCount']
+        elif 'Responses' in response:
+            scanned = sum(len(items) for items in response['Responses'].values())
+        else:
+            scanned = 1 if 'Item' in response else 0
+
+        with self._lock:
+            self.pages += 1
+            self.items_scanned += scanned
+            self.rcu += rcu
+            self.wcu += wcu
+
+
+# Process-wide registry of storage call metrics: wall time, pages, items scanned
+# versus returned and consumed read/write capacity, aggregated by operation name.
+class MetricsRegistry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {}
+
+    # Measures the enclosed block as one call of the named operation. The yielded
+    # CallMetrics is also the current call for this thread until the block exits.
+    @contextmanager
+    def measure(self, name):
+        call = CallMetrics()
+        previous = getattr(self._local, 'call', None)
+        self._local.call = call
+        start = time.perf_counter()
+        error = False
+
+        try:
+            yield call
+        except Exception:
+            error = True
+            raise
+        finally:
+            self._local.call = previous
+            self._record(name, time.perf_counter() - start, call, error)
+
+    # Method decorator measuring each call as "<class name>.<method name>". Unless
+    # count_result is False, the number of items returned is the length of the result.
+    # Usable as @METRICS.measured or @METRICS.measured(count_result=False).
+    def measured(self, func=None, count_result=True):
+        if func is None:
+            return lambda func: self.measured(func, count_result=count_result)
+
+        @wraps(func)
+        def wrapper(instance, *args, **kwargs):
+            with self.measure(f"{type(instance).__name__}.{func.__name__}") as call:
+                result = func(instance, *args, **kwargs)
+                if count_result and not call.items_returned and hasattr(result, '__len__'):
+                    call.items_returned = len(result)
+                return result
+        return wrapper
+
+    # Returns the CallMetrics of the operation being measured on this thread, if any
+    def current(self):
+        return getattr(self._local, 'call', None)
+
+    # Adds a DynamoDB response to the current call on this thread, if any
+    def add_response(self, response, write=False):
+        call = self.current()
+        if call is not None and isinstance(response, dict):
+            call.add_response(response, write=write)
+
+    # Wraps func so that it records into the given call when run on another thread
+    def bind(self, call, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            previous = getattr(self._local, 'call', None)
+            self._local.call = call
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._local.call = previous
+        return wrapper
+
+    def _record(self, name, elapsed, call, error):
+        with self._lock:
+            stats = self._stats.setdefault(name, {
+                'calls': 0, 'errors': 0, 'total_time': 0.0, 'max_time': 0.0, 'pages': 0,
+                'items_scanned': 0, 'items_returned': 0, 'rcu': 0.0, 'wcu': 0.0
+            })
+            stats['calls'] += 1
+            stats['errors'] += 1 if error else 0
+            stats['total_time'] += elapsed
+            stats['max_time'] = max(stats['max_time'], elapsed)
+            stats['pages'] += call.pages
+            stats['items_scanned'] += call.items_scanned
+            stats['items_returned'] += call.items_returned
+            stats['rcu'] += call.rcu
+            stats['wcu'] += call.wcu
+
+    # Returns a copy of the aggregated stats by operation name
+    def summary(self):
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    # Logs one line per operation and optionally resets the counters
+    def log_summary(self, reset=False):
+        summary = self.summary()
+        if reset:
+            self.reset()
+
+        if not summary:
+            logging.info("Storage metrics: no calls recorded")
+            return
+
+        for name, stats in sorted(summary.items()):
+            logging.info(
+                f"Storage metrics {name}: calls={stats['calls']} errors={stats['errors']} "
+                f"avg={stats['total_time'] / stats['calls'] * 1000:.1f}ms max={stats['max_time'] * 1000:.1f}ms "
+                f"pages={stats['pages']} scanned={stats['items_scanned']} returned={stats['items_returned']} "
+                f"rcu={stats['rcu']:.1f} wcu={stats['wcu']:.1f}")
+
+
+METRICS = MetricsRegistry()
\ No newline at end of file
@@ -0,0 +1,134 @@
+from datetime import datetime, timezone
+import argparse
+from common.config import PERFORMANCE_PERIOD_FIELDS, DYNDB_PERF_STALENESS_INDEX
+from common.metrics import METRICS
+from collector.ssv_api import SSVApiClient, REQUESTS_PER_MINUTE
+from collector.dynamodb_writer import DEFAULT_MAX_WORKERS
+from collector.fingerprint_cache import FingerprintCache
+from collector.pipeline import prefetch, FanOut
+from collector.records import parse_period, normalize_operator
+from collector.sinks import DynamoDBSink, SQLiteSink, CSVSink, GoogleSheetSink
+from ssv_performance_log_dyndb import cleanup_outdated_records, print_metrics_summary
+
+
+# Parses PERIOD:TARGET command line values, e.g. 24h:performance_24h.csv
+def parse_period_target(value):
+    time_period, _, target = value.partition(':')
+    if time_period not in PERFORMANCE_PERIOD_FIELDS or not target:
+        raise argparse.ArgumentTypeError(f"expected PERIOD:TARGET with a period of {', '.join(PERFORMANCE_PERIOD_FIELDS)}")
+    return time_period, target
+
+
+# Crawls the SSV API once and passes every operator to each sink. Returns the number
+# of operators collected and the sinks that failed.
+def collect(client, sinks, periods, target_date):
+    fan_out = FanOut(sinks)
+    operators = 0
+
+    try:
+        for page, page_operators in prefetch(client.iter_pages()):
+            for op in page_operators:
+                try:
+                    fan_out.write(normalize_operator(op, periods, target_date))
+                    operators += 1
+                except Exception as e:
+                    print(f"Error processing operator {op.get('id')}: {e}")
+            print(f"Page {page}: {len(page_operators)} operators")
+    finally:
+        errors = fan_out.close()
+
+    print(f"Fetched {operators} operators with {client.requests} API requests ({client.retries} retries)")
+    return operators, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fetch operator performance data once and write it to every configured destination.')
+    parser.add_argument('-n', '--network', type=str, choices=['mainnet', 'goerli', 'holesky'], default='mainnet',
+                        help='The SSV network to fetch data from (mainnet, goerli, or holesky).')
+    parser.add_argument('-p', '--period', type=parse_period, action='append', dest='periods', metavar='PERIOD[:ATTRIBUTE]',
+                        help='A reporting period to collect and the attribute to store it in, e.g. 24h:Performance24h. '
+                             f"May be repeated (default: 24h and 30d). Periods: {', '.join(PERFORMANCE_PERIOD_FIELDS)}.")
+    parser.add_argument('--page_size', type=int, default=100,
+                        help='The number of items per page for API queries (default: 100).')
+    parser.add_argument('--requests_per_minute', type=float, default=REQUESTS_PER_MINUTE,
+                        help=f'Maximum SSV API request rate (default: {REQUESTS_PER_MINUTE}).')
+    parser.add_argument('--utc', action='store_true',
+                        help='If set, use the current date in UTC for the target date.')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='If set, overwrite existing performance data in DynamoDB.')
+
+    parser.add_argument('--dynamodb_table', type=str,
+                        help='The DynamoDB table to update.')
+    parser.add_argument('--write_workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f'Number of concurrent DynamoDB writers (default: {DEFAULT_MAX_WORKERS}).')
+    parser.add_argument('--fingerprint_cache', type=str,
+                        help='Local file recording the last values written to DynamoDB, used to skip unchanged writes.')
+    parser.add_argument('--cleanup', action='store_true',
+                        help='If set, zero the performance data of DynamoDB operators that were not updated recently.')
+    parser.add_argument('--staleness_index', type=str, default=DYNDB_PERF_STALENESS_INDEX,
+                        help=f'GSI on isVO and last_updated used to find outdated operators (default: {DYNDB_PERF_STALENESS_INDEX}).')
+
+    parser.add_argument('--csv', type=parse_period_target, action='append', default=[], metavar='PERIOD:FILE',
+                        help='A CSV file to add the performance for a period to, in the format of ssv_performance_log.py. May be repeated.')
+    parser.add_argument('--sheet_credentials', type=str,
+                        help='Google service account credentials file, for --sheet.')
+    parser.add_argument('--sheet_document', type=str,
+                        help='Google Sheets document, for --sheet.')
+    parser.add_argument('--sheet', type=parse_period_target, action='append', default=[], metavar='PERIOD:WORKSHEET',
+                        help='A worksheet to add the performance for a period to. May be repeated.')
+    parser.add_argument('--sqlite_database', type=str,
+                        help='A SQLite database to import operators and performance data into.')
+    args = parser.parse_args()
+
+    periods = dict(args.periods or [parse_period('24h'), parse_period('30d')])
+    for time_period, _ in args.csv + args.sheet:
+        periods.setdefault(time_period, PERFORMANCE_PERIOD_FIELDS[time_period])
+
+    if args.sheet and not (args.sheet_credentials and args.sheet_document):
+        parser.error('--sheet requires --sheet_credentials and --sheet_document')
+
+    if args.utc:
+        target_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    else:
+        target_date = datetime.now().strftime("%Y-%m-%d")
+
+    fingerprint_cache = None
+    sinks = []
+    if args.dynamodb_table:
+        if args.fingerprint_cache:
+            fingerprint_cache = FingerprintCache(args.fingerprint_cache, args.dynamodb_table)
+        sinks.append(DynamoDBSink(args.dynamodb_table, target_date, list(periods.values()), args.overwrite,
+                                  args.write_workers, fingerprint_cache))
+    if args.sqlite_database:
+        sinks.append(SQLiteSink(args.sqlite_database, target_date))
+    for time_period, path in args.csv:
+        sinks.append(CSVSink(path, periods[time_period], target_date))
+    for time_period, worksheet in args.sheet:
+        sinks.append(GoogleSheetSink(args.sheet_credentials, args.sheet_document, worksheet, periods[time_period], target_date))
+
+    if not sinks:
+        parser.error('at least one of --dynamodb_table, --sqlite_database, --csv or --sheet is required')
+
+    base_url = f"https://api.ssv.network/api/v4/{args.network}/operators/?validatorsCount=true"
+    client = SSVApiClient(base_url, page_size=args.page_size, requests_per_minute=args.requests_per_minute)
+
+    try:
+        _, errors = collect(client, sinks, periods, target_date)
+    finally:
+        client.close()
+
+    for sink in sinks:
+        print(f"{sink.name}: {'failed: ' + str(errors[sink.name]) if sink.name in errors else 'ok'}")
+
+    if args.dynamodb_table and args.cleanup and DynamoDBSink.name not in errors:
+        with METRICS.measure('collector.cleanup_outdated_records'):
+            cleanup_outdated_records(args.dynamodb_table, fingerprint_cache, args.staleness_index, args.write_workers)
+
+    print_metrics_summary()
+
+    if errors:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,12 +1,15 @@
 import json
-import boto3
 from datetime import datetime, timezone
-import requests
 from decimal import Decimal, ROUND_HALF_UP
-from botocore.exceptions import ClientError
+from common.config import PERFORMANCE_PERIOD_FIELDS
+from common.metrics import METRICS
+from collector.ssv_api import SSVApiClient, REQUESTS_PER_MINUTE
+from collector.dynamodb_writer import DynamoDBWriter, OperatorUpdate, DEFAULT_MAX_WORKERS
+from collector.checkpoint import RunCheckpoint
+from collector.pipeline import prefetch
 
-# Initialize a DynamoDB client
-dynamodb = boto3.resource('dynamodb')
+# Time, in milliseconds, left in the invocation below which no further pages are started
+LAMBDA_TIME_MARGIN_MS = 60000
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -14,174 +17,128 @@ class DecimalEncoder(json.JSONEncoder):
             return float(obj)
         return super(DecimalEncoder, self).default(obj)
 
-def fetch_and_filter_data(base_url, time_periods, page_size):
-    page = 1
+# Yields the operators with validators, with performance for each of time_periods
+# converted from a percentage to a Decimal fraction
+def filter_operators(operators, time_periods):
+    for op in operators:
+        try:
+            if int(op["validators_count"]) > 0:
+                for time_period in time_periods:
+                    op["performance"][time_period] = Decimal(str(op["performance"].get(time_period, 0))) / Decimal(100)
+                yield op
+        except Exception as e:
+            print(f"Error processing operator {op['id']}: {e}")
+            continue
+
+def fetch_and_filter_data(base_url, time_periods, page_size, requests_per_minute=REQUESTS_PER_MINUTE):
+    client = SSVApiClient(base_url, page_size=page_size, requests_per_minute=requests_per_minute)
     operators = {}
 
-    while True:
-        url = f"{base_url}&page={page}&perPage={page_size}"
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-
-        if not data["operators"]:
-            break
-
-        for op in data["operators"]:
-            try:
-                if int(op["validators_count"]) > 0:
-                    for time_period in time_periods:
-                        op["performance"][time_period] = Decimal(str(op["performance"].get(time_period, 0))) / Decimal(100)
-                    operators[op["id"]] = op
-            except Exception as e:
-                print(f"Error processing operator {op['id']}: {e}")
-                continue
-
-        page += 1
-
-    return operators
-
-# Attempt to create a performance attribute or initialize it with an empty dict/map
-# if it isn't already present.
-def ensure_performance_attribute(table, operator_id, attribute_name):
     try:
-        # ConditionExpression is re-checking existence prior to overwriting
-        # with empty map, in case one was recently created.
-        table.update_item(
-            Key={'OperatorID': operator_id},
-            UpdateExpression=f'SET {attribute_name} = :empty_map',
-            ExpressionAttributeValues={':empty_map': {}},
-            ConditionExpression="attribute_not_exists(attribute_name) OR NOT attribute_type(attribute_name, :type_map)"
-        )
-    except ClientError as e:
-        print(f"Failed to check/initiate {attribute_name} for OperatorID={operator_id}: {e}")
-        raise
-
-def update_performance_data(operator_id, performance_data, name, validator_count, address, is_vo, is_private, table_name, overwrite):
-    table = dynamodb.Table(table_name)
-    date_key = datetime.now().strftime("%Y-%m-%d")
-
-    def format_decimal(value):
-        return Decimal(value).quantize(Decimal('.000001'), rounding=ROUND_HALF_UP)
-
-    # Fetch the existing item from DynamoDB to check its structure and existence
-    existing_item_response = table.get_item(Key={'OperatorID': operator_id})
-    item_exists = 'Item' in existing_item_response
-
-    # Define 'item' only if it exists in the response
-    if item_exists:
-        item = existing_item_response['Item']
-
-        # Initialize performance attributes if they do not exist or are not in the correct format
-        if 'Performance24h' not in item or not isinstance(item['Performance24h'], dict):
-            ensure_performance_attribute(table, operator_id, 'Performance24h')
-        if 'Performance30d' not in item or not isinstance(item['Performance30d'], dict):
-            ensure_performance_attribute(table, operator_id, 'Performance30d')
-
-    else:
-        # Initialize the performance maps if not existing
-        table.put_item(
-            Item={
-                'OperatorID': operator_id,
-                'Name': name,
-                'ValidatorCount': validator_count,
-                'Address': address,
-                'isVO': Decimal(is_vo),
-                'isPrivate': bool(is_private, False),
-                'Performance24h': {date_key: format_decimal(performance_data['24h'])},
-                'Performance30d': {date_key: format_decimal(performance_data['30d'])}
-            }
-        )
-        return
-
-    # Update expressions for DynamoDB update operation
-    update_expression = [
-        'SET #n = :name',
-        '#vc = :vc',
-        '#addr = :address',
-        '#vo = :isvo',
-        '#private = :isprivate'
-    ]
-
-    expression_attribute_names = {
-        "#dk": date_key,
-        "#n": "Name",
-        "#vc": "ValidatorCount",
-        "#addr": "Address",
-        "#vo": "isVO",
-        "#private": "isPrivate"
-    }
-
-    expression_attribute_values = {
-        ":name": name,
-        ":vc": validator_count,
-        ":address": address,
-        ":isvo": Decimal(is_vo),
-        ":isprivate": is_private,  # Ensure this matches your usage in the UpdateExpression
-        ":p24h": format_decimal(performance_data['24h']),
-        ":p30d": format_decimal(performance_data['30d'])
-    }
-
-    # Update the performance maps based on the overwrite flag
-    if overwrite:
-        update_expression.extend([
-            'Performance24h.#dk = :p24h',
-            'Performance30d.#dk = :p30d'
-        ])
-    else:
-        update_expression.extend([
-            'Performance24h.#dk = if_not_exists(Performance24h.#dk, :p24h)',
-            'Performance30d.#dk = if_not_exists(Performance30d.#dk, :p30d)'
-        ])
-
-    # Converting list to string for update expression
-    update_expression_str = ', '.join(update_expression)
+        for page, page_operators in client.iter_pages():
+            for op in filter_operators(page_operators, time_periods):
+                operators[op["id"]] = op
+    finally:
+        client.close()
 
-    try:
-        response = table.update_item(
-            Key={'OperatorID': operator_id},
-            UpdateExpression=update_expression_str,
-            ExpressionAttributeNames=expression_attribute_names,
-            ExpressionAttributeValues=expression_attribute_values,
-            ReturnValues="UPDATED_NEW"
-        )
-        return response
-    except Exception as e:
-        print(f"Error updating item: {str(e)}")
-        raise
+    print(f"Fetched {len(operators)} operators with {client.requests} API requests ({client.retries} retries)")
+    return operators
 
+def format_decimal(value):
+    return Decimal(value).quantize(Decimal('.000001'), rounding=ROUND_HALF_UP)
+
+def operator_update(operator, time_periods):
+    return OperatorUpdate(
+        operator["id"],
+        {
+            'Name': operator.get("name", 'Unknown Name'),
+            'ValidatorCount': operator.get("validators_count", 0),
+            'Address': operator.get("owner_address", ''),
+            'isVO': Decimal(1 if operator.get("type", '') == "verified_operator" else 0),
+            'isPrivate': bool(operator.get("is_private", False))
+        },
+        {PERFORMANCE_PERIOD_FIELDS[time_period]: format_decimal(operator["performance"][time_period])
+         for time_period in time_periods}
+    )
+
+# Crawls and writes one page at a time, saving a checkpoint after each page. Pages are
+# fetched ahead on a background thread into a bounded queue while the current page is
+# written. A run for the same target date resumes from the checkpoint. The run stops
+# early, with statusCode 206, once less than time_margin_ms of the invocation remains;
+# invoke the handler again with the same event to continue. The checkpoint is deleted
+# when the run completes.
 def lambda_handler(event, context):
+    # Metrics are per invocation; warm containers keep module state between runs
+    METRICS.reset()
+
     time_periods = event.get('time_periods', ['24h', '30d'])
     network = event.get('network', 'mainnet')
     table_name = 'SSVPerformanceDataDev' 
     page_size = event.get('page_size', 100)
     utc = event.get('utc', False)
     overwrite = event.get('overwrite', False)
-
-    base_url = f"https://api.ssv.network/api/v4/{network}/operators/?validatorsCount=true"
-    operators = fetch_and_filter_data(base_url, time_periods, page_size)
+    requests_per_minute = event.get('requests_per_minute', REQUESTS_PER_MINUTE)
+    time_margin_ms = event.get('time_margin_ms', LAMBDA_TIME_MARGIN_MS)
 
     if utc:
         target_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
     else:
         target_date = datetime.now().strftime("%Y-%m-%d")
 
-    for operator_id, operator in operators.items():
-        performance_data = {time_period: operator["performance"][time_period] for time_period in time_periods}
-        update_response = update_performance_data(
-            operator_id,
-            performance_data,
-            operator.get("name", 'Unknown Name'),
-            operator.get("validators_count", 0),
-            operator.get("owner_address", ''),
-            1 if operator.get("type", '') == "verified_operator" else 0,
-            bool(operator.get("is_private", False)),
-            table_name,
-            overwrite
-        )
-        print("Updated operator:", operator_id, "Response:", json.dumps(update_response, indent=2, cls=DecimalEncoder))
+    checkpoint = RunCheckpoint(table_name)
+    state = checkpoint.load()
+    if state and state['target_date'] == target_date:
+        start_page, written, failed = state['next_page'], state['written'], state['failed']
+        print(f"Resuming {target_date} from page {start_page}, {written} operators already written")
+    else:
+        start_page, written, failed = 1, 0, []
+
+    base_url = f"https://api.ssv.network/api/v4/{network}/operators/?validatorsCount=true"
+    client = SSVApiClient(base_url, page_size=page_size, requests_per_minute=requests_per_minute)
+    writer = DynamoDBWriter(table_name, max_workers=event.get('write_workers', DEFAULT_MAX_WORKERS))
+    next_page = start_page
+    completed = True
+
+    try:
+        for page, page_operators in prefetch(client.iter_pages(start_page)):
+            updates = [operator_update(op, time_periods) for op in filter_operators(page_operators, time_periods)]
+            page_written, page_failed = writer.write_operators(updates, target_date, overwrite)
+            written += page_written
+            failed.extend(page_failed)
+
+            next_page = page + 1
+            checkpoint.save(target_date, next_page, written, failed)
+
+            if context is not None and context.get_remaining_time_in_millis() < time_margin_ms:
+                completed = False
+                break
+    finally:
+        client.close()
+
+    if not completed:
+        print(f"Stopping before timeout at page {next_page}, {written} operators written")
+        return {
+            'statusCode': 206,
+            'body': json.dumps(f'Incomplete: resume from page {next_page} for {target_date}.'),
+            'complete': False,
+            'next_page': next_page,
+            'written': written,
+            'failed': failed,
+            'metrics': METRICS.summary()
+        }
+
+    with METRICS.measure('collector.update_watermark'):
+        writer.update_watermark([PERFORMANCE_PERIOD_FIELDS[time_period] for time_period in time_periods], target_date)
+    checkpoint.delete()
+
+    metrics = METRICS.summary()
+    print("Storage metrics:", json.dumps(metrics, indent=2))
 
     return {
         'statusCode': 200,
-        'body': json.dumps('Successfully updated DynamoDB with the latest performance data.', cls=DecimalEncoder)
+        'body': json.dumps('Successfully updated DynamoDB with the latest performance data.', cls=DecimalEncoder),
+        'complete': True,
+        'written': written,
+        'failed': failed,
+        'metrics': metrics
     }
\ No newline at end of file
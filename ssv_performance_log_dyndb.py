@@ -1,214 +1,349 @@
-import requests
 from datetime import datetime, timezone, timedelta
 import argparse
 import boto3
 from botocore.exceptions import ClientError
 from decimal import Decimal
-import time
+from boto3.dynamodb.conditions import Key
+from common.config import PERFORMANCE_PERIOD_FIELDS, PERFORMANCE_HOURLY_PERIOD_FIELDS, DYNDB_PERF_STALENESS_INDEX
+from common.metrics import METRICS
+from common.hourly_history import epoch_hour, hour_key
+from collector.ssv_api import SSVApiClient, REQUESTS_PER_MINUTE
+from collector.dynamodb_writer import DynamoDBWriter, OperatorUpdate, DEFAULT_MAX_WORKERS
+from collector.fingerprint_cache import FingerprintCache
+from collector.pipeline import prefetch
+from collector.records import parse_period
 
 DAYS_LIMIT = 7
-REQUESTS_PER_MINUTE = 10
 
-# Set a delay between API requests (in seconds)
-REQUEST_DELAY = 60 / REQUESTS_PER_MINUTE  # Delay in seconds between requests to space them out
 
-def fetch_and_filter_data(base_url, time_period, page_size):
-    page = 1
+# Yields the operators from one page of API results, with the performance for each of
+# time_periods (e.g. ['24h', '30d']) converted from a percentage to a Decimal fraction
+def filter_operators(page_operators, time_periods):
+    for op in page_operators:
+        try:
+            if int(op["validators_count"]) > 0:
+                for time_period in time_periods:
+                    if op["performance"].get(time_period) is not None:
+                        op["performance"][time_period] = Decimal(str(op["performance"][time_period] / 100))
+            yield op
+        except Exception as e:
+            print(f"Error processing operator {op['id']}: {e}")
+            continue
+
+
+# Crawls all operators into memory. main() streams pages with ingest_performance_data()
+# instead; this is kept for callers that want every operator at once.
+def fetch_and_filter_data(base_url, time_periods, page_size, requests_per_minute=REQUESTS_PER_MINUTE):
+    if isinstance(time_periods, str):
+        time_periods = [time_periods]
+
+    client = SSVApiClient(base_url, page_size=page_size, requests_per_minute=requests_per_minute)
     operators = {}
 
-    while True:
-        url = f"{base_url}&page={page}&perPage={page_size}"
-        print(f"Getting page {page} of results")
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-
-        if not data["operators"]:
-            break
-
-        for op in data["operators"]:
-            try:
-                if int(op["validators_count"]) > 0:
-                    op["performance"][time_period] = Decimal(str(op["performance"][time_period] / 100))
+    try:
+        for page, page_operators in client.iter_pages():
+            print(f"Got page {page} of results")
+            for op in filter_operators(page_operators, time_periods):
                 operators[op["id"]] = op
-            except Exception as e:
-                print(f"Error processing operator {op['id']}: {e}")
-                continue
+    finally:
+        client.close()
 
-        page += 1
+    print(f"Fetched {len(operators)} operators with {client.requests} API requests ({client.retries} retries)")
+    return operators
 
-        time.sleep(REQUEST_DELAY)
 
-    return operators
+# Builds the update for one operator: its details and the performance for every
+# period. periods maps SSV API reporting periods to performance attributes, e.g.
+# {'24h': 'Performance24h'}.
+def operator_update(operator, target_date, periods):
+    return OperatorUpdate(
+        operator["id"],
+        {
+            'Name': operator.get("name", ""),
+            'ValidatorCount': operator.get("validators_count", 0),
+            'isVO': 1 if operator.get("type", "") == "verified_operator" else 0,
+            'Address': operator.get("owner_address", ""),
+            'isPrivate': bool(operator.get("is_private", False)),
+            'last_updated': target_date
+        },
+        {attribute_name: operator["performance"][time_period] for time_period, attribute_name in periods.items()
+         if operator["performance"].get(time_period) is not None}
+    )
 
 
-def ensure_performance_attribute(table, operator_id, attribute_name):
-    try:
-        response = table.get_item(Key={'OperatorID': operator_id})
-        item = response.get('Item', {})
-        if attribute_name not in item:
-            table.update_item(
-                Key={'OperatorID': operator_id},
-                UpdateExpression=f'SET {attribute_name} = :empty_map',
-                ExpressionAttributeValues={':empty_map': {}}
-            )
-    except ClientError as e:
-        print(f"Failed to check/initiate {attribute_name} for OperatorID={operator_id}: {e}")
-        raise
-
-
-def update_dynamodb_performance_data(table_name, operators, target_date, attribute_name, time_period, overwrite):
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(table_name)
-
-    for operator_id, operator in operators.items():
-        print(f"Processing operator {operator_id}")
-
-        performance = operator["performance"][time_period]
-
-        is_vo = 1 if operator.get("type", "") == "verified_operator" else 0
-        is_private = bool(operator.get("is_private", False))
-
-        update_expression = [
-            'SET #name = :name',
-            'ValidatorCount = :validator_count',
-            'isVO = :is_vo',
-            'Address = :address',
-            'isPrivate = :is_private',
-            'last_updated = :last_updated'
-        ]
-        expression_attribute_values = {
-            ':name': operator.get("name", ""),
-            ':validator_count': operator.get("validators_count", 0),
-            ':is_vo': is_vo,
-            ':address': operator.get("owner_address", ""),
-            ':is_private': is_private,
-            ':last_updated': target_date
-        }
-        expression_attribute_names = {
-            '#name': 'Name'
-        }
+# Writes updates with one conditional update per operator, concurrently in batches.
+# With a fingerprint cache, only the attributes that changed since the last run are
+# written, and successful writes are recorded in the cache.
+def write_operator_updates(writer, updates, target_date, overwrite, fingerprint_cache=None):
+    if fingerprint_cache:
+        updates = [update for update in (fingerprint_cache.filter_update(update, target_date, overwrite)
+                                         for update in updates) if update]
 
-        ensure_performance_attribute(table, operator_id, attribute_name)
+    written, failed = writer.write_operators(updates, target_date, overwrite)
 
-        if overwrite:
-            update_expression.append(f'{attribute_name}.#date = :performance')
-            expression_attribute_names['#date'] = target_date
-            expression_attribute_values[':performance'] = performance
-        else:
-            update_expression.append(f'{attribute_name}.#date = if_not_exists({attribute_name}.#date, :performance)')
-            expression_attribute_names['#date'] = target_date
-            expression_attribute_values[':performance'] = performance
+    if fingerprint_cache:
+        failed_ids = set(failed)
+        for update in updates:
+            if update.operator_id not in failed_ids:
+                fingerprint_cache.record(update, target_date)
 
-        update_expression_str = ', '.join(update_expression)
+    return written, failed
 
-        try:
-            response = table.update_item(
-                Key={'OperatorID': operator_id},
-                UpdateExpression=update_expression_str,
-                ExpressionAttributeNames=expression_attribute_names,
-                ExpressionAttributeValues=expression_attribute_values,
-                ConditionExpression='attribute_exists(OperatorID)'
-            )
-        except Exception as e:
-            table.put_item(
-                Item={
-                    'OperatorID': operator_id,
-                    'Name': operator.get("name", ""),
-                    'ValidatorCount': operator.get("validators_count", 0),
-                    'isVO': is_vo,
-                    'Address': operator.get("owner_address", ""),
-                    'isPrivate': is_private,
-                    'last_updated': target_date,
-                    attribute_name: {
-                        target_date: performance
-                    }
-                }
-            )
-
-
-def cleanup_outdated_records(table_name):
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(table_name)
-
-    # Define the cutoff date
-    cutoff_date = datetime.now(timezone.utc) - timedelta(days=DAYS_LIMIT)
-    cutoff_date_str = cutoff_date.strftime('%Y-%m-%d')
 
-    print(f"Cutoff date: {cutoff_date_str}")
+# Writes the operators' performance for the target date, plus operator details, from
+# a dict of operator IDs to operators as returned by fetch_and_filter_data()
+def update_dynamodb_performance_data(table_name, operators, target_date, periods, overwrite,
+                                     write_workers=DEFAULT_MAX_WORKERS, fingerprint_cache=None):
+    writer = DynamoDBWriter(table_name, max_workers=write_workers)
+    updates = [operator_update(operator, target_date, periods) for operator in operators.values()]
+    written, failed = write_operator_updates(writer, updates, target_date, overwrite, fingerprint_cache)
 
-    try:
-        outdated_items = []
+    if fingerprint_cache:
+        fingerprint_cache.save()
+
+    return written, failed
+
+
+# Crawls the SSV API and writes each page of operators as it arrives. Pages are
+# fetched on a background thread into a bounded queue, so only a few pages are held
+# in memory and API and DynamoDB latency overlap.
+def ingest_performance_data(client, table_name, target_date, periods, overwrite,
+                            write_workers=DEFAULT_MAX_WORKERS, fingerprint_cache=None):
+    writer = DynamoDBWriter(table_name, max_workers=write_workers)
+    operators = written = 0
+    failed = []
+
+    for page, page_operators in prefetch(client.iter_pages()):
+        updates = [operator_update(op, target_date, periods) for op in filter_operators(page_operators, list(periods))]
+        page_written, page_failed = write_operator_updates(writer, updates, target_date, overwrite, fingerprint_cache)
+        print(f"Page {page}: {len(updates)} operators, {page_written} written, {len(page_failed)} failed")
+
+        operators += len(updates)
+        written += page_written
+        failed.extend(page_failed)
+
+    print(f"Fetched {operators} operators with {client.requests} API requests ({client.retries} retries)")
+    print(f"Wrote {written} operators, {len(failed)} failed")
+    if failed:
+        print(f"Failed operators: {', '.join(map(str, failed))}")
+
+    if fingerprint_cache:
+        print(f"Skipped {fingerprint_cache.skipped_operators} unchanged operators and "
+              f"{fingerprint_cache.skipped_attributes} unchanged attributes")
+        fingerprint_cache.save()
+
+    return written, failed
+
+
+# Crawls the SSV API and sets each operator's performance for the given hour (hours
+# since the Unix epoch) in its hourly history, page by page. periods maps SSV API
+# reporting periods to hourly history attributes, e.g. {'1h': 'Performance1h'}.
+def ingest_hourly_performance(client, table_name, hour, periods, write_workers=DEFAULT_MAX_WORKERS):
+    writer = DynamoDBWriter(table_name, max_workers=write_workers)
+    operators = written = 0
+    failed = set()
 
-        # Scan the table to get all items where last_updated exists and is older than the cutoff date
-        response = table.scan(
-            FilterExpression='last_updated < :cutoff_date',
-            ExpressionAttributeValues={':cutoff_date': cutoff_date_str}
-        )
+    for page, page_operators in prefetch(client.iter_pages()):
+        page_operators = list(filter_operators(page_operators, list(periods)))
+        operators += len(page_operators)
 
+        for time_period, attribute_name in periods.items():
+            values = {op["id"]: op["performance"][time_period] for op in page_operators
+                      if op["performance"].get(time_period) is not None}
+            page_written, _, page_failed = writer.write_hourly(values, hour, attribute_name)
+            written += page_written
+            failed.update(page_failed)
+
+    print(f"Fetched {operators} operators with {client.requests} API requests ({client.retries} retries)")
+    print(f"Wrote {written} hourly values for {hour_key(hour)}, {len(failed)} operators failed")
+    if failed:
+        print(f"Failed operators: {', '.join(map(str, sorted(failed)))}")
+
+    return written, sorted(failed)
+
+
+# Returns the OperatorID and last_updated of operators last updated before the cutoff
+# date. Both isVO partitions of the staleness index are queried, so the cost depends on
+# the number of outdated operators rather than the table size. Falls back to a table
+# scan if the index does not exist.
+def find_outdated_records(table, cutoff_date_str, index_name=DYNDB_PERF_STALENESS_INDEX):
+    outdated_items = []
+
+    try:
+        for is_vo in (0, 1):
+            kwargs = {
+                'IndexName': index_name,
+                'KeyConditionExpression': Key('isVO').eq(is_vo) & Key('last_updated').lt(cutoff_date_str),
+                'ProjectionExpression': 'OperatorID, last_updated',
+                'ReturnConsumedCapacity': 'TOTAL'
+            }
+            while True:
+                response = table.query(**kwargs)
+                METRICS.add_response(response)
+                outdated_items.extend(response.get('Items', []))
+                if 'LastEvaluatedKey' not in response:
+                    break
+                kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        return outdated_items
+
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('ValidationException', 'ResourceNotFoundException'):
+            raise
+        print(f"Staleness index {index_name} unavailable, scanning table instead: {e}")
+
+    outdated_items = []
+    kwargs = {
+        'FilterExpression': 'last_updated < :cutoff_date',
+        'ExpressionAttributeValues': {':cutoff_date': cutoff_date_str},
+        'ProjectionExpression': 'OperatorID, last_updated',
+        'ReturnConsumedCapacity': 'TOTAL'
+    }
+    while True:
+        response = table.scan(**kwargs)
+        METRICS.add_response(response)
         outdated_items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return outdated_items
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
 
-        while 'LastEvaluatedKey' in response:
-            response = table.scan(
-                FilterExpression='last_updated < :cutoff_date',
-                ExpressionAttributeValues={':cutoff_date': cutoff_date_str},
-                ExclusiveStartKey=response['LastEvaluatedKey']  # Pagination key
-            )
-            outdated_items.extend(response['Items'])
 
-        print(f"Found {len(outdated_items)} outdated items")  # Debugging: Log the number of items found
+# Zeroes the validator count of operators not updated within DAYS_LIMIT days, and sets
+# their last_updated to today. The writes run concurrently in batches and are
+# conditional on the operator still being outdated, so an operator written by a
+# concurrent run is left alone. With a fingerprint cache, operators the cache has
+# written within DAYS_LIMIT days are left alone too, and operators changed here are
+# dropped from the cache.
+def cleanup_outdated_records(table_name, fingerprint_cache=None, index_name=DYNDB_PERF_STALENESS_INDEX,
+                             write_workers=DEFAULT_MAX_WORKERS):
+    table = boto3.resource('dynamodb').Table(table_name)
 
-        for item in outdated_items:
-            operator_id = item['OperatorID']
-            print(f"Updating operator {operator_id} - last_updated = {item['last_updated']}")
-
-            # Update ValidatorCount to 0 and set last_updated to the current date
-            table.update_item(
-                Key={'OperatorID': operator_id},
-                UpdateExpression='SET ValidatorCount = :zero, last_updated = :last_updated',
-                ExpressionAttributeValues={
-                    ':zero': 0,
-                    ':last_updated': datetime.now(timezone.utc).strftime('%Y-%m-%d')
-                }
-            )
+    now = datetime.now(timezone.utc)
+    cutoff_date_str = (now - timedelta(days=DAYS_LIMIT)).strftime('%Y-%m-%d')
+    today_str = now.strftime('%Y-%m-%d')
 
+    print(f"Cutoff date: {cutoff_date_str}")
+
+    try:
+        outdated_items = find_outdated_records(table, cutoff_date_str, index_name)
     except ClientError as e:
-        print(f"Failed to scan table and update outdated records: {e}")
+        print(f"Failed to find outdated records: {e}")
+        return
+
+    if fingerprint_cache:
+        recent = {item['OperatorID'] for item in outdated_items
+                  if fingerprint_cache.seen_since(item['OperatorID'], cutoff_date_str)}
+        outdated_items = [item for item in outdated_items if item['OperatorID'] not in recent]
+        print(f"Skipped {len(recent)} operators written within {DAYS_LIMIT} days")
+
+    print(f"Found {len(outdated_items)} outdated items")
+
+    updates = [{
+        'Key': {'OperatorID': item['OperatorID']},
+        'UpdateExpression': 'SET ValidatorCount = :zero, last_updated = :last_updated',
+        'ConditionExpression': 'last_updated < :cutoff_date',
+        'ExpressionAttributeValues': {
+            ':zero': 0,
+            ':last_updated': today_str,
+            ':cutoff_date': cutoff_date_str
+        }
+    } for item in outdated_items]
 
+    writer = DynamoDBWriter(table_name, max_workers=write_workers)
+    written, skipped, failed = writer.update_items(updates, operation='collector.zero_outdated_operator')
+    print(f"Zeroed {written} outdated operators, {skipped} no longer outdated, {len(failed)} failed")
+
+    if fingerprint_cache:
+        for item in outdated_items:
+            fingerprint_cache.forget(item['OperatorID'])
+        fingerprint_cache.save()
 
 
+# Prints the storage metrics recorded during this run, one line per operation
+def print_metrics_summary():
+    for name, stats in sorted(METRICS.summary().items()):
+        print(f"{name}: calls={stats['calls']} errors={stats['errors']} time={stats['total_time']:.2f}s "
+              f"scanned={stats['items_scanned']} rcu={stats['rcu']:.1f} wcu={stats['wcu']:.1f}")
+
 
 def main():
     parser = argparse.ArgumentParser(description='Fetch and update operator performance data, bro.')
-    parser.add_argument('-t', '--time_period', type=str, choices=['24h', '30d'], default='24h',
-                        help='The reporting time period for performance data (24h or 30d).')
+    parser.add_argument('-p', '--period', type=parse_period, action='append', dest='periods', metavar='PERIOD[:ATTRIBUTE]',
+                        help='A reporting period and the attribute in DynamoDB to store it in, e.g. 24h:Performance24h. '
+                             'May be repeated; all periods are collected in one crawl and written in one update per '
+                             f"operator. Periods: {', '.join(PERFORMANCE_PERIOD_FIELDS)}.")
+    parser.add_argument('-t', '--time_period', type=str, choices=list(PERFORMANCE_PERIOD_FIELDS), default='24h',
+                        help='The reporting time period for performance data, used with --attribute when --period is not given.')
     parser.add_argument('-n', '--network', type=str, choices=['mainnet', 'goerli', 'holesky'], default='mainnet',
                         help='The SSV network to fetch data from (mainnet, goerli, or holesky).')
     parser.add_argument('--table', type=str, required=True,
                         help='The DynamoDB table to update, dude.')
-    parser.add_argument('--attribute', type=str, required=True,
-                        help='The attribute name in DynamoDB to update.')
+    parser.add_argument('--attribute', type=str,
+                        help='The attribute name in DynamoDB to update for --time_period, when --period is not given.')
     parser.add_argument('--page_size', type=int, default=100,
                         help='The number of items per page for API queries (default: 100).')
+    parser.add_argument('--requests_per_minute', type=float, default=REQUESTS_PER_MINUTE,
+                        help=f'Maximum SSV API request rate (default: {REQUESTS_PER_MINUTE}).')
+    parser.add_argument('--write_workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f'Number of concurrent DynamoDB writers (default: {DEFAULT_MAX_WORKERS}).')
+    parser.add_argument('--fingerprint_cache', type=str,
+                        help='Local file recording the last values written, used to skip unchanged writes.')
+    parser.add_argument('--staleness_index', type=str, default=DYNDB_PERF_STALENESS_INDEX,
+                        help=f'GSI on isVO and last_updated used to find outdated operators (default: {DYNDB_PERF_STALENESS_INDEX}).')
     parser.add_argument('--utc', action='store_true',
                         help='If set, use the current date in UTC for the target date.')
     parser.add_argument('--overwrite', action='store_true',
                         help='If set, overwrite existing performance data.')
+    parser.add_argument('--hourly', action='store_true',
+                        help=f"If set, collect the hourly periods ({', '.join(PERFORMANCE_HOURLY_PERIOD_FIELDS)}) for the current "
+                             'UTC hour into the hourly history of each operator, instead of daily performance data.')
     args = parser.parse_args()
 
     base_url = f"https://api.ssv.network/api/v4/{args.network}/operators/?validatorsCount=true"
-    operators = fetch_and_filter_data(
-        base_url, args.time_period, args.page_size
-    )
+
+    if args.hourly:
+        hour = epoch_hour(datetime.now(timezone.utc))
+        periods = PERFORMANCE_HOURLY_PERIOD_FIELDS
+        client = SSVApiClient(base_url, page_size=args.page_size, requests_per_minute=args.requests_per_minute)
+        try:
+            ingest_hourly_performance(client, args.table, hour, periods, args.write_workers)
+        finally:
+            client.close()
+
+        with METRICS.measure('collector.update_watermark'):
+            DynamoDBWriter(args.table).update_watermark(list(periods.values()), hour_key(hour), touch_updated=False)
+
+        print_metrics_summary()
+        return
+
+    if args.periods:
+        periods = dict(args.periods)
+    elif args.attribute:
+        periods = {args.time_period: args.attribute}
+    else:
+        parser.error('either --period or --attribute is required')
 
     if args.utc:
         target_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
     else:
         target_date = datetime.now().strftime("%Y-%m-%d")
 
-    update_dynamodb_performance_data(args.table, operators, target_date, args.attribute, args.time_period, args.overwrite)
+    client = SSVApiClient(base_url, page_size=args.page_size, requests_per_minute=args.requests_per_minute)
+    fingerprint_cache = FingerprintCache(args.fingerprint_cache, args.table) if args.fingerprint_cache else None
+
+    try:
+        ingest_performance_data(client, args.table, target_date, periods, args.overwrite, args.write_workers,
+                                fingerprint_cache)
+    finally:
+        client.close()
+
+    with METRICS.measure('collector.update_watermark'):
+        DynamoDBWriter(args.table).update_watermark(list(periods.values()), target_date)
+
+    with METRICS.measure('collector.cleanup_outdated_records'):
+        cleanup_outdated_records(args.table, fingerprint_cache, args.staleness_index, args.write_workers)
 
-    cleanup_outdated_records(args.table)
+    print_metrics_summary()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,368 @@
+import os
+import glob
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+from .storage_data_interface import DataStorageInterface
+from .storage_snapshot import PerformanceSnapshot, write_performance_snapshot
+
+# Maximum age of a cached snapshot, in seconds, regardless of data version
+DEFAULT_CACHE_TTL = 3600
+
+# Minimum time, in seconds, between checks of the underlying data version
+DEFAULT_VERSION_CHECK_INTERVAL = 60
+
+
+# Wraps any DataStorageInterface implementation and keeps the parsed results of
+# get_performance_all() in memory, one snapshot per field selection and date window.
+# Reads by operator ID are served from the snapshot with the same selection and window.
+# Cached data is dropped when the data version of the wrapped storage changes
+# (latest data date or collector update time), or when it is older than the TTL.
+# Subscription methods are passed straight through to the wrapped storage.
+#
+# If snapshot_path is set, each loaded snapshot is also written to a binary snapshot
+# file, one per field selection and date window, named after snapshot_path with a
+# hash of the selection added (e.g. perf-0123456789ab.snapshot). All of them are
+# memory-mapped on startup. Outdated snapshots are then kept and served while a fresh
+# load runs in the background, instead of being dropped.
+#
+# Snapshot listeners, e.g. caches of data derived from the snapshot, are called in a
+# background thread with each newly loaded snapshot.
+#
+# Storage reads are made without holding the cache lock, so a slow snapshot load does
+# not block reads served from other snapshots. Concurrent misses on the same snapshot
+# wait for a single load.
+class CachedStorage(DataStorageInterface):
+
+    def __init__(self, storage, ttl=DEFAULT_CACHE_TTL, check_interval=DEFAULT_VERSION_CHECK_INTERVAL, snapshot_path=None):
+        self.storage = storage
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.snapshot_path = snapshot_path
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._version = None
+        self._checked_at = None
+        self._version_checked = threading.Event()
+        self._snapshots = {}
+        self._loading = {}
+        self._refreshing = set()
+        self._latest_date = None
+        self._latest_date_loaded_at = None
+        self._listeners = []
+
+        if snapshot_path:
+            self._open_snapshot_files()
+
+
+    # Returns dict of operator IDs to performance data for all operator IDs
+    def get_performance_all(self, fields=None, days=None):
+        key = self._snapshot_key(fields, days)
+        self._check_version()
+
+        with self._lock:
+            if key in self._snapshots:
+                self.hits += 1
+                return self._snapshots[key]['data']
+
+            self.misses += 1
+            load = self._loading.get(key)
+            if load is not None:
+                waiting = True
+            else:
+                waiting = False
+                load = self._loading[key] = Future()
+                version = self._version
+
+        # Another thread is already loading this snapshot
+        if waiting:
+            return load.result()
+
+        return self._load_snapshot(key, fields, days, load, version)
+
+
+    # Returns dict of operator IDs to performance data for specified operator IDs.
+    # Served from a matching snapshot if there is one; otherwise read from the
+    # wrapped storage without loading a full snapshot.
+    def get_performance_by_opids(self, op_ids, fields=None, days=None):
+        key = self._snapshot_key(fields, days)
+        self._check_version()
+
+        with self._lock:
+            if key in self._snapshots:
+                self.hits += 1
+                snapshot = self._snapshots[key]['data']
+                op_ids = set(map(int, op_ids))
+                return {op_id: snapshot[op_id] for op_id in op_ids if op_id in snapshot}
+
+            self.misses += 1
+
+        return self.storage.get_performance_by_opids(op_ids, fields=fields, days=days)
+
+
+    def get_latest_perf_data_date(self):
+        self._check_version()
+
+        with self._lock:
+            if self._latest_date is not None:
+                self.hits += 1
+                return self._latest_date
+
+            self.misses += 1
+
+        latest_date = self.storage.get_latest_perf_data_date()
+
+        with self._lock:
+            self._latest_date = latest_date
+            self._latest_date_loaded_at = time.monotonic()
+
+        return latest_date
+
+
+    def get_data_version(self):
+        return self.storage.get_data_version()
+
+
+    # Subscriptions are not cached here; the wrapped storage keeps its own index
+    def get_subscriptions_by_type(self, subscription_type):
+        return self.storage.get_subscriptions_by_type(subscription_type)
+
+
+    def get_subscriptions_by_userid(self, user_id):
+        return self.storage.get_subscriptions_by_userid(user_id)
+
+
+    def add_user_subscription(self, user_id, op_id, subscription_type):
+        return self.storage.add_user_subscription(user_id, op_id, subscription_type)
+
+
+    def del_user_subscription(self, user_id, op_id, subscription_type):
+        return self.storage.del_user_subscription(user_id, op_id, subscription_type)
+
+
+    async def get_subscriptions_by_type_async(self, subscription_type):
+        return await self.storage.get_subscriptions_by_type_async(subscription_type)
+
+
+    async def get_subscriptions_by_userid_async(self, user_id):
+        return await self.storage.get_subscriptions_by_userid_async(user_id)
+
+
+    async def add_user_subscription_async(self, user_id, op_id, subscription_type):
+        return await self.storage.add_user_subscription_async(user_id, op_id, subscription_type)
+
+
+    async def del_user_subscription_async(self, user_id, op_id, subscription_type):
+        return await self.storage.del_user_subscription_async(user_id, op_id, subscription_type)
+
+
+    # Returns cache hit/miss counters and the number of cached snapshots
+    def get_cache_stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'snapshots': len(self._snapshots),
+                'refreshing': len(self._refreshing)
+            }
+
+
+    # Registers callback(perf_data) to be called with every snapshot loaded from now on,
+    # and with the snapshots already cached
+    def add_snapshot_listener(self, callback):
+        with self._lock:
+            self._listeners.append(callback)
+            for snapshot in self._snapshots.values():
+                self._notify(snapshot['data'], [callback])
+
+
+    # Drops all cached data
+    def invalidate(self):
+        with self._lock:
+            self._snapshots = {}
+            self._latest_date = None
+            self._latest_date_loaded_at = None
+
+
+    # Expires cached data past the TTL and, at most once per check interval, checks
+    # the data version of the wrapped storage. Outdated snapshots are dropped, or
+    # refreshed in the background while still being served if snapshot files are used.
+    # Only one thread checks the version at a time; other threads carry on with the
+    # version already known, or wait for the first check to finish.
+    def _check_version(self):
+        now = time.monotonic()
+
+        with self._lock:
+            checking = self._checked_at is None or now - self._checked_at >= self.check_interval
+            if checking:
+                checked_at, self._checked_at = self._checked_at, now
+
+        if checking:
+            try:
+                version = self.storage.get_data_version()
+            except Exception:
+                with self._lock:
+                    self._checked_at = checked_at
+                raise
+            finally:
+                self._version_checked.set()
+        else:
+            self._version_checked.wait()
+
+        with self._lock:
+            if checking and version != self._version:
+                if self._version is not None:
+                    logging.info(f"Performance data version changed: {version}")
+                self._version = version
+                self._latest_date = None
+
+            self._expire(now)
+
+
+    # Drops, or refreshes in the background, cached data that is outdated or past the
+    # TTL. Must be called with the lock held.
+    def _expire(self, now):
+        if self._latest_date is not None and now - self._latest_date_loaded_at >= self.ttl:
+            self._latest_date = None
+
+        for key, snapshot in list(self._snapshots.items()):
+            if snapshot['version'] == repr(self._version) and now - snapshot['loaded_at'] < self.ttl:
+                continue
+
+            if self.snapshot_path:
+                self._refresh_in_background(key)
+            else:
+                del self._snapshots[key]
+
+
+    # Loads a fresh snapshot from the wrapped storage and passes the result, or error,
+    # to threads waiting on the load. Empty results are not cached.
+    def _load_snapshot(self, key, fields, days, load, version):
+        try:
+            perf_data = self.storage.get_performance_all(fields=fields, days=days)
+        except Exception as e:
+            with self._lock:
+                del self._loading[key]
+            load.set_exception(e)
+            raise
+
+        with self._lock:
+            if perf_data:
+                self._store_snapshot(key, perf_data, version)
+            del self._loading[key]
+
+        load.set_result(perf_data)
+        return perf_data
+
+
+    # Snapshot versions are kept as repr() strings so that versions read back from
+    # snapshot files compare equal to live data versions
+    def _store_snapshot(self, key, perf_data, version):
+        self._snapshots[key] = {'data': perf_data, 'version': repr(version), 'loaded_at': time.monotonic()}
+        self._notify(perf_data, self._listeners)
+
+        if self.snapshot_path:
+            threading.Thread(target=self._write_snapshot_file, args=(key, perf_data, version), daemon=True).start()
+
+
+    def _notify(self, perf_data, listeners):
+        if listeners:
+            threading.Thread(target=self._call_listeners, args=(perf_data, list(listeners)), daemon=True).start()
+
+
+    @staticmethod
+    def _call_listeners(perf_data, listeners):
+        for callback in listeners:
+            try:
+                callback(perf_data)
+            except Exception as e:
+                logging.error(f"Snapshot listener failed: {e}", exc_info=True)
+
+
+    # Starts a background load for a snapshot key, unless one is already running.
+    # Must be called with the lock held.
+    def _refresh_in_background(self, key):
+        if key in self._refreshing:
+            return
+
+        self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key,), daemon=True).start()
+
+
+    def _refresh(self, key):
+        fields, days = list(key[0]) if key[0] else None, key[1]
+
+        try:
+            version = self.storage.get_data_version()
+            perf_data = self.storage.get_performance_all(fields=fields, days=days)
+
+            with self._lock:
+                if perf_data:
+                    self._store_snapshot(key, perf_data, version)
+                else:
+                    self._snapshots.pop(key, None)
+
+        except Exception as e:
+            logging.error(f"Failed to refresh performance snapshot: {e}", exc_info=True)
+
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+
+    def _write_snapshot_file(self, key, perf_data, version):
+        path = self._snapshot_file(key)
+        try:
+            with self._write_lock:
+                write_performance_snapshot(path, perf_data, metadata={
+                    'fields': list(key[0]) if key[0] else None,
+                    'days': key[1],
+                    'version': repr(version)
+                })
+        except Exception as e:
+            logging.error(f"Failed to write performance snapshot {path}: {e}", exc_info=True)
+
+
+    # The snapshot file for a snapshot key: snapshot_path with a hash of the key added
+    # before the extension
+    def _snapshot_file(self, key):
+        root, extension = os.path.splitext(self.snapshot_path)
+        return f"{root}-{hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:12]}{extension}"
+
+
+    # Installs every snapshot file as a cached snapshot. If its recorded data version is
+    # still current it is used as is; otherwise it is served until a refresh completes.
+    # Files whose name does not match the key they hold are left alone.
+    def _open_snapshot_files(self):
+        root, extension = os.path.splitext(self.snapshot_path)
+
+        for path in sorted(glob.glob(f"{glob.escape(root)}-*{glob.escape(extension)}")):
+            if path.endswith('.tmp'):
+                continue
+
+            try:
+                snapshot = PerformanceSnapshot(path)
+            except Exception as e:
+                logging.warning(f"Unable to open performance snapshot {path}: {e}")
+                continue
+
+            metadata = snapshot.metadata
+            key = self._snapshot_key(metadata.get('fields'), metadata.get('days'))
+            if self._snapshot_file(key) != path:
+                snapshot.close()
+                continue
+
+            self._snapshots[key] = {'data': snapshot, 'version': metadata.get('version'), 'loaded_at': time.monotonic()}
+            logging.info(f"Loaded {len(snapshot)} operators from performance snapshot {path}")
+
+
+    @staticmethod
+    def _snapshot_key(fields, days):
+        return (tuple(sorted(fields)) if fields else None, days)
+
@@ -1,15 +1,41 @@
-from typing import List, Dict, Any
+import asyncio
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+from common.config import STORAGE_ASYNC_WORKERS
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# Returns the bounded thread pool shared by all storage instances for running
+# blocking storage calls outside of the asyncio event loop
+def get_storage_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=STORAGE_ASYNC_WORKERS, thread_name_prefix='storage')
+        return _executor
+
 
 class DataStorageInterface:
-    def get_performance_all(self) -> List[Dict[str, Any]]:
+    # fields limits the attributes returned for each operator. days limits performance
+    # data to that many dates, ending at the latest data date. None means everything.
+    def get_performance_all(self, fields: Optional[List[str]] = None, days: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
         ...
 
-    def get_performance_by_opids(self, opids: List[int]) -> List[Dict[str, Any]]:
+    def get_performance_by_opids(self, opids: List[int], fields: Optional[List[str]] = None, days: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
         ...
 
     def get_latest_perf_data_date(self) -> str:
         ...
 
+    # Returns a value that changes whenever the underlying performance data changes.
+    # Implementations with a cheaper change marker than the latest date should override.
+    def get_data_version(self) -> Any:
+        return self.get_latest_perf_data_date()
+
     def get_subscriptions_by_type(self, sub_type: str) -> Dict[str, Any]:
         ...
 
@@ -20,4 +46,32 @@ class DataStorageInterface:
         ...
 
     def del_user_subscription(self, user_id: int, op_id: int, sub_type: str) -> Dict[str, Any]:
-        ...
\ No newline at end of file
+        ...
+
+    # Async counterparts of the methods above, for use from the Discord event loop.
+    # Each runs the blocking method on the shared storage executor so that slow
+    # storage calls do not block the event loop and concurrent calls overlap.
+    async def get_performance_all_async(self, fields: Optional[List[str]] = None, days: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
+        return await self._run_async(self.get_performance_all, fields=fields, days=days)
+
+    async def get_performance_by_opids_async(self, opids: List[int], fields: Optional[List[str]] = None, days: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
+        return await self._run_async(self.get_performance_by_opids, opids, fields=fields, days=days)
+
+    async def get_latest_perf_data_date_async(self) -> str:
+        return await self._run_async(self.get_latest_perf_data_date)
+
+    async def get_subscriptions_by_type_async(self, sub_type: str) -> Dict[str, Any]:
+        return await self._run_async(self.get_subscriptions_by_type, sub_type)
+
+    async def get_subscriptions_by_userid_async(self, user_id: int) -> Dict[str, Any]:
+        return await self._run_async(self.get_subscriptions_by_userid, user_id)
+
+    async def add_user_subscription_async(self, user_id: int, op_id: int, sub_type: str) -> Dict[str, Any]:
+        return await self._run_async(self.add_user_subscription, user_id, op_id, sub_type)
+
+    async def del_user_subscription_async(self, user_id: int, op_id: int, sub_type: str) -> Dict[str, Any]:
+        return await self._run_async(self.del_user_subscription, user_id, op_id, sub_type)
+
+    async def _run_async(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_storage_executor(), partial(func, *args, **kwargs))
@@ -1,79 +1,262 @@
+import time
+import logging
+import threading
 import boto3
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
 from common.config import *
+from common.metrics import METRICS
+from common.hourly_history import HourlyHistory
 from boto3.dynamodb.conditions import Attr, Key
 from .storage_data_interface import DataStorageInterface
+from .storage_subscription_index import SubscriptionIndex
+
+# Maximum number of keys DynamoDB accepts in a single BatchGetItem request
+BATCH_GET_MAX_KEYS = 100
+
+# Retry behaviour for BatchGetItem UnprocessedKeys
+BATCH_GET_MAX_RETRIES = 8
+BATCH_GET_BASE_DELAY = 0.05
+
+# Retry behaviour for throttled or failed scan pages
+SCAN_MAX_RETRIES = 5
+SCAN_BASE_DELAY = 0.2
+SCAN_RETRYABLE_ERRORS = {
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+    'InternalServerError',
+    'ServiceUnavailable'
+}
 
 
 class DynamoDBStorage(DataStorageInterface):
 
     def __init__(self, **kwargs):
-        self.dynamodb = boto3.resource('dynamodb')
+        self._local = threading.local()
         self.table = kwargs.get('table')
 
-
-    # Returns dict of operator IDs to DynamoDB data for all operator IDs
-    def get_performance_all(self):
+        # Number of parallel scan segments used for full table loads, and the
+        # number of threads used to scan them. One segment is a sequential scan.
+        self.scan_segments = max(1, int(kwargs.get('scan_segments', 1)))
+        self.scan_workers = max(1, int(kwargs.get('scan_workers', self.scan_segments)))
+
+        # Subscription GSI keyed on SubscriptionType, and the in-memory subscription
+        # indexes loaded from it, by subscription type
+        self.subscription_type_index = kwargs.get('subscription_type_index', DYNDB_SUB_TYPE_INDEX)
+        self.subscription_index_ttl = kwargs.get('subscription_index_ttl', SUBSCRIPTION_INDEX_TTL)
+        self._subscription_indexes = {}
+        self._subscription_lock = threading.Lock()
+
+
+    # boto3 resources are not thread safe. Storage calls run on executor threads,
+    # so each thread gets its own resource.
+    @property
+    def dynamodb(self):
+        if not hasattr(self._local, 'dynamodb'):
+            self._local.dynamodb = boto3.session.Session().resource('dynamodb')
+        return self._local.dynamodb
+
+
+    # Returns dict of operator IDs to DynamoDB data for all operator IDs.
+    # fields limits the attributes read and days limits performance data to
+    # that many dates ending at the latest data date (see _build_projection).
+    @METRICS.measured
+    def get_performance_all(self, fields=None, days=None):
         perf_data = {}
 
-        daily_perf_data = self._load_performance_data()
+        daily_perf_data = self._load_performance_data(projection=self._build_projection(fields, days), fields=fields)
         for row in daily_perf_data:
             perf_data[row[FIELD_OPERATOR_ID]] = row
 
         return perf_data
 
 
-    # Returns dict of operator IDs to DynamoDB data for specified operator IDs
-    def get_performance_by_opids(self, op_ids):
+    # Returns dict of operator IDs to DynamoDB data for specified operator IDs.
+    # Reads only the requested keys with BatchGetItem, so cost is proportional
+    # to the number of operator IDs rather than to the size of the table. Falls
+    # back to a full table scan if the batch read fails.
+    @METRICS.measured
+    def get_performance_by_opids(self, op_ids, fields=None, days=None):
         perf_data = {}
+        projection = self._build_projection(fields, days)
+
+        try:
+            daily_perf_data = self._batch_load_performance_data(op_ids, projection=projection, fields=fields)
+        except ClientError as e:
+            logging.warning(f"BatchGetItem failed, falling back to table scan: {e}")
+            daily_perf_data = self._load_performance_data(op_ids, projection=projection, fields=fields)
 
-        daily_perf_data = self._load_performance_data(op_ids)
         for row in daily_perf_data:
             perf_data[row[FIELD_OPERATOR_ID]] = row
 
         return perf_data
 
-    def _load_performance_data(self, operator_ids=None):
-        table = self.dynamodb.Table(self.table)
+    # Builds ProjectionExpression arguments that read only the requested fields and,
+    # for performance fields, only the date keys in the last `days` days up to the
+    # latest date recorded in the watermark (or today, if there is no watermark).
+    # Returns an empty dict, meaning whole items, if neither limit is given.
+    def _build_projection(self, fields=None, days=None):
+        if not fields and not days:
+            return {}
+
+        fields = set(fields) if fields else set(PERFORMANCE_ITEM_FIELDS)
+        fields.add(FIELD_OPERATOR_ID)
+
+        watermark = self._get_watermark() if days else None
+        today = datetime.now().strftime('%Y-%m-%d')
+
+        names = {}
+        paths = []
+        date_placeholders = {}
+
+        for i, field in enumerate(sorted(fields)):
+            field_placeholder = f"#f{i}"
+            names[field_placeholder] = field
+
+            if not days or field not in PERFORMANCE_DATA_FIELDS:
+                paths.append(field_placeholder)
+                continue
+
+            latest = (watermark or {}).get(FIELD_LATEST_DATE_PREFIX + field) or today
+            latest_date = datetime.strptime(latest, '%Y-%m-%d')
+
+            for x in range(days):
+                date = (latest_date - timedelta(days=x)).strftime('%Y-%m-%d')
+                if date not in date_placeholders:
+                    date_placeholders[date] = f"#d{len(date_placeholders)}"
+                    names[date_placeholders[date]] = date
+                paths.append(f"{field_placeholder}.{date_placeholders[date]}")
+
+        return {
+            'ProjectionExpression': ', '.join(paths),
+            'ExpressionAttributeNames': names
+        }
+
+    # Reads performance items by key in chunks of BATCH_GET_MAX_KEYS, retrying
+    # any UnprocessedKeys with exponential backoff. Raises ClientError on failure.
+    def _batch_load_performance_data(self, operator_ids, projection=None, fields=None):
+        op_ids = sorted(set(map(int, operator_ids))) if operator_ids else []
+        data = []
+
+        for start in range(0, len(op_ids), BATCH_GET_MAX_KEYS):
+            keys = [{FIELD_OPERATOR_ID: op_id} for op_id in op_ids[start:start + BATCH_GET_MAX_KEYS]]
+            request_items = {self.table: {'Keys': keys, **(projection or {})}}
+            retries = 0
+
+            while request_items:
+                response = self.dynamodb.batch_get_item(RequestItems=request_items, ReturnConsumedCapacity='TOTAL')
+                METRICS.add_response(response)
+
+                for item in response.get('Responses', {}).get(self.table, []):
+                    data.append(self._parse_performance_item(item, fields))
+
+                request_items = response.get('UnprocessedKeys')
+                if request_items:
+                    if retries >= BATCH_GET_MAX_RETRIES:
+                        raise ClientError(
+                            {'Error': {'Code': 'UnprocessedKeys',
+                                       'Message': f"Keys still unprocessed after {retries} retries"}},
+                            'BatchGetItem')
+                    time.sleep(BATCH_GET_BASE_DELAY * (2 ** retries))
+                    retries += 1
+
+        return data
+
+    # Loads performance data rows with a table scan, optionally filtered to the
+    # provided operator IDs. If scan_segments > 1 the table is scanned as a
+    # DynamoDB parallel scan, one segment per thread, and the results merged.
+    def _load_performance_data(self, operator_ids=None, projection=None, fields=None):
         op_ids = set(map(int, operator_ids)) if operator_ids else None
+
+        if self.scan_segments <= 1:
+            try:
+                return self._scan_segment(op_ids, projection=projection, fields=fields)
+            except ClientError as e:
+                logging.error(f"Failed to load performance data: {e}", exc_info=True)
+                return []
+
         data = []
+        with ThreadPoolExecutor(max_workers=min(self.scan_workers, self.scan_segments)) as executor:
+            scan_segment = METRICS.bind(METRICS.current(), self._scan_segment)
+            futures = [executor.submit(scan_segment, op_ids, segment, self.scan_segments, projection, fields)
+                       for segment in range(self.scan_segments)]
+            for segment, future in enumerate(futures):
+                try:
+                    data.extend(future.result())
+                except ClientError as e:
+                    logging.error(f"Failed to load performance data segment {segment}: {e}", exc_info=True)
 
-        try:
-            response = table.scan()
-            while 'Items' in response:
-                for item in response['Items']:
-                    if op_ids and int(item[FIELD_OPERATOR_ID]) not in op_ids:
-                        continue
-                    data_points_24h = self._parse_performance_data(item, FIELD_PERF_DATA_24H)
-                    data_points_30d = self._parse_performance_data(item, FIELD_PERF_DATA_30D)
-
-                    validator_count_str = item.get(FIELD_VALIDATOR_COUNT, '0')
-                    try:
-                        validator_count = int(validator_count_str) if validator_count_str else 0
-                    except ValueError:
-                        validator_count = 0
-
-                    data_row = {
-                        FIELD_OPERATOR_ID: int(item[FIELD_OPERATOR_ID]),
-                        FIELD_OPERATOR_NAME: item[FIELD_OPERATOR_NAME],
-                        FIELD_IS_VO: bool(item.get(FIELD_IS_VO, False)),
-                        FIELD_IS_PRIVATE: bool(item.get(FIELD_IS_PRIVATE, False)),
-                        FIELD_VALIDATOR_COUNT: validator_count,
-                        FIELD_ADDRESS: item.get(FIELD_ADDRESS),
-                        FIELD_PERF_DATA_24H: data_points_24h,
-                        FIELD_PERF_DATA_30D: data_points_30d
-                    }
-                    data.append(data_row)
-
-                if 'LastEvaluatedKey' in response:
-                    response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-                else:
-                    break
+        return data
 
-        except ClientError as e:
-            logging.error(f"Failed to load performance data: {e}", exc_info=True)
+    # Scans a single segment of the performance table, following LastEvaluatedKey
+    # until the segment is exhausted. Throttled pages are retried with exponential
+    # backoff from the same start key. Raises ClientError when retries run out.
+    def _scan_segment(self, op_ids, segment=None, total_segments=None, projection=None, fields=None):
+        table = self.dynamodb.Table(self.table)
+        scan_kwargs = dict(projection or {}, ReturnConsumedCapacity='TOTAL')
+        if segment is not None:
+            scan_kwargs['Segment'] = segment
+            scan_kwargs['TotalSegments'] = total_segments
+
+        data = []
+        retries = 0
+
+        while True:
+            try:
+                response = table.scan(**scan_kwargs)
+                METRICS.add_response(response)
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') not in SCAN_RETRYABLE_ERRORS or retries >= SCAN_MAX_RETRIES:
+                    raise
+                time.sleep(SCAN_BASE_DELAY * (2 ** retries))
+                retries += 1
+                continue
+
+            retries = 0
+            for item in response.get('Items', []):
+                if int(item[FIELD_OPERATOR_ID]) < 0:
+                    continue  # Collector metadata items such as the latest date watermark
+                if op_ids and int(item[FIELD_OPERATOR_ID]) not in op_ids:
+                    continue
+                data.append(self._parse_performance_item(item, fields))
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
 
         return data
 
+    # Converts a raw DynamoDB performance item into a performance data row,
+    # limited to the requested fields if any
+    def _parse_performance_item(self, item, fields=None):
+        data_points_24h = self._parse_performance_data(item, FIELD_PERF_DATA_24H)
+        data_points_30d = self._parse_performance_data(item, FIELD_PERF_DATA_30D)
+
+        validator_count_str = item.get(FIELD_VALIDATOR_COUNT, '0')
+        try:
+            validator_count = int(validator_count_str) if validator_count_str else 0
+        except ValueError:
+            validator_count = 0
+
+        row = {
+            FIELD_OPERATOR_ID: int(item[FIELD_OPERATOR_ID]),
+            FIELD_OPERATOR_NAME: item.get(FIELD_OPERATOR_NAME),
+            FIELD_IS_VO: bool(item.get(FIELD_IS_VO, False)),
+            FIELD_IS_PRIVATE: bool(item.get(FIELD_IS_PRIVATE, False)),
+            FIELD_VALIDATOR_COUNT: validator_count,
+            FIELD_ADDRESS: item.get(FIELD_ADDRESS),
+            FIELD_PERF_DATA_24H: data_points_24h,
+            FIELD_PERF_DATA_30D: data_points_30d,
+            FIELD_PERF_DATA_1H: self._parse_hourly_data(item, FIELD_PERF_DATA_1H)
+        }
+
+        if fields:
+            row = {field: value for field, value in row.items() if field == FIELD_OPERATOR_ID or field in fields}
+
+        return row
+
     def _parse_performance_data(self, item, field):
         data_points = {}
         if field in item and isinstance(item[field], dict):
@@ -87,10 +270,62 @@ class DynamoDBStorage(DataStorageInterface):
                     data_points[date] = None
         return data_points
 
+    # Decodes an hourly history attribute into a dict of hour keys to values. Maps
+    # written before the hourly history existed are read as they are.
+    def _parse_hourly_data(self, item, field):
+        if field not in item:
+            return {}
+        if isinstance(item[field], dict):
+            return self._parse_performance_data(item, field)
+
+        try:
+            return HourlyHistory.decode(item[field]).to_dict()
+        except (ValueError, TypeError) as e:
+            logging.error(f"Failed to decode {field} of operator {item.get(FIELD_OPERATOR_ID)}: {e}")
+            return {}
+
+
+    # Returns the latest date written to the 24h performance attribute, read from the
+    # watermark item maintained by the collectors with a single GetItem.
+    @METRICS.measured(count_result=False)
+    def get_latest_perf_data_date(self):
+        watermark = self._get_watermark()
+        if watermark and watermark.get(FIELD_LATEST_DATE_PREFIX + FIELD_PERF_DATA_24H):
+            return watermark[FIELD_LATEST_DATE_PREFIX + FIELD_PERF_DATA_24H]
+
+        logging.warning("Latest data watermark not found, falling back to table scan")
+        return self._scan_latest_perf_data_date()
+
+    # Returns the watermark dates and update timestamp as the data version, so that
+    # any daily collector run is detected. Hourly runs are left out, so they do not drop
+    # cached daily data every hour; cached hourly data is refreshed by the cache TTL.
+    # None if the collectors have not written a watermark.
+    @METRICS.measured(count_result=False)
+    def get_data_version(self):
+        watermark = self._get_watermark()
+        if not watermark:
+            return None
+
+        hourly_keys = {FIELD_LATEST_DATE_PREFIX + field for field in PERFORMANCE_HOURLY_FIELDS}
+        return tuple(sorted((key, str(value)) for key, value in watermark.items()
+                            if key != FIELD_OPERATOR_ID and key not in hourly_keys))
+
+    # Returns the collector watermark item, or None if not present
+    def _get_watermark(self):
+        table = self.dynamodb.Table(self.table)
+
+        try:
+            response = table.get_item(Key={FIELD_OPERATOR_ID: WATERMARK_OPERATOR_ID}, ReturnConsumedCapacity='TOTAL')
+            METRICS.add_response(response)
+            return response.get('Item')
+        except ClientError as e:
+            logging.error(f"Failed to get latest data watermark: {e}", exc_info=True)
+            return None
 
     # Incredibly inefficient way to get latest performance date,
     # and also not accurate if we are only checking 24h data.
-    def get_latest_perf_data_date(self):
+    # Only used when the collectors have not yet written a watermark.
+    def _scan_latest_perf_data_date(self):
         perf_data = self._load_performance_data()
         if not perf_data:
             return None
@@ -109,52 +344,100 @@ class DynamoDBStorage(DataStorageInterface):
         return most_recent_date
 
 
+    # Returns all subscriptions of a type as a SubscriptionIndex. Served from an
+    # in-memory index kept up to date by add_user_subscription/del_user_subscription,
+    # which is loaded with a paginated query on the SubscriptionType GSI when missing
+    # or older than subscription_index_ttl. The cached index itself is returned, so
+    # callers must not change it. Subscription changes replace the cached index with an
+    # updated copy instead of changing it, so a returned index never changes.
+    @METRICS.measured
     def get_subscriptions_by_type(self, subscription_type):
+        with self._subscription_lock:
+            cached = self._subscription_indexes.get(subscription_type)
+            if cached and time.monotonic() - cached[1] < self.subscription_index_ttl:
+                return cached[0]
 
-        table = self.dynamodb.Table(self.table)
-        results = {}
+        results = SubscriptionIndex()
 
         try:
-            response = table.scan(
-                FilterExpression=Attr('SubscriptionType').eq(subscription_type)
-            )
-            for subscription in response['Items']:
+            for subscription in self._query_subscriptions_by_type(subscription_type):
                 if subscription['SubscriptionType'] != subscription_type:
                     continue
-                op_id = int(subscription['OperatorID'])
-                user_id = int(subscription['UserID'])
-                if op_id not in results:
-                    results[op_id] = {}
-                results[op_id][user_id] = { subscription_type: True }
+                results.add(int(subscription['UserID']), int(subscription['OperatorID']), subscription_type)
+
+            with self._subscription_lock:
+                self._subscription_indexes[subscription_type] = (results, time.monotonic())
+                return results
 
         except ClientError as e:
             logging.error(f"Failed to get subscriptions by type: {e}", exc_info=True)
 
         return results
 
+    # Applies change to a copy of the cached index for a subscription type, if there is
+    # one, and caches the copy in its place with the original load time
+    def _update_subscription_index(self, subscription_type, change):
+        with self._subscription_lock:
+            cached = self._subscription_indexes.get(subscription_type)
+            if cached:
+                index = cached[0].copy()
+                change(index)
+                self._subscription_indexes[subscription_type] = (index, cached[1])
 
+
+    # Yields all subscription items of a type, following LastEvaluatedKey. Uses the
+    # SubscriptionType GSI, falling back to a filtered scan if the index does not exist.
+    def _query_subscriptions_by_type(self, subscription_type):
+        table = self.dynamodb.Table(self.table)
+        request = {
+            'IndexName': self.subscription_type_index,
+            'KeyConditionExpression': Key('SubscriptionType').eq(subscription_type),
+            'ReturnConsumedCapacity': 'TOTAL'
+        }
+        read = table.query
+
+        try:
+            response = read(**request)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in ('ValidationException', 'ResourceNotFoundException'):
+                raise
+            logging.warning(f"Subscription type index {self.subscription_type_index} unavailable, falling back to table scan: {e}")
+            request = {'FilterExpression': Attr('SubscriptionType').eq(subscription_type), 'ReturnConsumedCapacity': 'TOTAL'}
+            read = table.scan
+            response = read(**request)
+
+        while True:
+            METRICS.add_response(response)
+            yield from response.get('Items', [])
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            response = read(ExclusiveStartKey=response['LastEvaluatedKey'], **request)
+
+
+    @METRICS.measured
     def get_subscriptions_by_userid(self, user_id):
 
         table = self.dynamodb.Table(self.table)
-        results = {}
+        results = SubscriptionIndex()
 
         try:
-            response = table.query(
-                KeyConditionExpression=Key('UserID').eq(str(user_id))
-            )
-            if response['Items']:
+            request = {'KeyConditionExpression': Key('UserID').eq(str(user_id)), 'ReturnConsumedCapacity': 'TOTAL'}
+            response = table.query(**request)
+            while True:
+                METRICS.add_response(response)
                 for item in response['Items']:
-                    op_id = int(item['OperatorID'])
-                    if op_id not in results:
-                        results[op_id] = {}
-                    if user_id not in results[op_id]:
-                        results[op_id][user_id] = {}
-                    results[op_id][user_id][item['SubscriptionType']] = True
+                    results.add(user_id, int(item['OperatorID']), item['SubscriptionType'])
+
+                if 'LastEvaluatedKey' not in response:
+                    break
+                response = table.query(ExclusiveStartKey=response['LastEvaluatedKey'], **request)
 
         except ClientError as e:
             logging.error(f"Failed to get subscriptions by user ID: {e}", exc_info=True)
         return results
 
+    @METRICS.measured(count_result=False)
     def add_user_subscription(self, user_id, op_id, subscription_type):
 
         table = self.dynamodb.Table(self.table)
@@ -167,14 +450,20 @@ class DynamoDBStorage(DataStorageInterface):
                     'OperatorID': op_id,
                     'SubscriptionType': subscription_type,
                     'SubscriptionInfo': sort_key
-                }
+                },
+                ReturnConsumedCapacity='TOTAL'
             )
+            METRICS.add_response(response, write=True)
+
+            self._update_subscription_index(subscription_type, lambda index: index.add(int(user_id), int(op_id), subscription_type))
+
             return response
 
         except ClientError as e:
             logging.error(f"Failed to add user subscription: {e}", exc_info=True)
             return None
 
+    @METRICS.measured(count_result=False)
     def del_user_subscription(self, user_id, op_id, subscription_type):
 
 
@@ -186,8 +475,13 @@ class DynamoDBStorage(DataStorageInterface):
                 Key={
                     'UserID': str(user_id),
                     'SubscriptionInfo': sort_key
-                }
+                },
+                ReturnConsumedCapacity='TOTAL'
             )
+            METRICS.add_response(response, write=True)
+
+            self._update_subscription_index(subscription_type, lambda index: index.remove(int(user_id), int(op_id), subscription_type))
+
             return response
 
         except self.dynamodb.meta.client.exceptions.ConditionalCheckFailedException as e:
@@ -1,16 +1,30 @@
 from .storage_dynamodb import DynamoDBStorage
+from .storage_sqlite import SQLiteStorage
+from .storage_cache import CachedStorage, DEFAULT_VERSION_CHECK_INTERVAL
 from typing import Dict, Any
 
 
 class StorageFactory:
     _instances: Dict[str, Any] = {}
 
+    # Pass cache_ttl (seconds) to wrap the storage in an in-memory CachedStorage,
+    # and snapshot_path to persist cached snapshots to memory-mapped snapshot files
     @staticmethod
     def initialize(storage_name:str , storage_type: str, **kwargs) -> None:
         if storage_name not in StorageFactory._instances:
             if storage_type == "DynamoDB":
                 StorageFactory._instances[storage_name] = DynamoDBStorage(**kwargs)
+            elif storage_type == "SQLite":
+                StorageFactory._instances[storage_name] = SQLiteStorage(**kwargs)
             # Add more storage types as needed
+
+            cache_ttl = kwargs.get('cache_ttl')
+            if cache_ttl and storage_name in StorageFactory._instances:
+                StorageFactory._instances[storage_name] = CachedStorage(
+                    StorageFactory._instances[storage_name],
+                    ttl=cache_ttl,
+                    check_interval=kwargs.get('cache_check_interval', DEFAULT_VERSION_CHECK_INTERVAL),
+                    snapshot_path=kwargs.get('snapshot_path'))
         else:
             raise Exception(f"{storage_name} storage is already initialized")
 
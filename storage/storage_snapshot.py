@@ -0,0 +1,197 @@
+import os
+import json
+import math
+import mmap
+import struct
+from collections.abc import Mapping
+from common.config import *
+
+# Compact binary snapshot of performance data, opened with mmap.
+#
+# Layout (little-endian):
+#   header         magic, format version, period count, operator count,
+#                  metadata length, string table length
+#   metadata       UTF-8 JSON: the dates of each period plus caller metadata
+#   string table   UTF-8 operator names and addresses
+#   operator table one fixed-size record per operator, sorted by operator ID
+#   matrices       one float32 operator x date matrix per period, in period order
+#
+# Matrix cells are NaN where an operator has no data point for a date, and +inf
+# where the data point exists but is None. Values are rounded back to the six
+# decimal places stored by the collectors when read.
+
+SNAPSHOT_MAGIC = b'VOPS'
+SNAPSHOT_VERSION = 1
+
+HEADER = struct.Struct('<4sHHIII')
+OPERATOR_RECORD = struct.Struct('<qIIIIqB7x')
+
+FLAG_IS_VO = 0x01
+FLAG_IS_PRIVATE = 0x02
+FLAG_HAS_NAME = 0x04
+FLAG_HAS_ADDRESS = 0x08
+
+
+def _align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+# Writes perf_data, a dict of operator IDs to performance data rows as returned by
+# get_performance_all(), to a snapshot file. The file is written to a temporary
+# path and then renamed, so readers never see a partial snapshot.
+def write_performance_snapshot(path, perf_data, metadata=None):
+    op_ids = sorted(perf_data.keys())
+    periods = [field for field in PERFORMANCE_DATA_FIELDS + PERFORMANCE_HOURLY_FIELDS
+               if any(field in perf_data[op_id] for op_id in op_ids)]
+    period_dates = {period: sorted({date for op_id in op_ids for date in (perf_data[op_id].get(period) or {})})
+                    for period in periods}
+    present_fields = sorted({field for op_id in op_ids for field in perf_data[op_id]})
+
+    strings = bytearray()
+    records = bytearray()
+
+    def add_string(value):
+        encoded = value.encode('utf-8')
+        offset = len(strings)
+        strings.extend(encoded)
+        return offset, len(encoded)
+
+    for op_id in op_ids:
+        row = perf_data[op_id]
+        flags = 0
+        name_offset = name_length = address_offset = address_length = 0
+
+        if row.get(FIELD_IS_VO):
+            flags |= FLAG_IS_VO
+        if row.get(FIELD_IS_PRIVATE):
+            flags |= FLAG_IS_PRIVATE
+        if row.get(FIELD_OPERATOR_NAME) is not None:
+            flags |= FLAG_HAS_NAME
+            name_offset, name_length = add_string(str(row[FIELD_OPERATOR_NAME]))
+        if row.get(FIELD_ADDRESS) is not None:
+            flags |= FLAG_HAS_ADDRESS
+            address_offset, address_length = add_string(str(row[FIELD_ADDRESS]))
+
+        records.extend(OPERATOR_RECORD.pack(int(op_id), name_offset, name_length, address_offset, address_length,
+                                            int(row.get(FIELD_VALIDATOR_COUNT) or 0), flags))
+
+    meta = {
+        'periods': [{'field': period, 'dates': period_dates[period]} for period in periods],
+        'fields': present_fields,
+        'metadata': metadata or {}
+    }
+    meta_bytes = json.dumps(meta).encode('utf-8')
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(periods), len(op_ids), len(meta_bytes), len(strings)))
+        file.write(meta_bytes)
+        file.write(strings)
+        file.write(b'\0' * (_align(file.tell()) - file.tell()))
+        file.write(records)
+
+        for period in periods:
+            dates = period_dates[period]
+            for op_id in op_ids:
+                data_points = perf_data[op_id].get(period) or {}
+                values = []
+                for date in dates:
+                    if date not in data_points:
+                        values.append(math.nan)
+                    elif data_points[date] is None:
+                        values.append(math.inf)
+                    else:
+                        values.append(float(data_points[date]))
+                file.write(struct.pack(f'<{len(dates)}f', *values))
+
+    os.replace(tmp_path, path)
+
+
+# Read-only view of a snapshot file. Behaves as a mapping of operator IDs to
+# performance data rows; rows are decoded from the mapped file on first access.
+class PerformanceSnapshot(Mapping):
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, period_count, operator_count, meta_length, strings_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} performance snapshot")
+
+        offset = HEADER.size
+        meta = json.loads(self._mmap[offset:offset + meta_length].decode('utf-8'))
+        offset += meta_length
+
+        self.metadata = meta['metadata']
+        self.fields = set(meta['fields'])
+        self._strings_offset = offset
+        self._records_offset = _align(offset + strings_length)
+        self._operator_count = operator_count
+
+        self._periods = []
+        matrix_offset = self._records_offset + operator_count * OPERATOR_RECORD.size
+        for period in meta['periods']:
+            self._periods.append((period['field'], period['dates'], matrix_offset))
+            matrix_offset += operator_count * len(period['dates']) * 4
+
+        self._index = {
+            OPERATOR_RECORD.unpack_from(self._mmap, self._records_offset + i * OPERATOR_RECORD.size)[0]: i
+            for i in range(operator_count)
+        }
+        self._rows = {}
+
+
+    def __getitem__(self, op_id):
+        row = self._rows.get(op_id)
+        if row is None:
+            if op_id not in self._index:
+                raise KeyError(op_id)
+            row = self._decode_row(self._index[op_id])
+            self._rows[op_id] = row
+        return row
+
+
+    def __iter__(self):
+        return iter(self._index)
+
+
+    def __len__(self):
+        return self._operator_count
+
+
+    def __contains__(self, op_id):
+        return op_id in self._index
+
+
+    def close(self):
+        self._mmap.close()
+
+
+    def _decode_row(self, index):
+        op_id, name_offset, name_length, address_offset, address_length, validator_count, flags = \
+            OPERATOR_RECORD.unpack_from(self._mmap, self._records_offset + index * OPERATOR_RECORD.size)
+
+        row = {
+            FIELD_OPERATOR_ID: op_id,
+            FIELD_OPERATOR_NAME: self._string(name_offset, name_length) if flags & FLAG_HAS_NAME else None,
+            FIELD_IS_VO: bool(flags & FLAG_IS_VO),
+            FIELD_IS_PRIVATE: bool(flags & FLAG_IS_PRIVATE),
+            FIELD_VALIDATOR_COUNT: validator_count,
+            FIELD_ADDRESS: self._string(address_offset, address_length) if flags & FLAG_HAS_ADDRESS else None
+        }
+
+        for field, dates, matrix_offset in self._periods:
+            values = struct.unpack_from(f'<{len(dates)}f', self._mmap, matrix_offset + index * len(dates) * 4)
+            row[field] = {date: (None if math.isinf(value) else round(value, 6))
+                          for date, value in zip(dates, values) if not math.isnan(value)}
+
+        return {field: value for field, value in row.items() if field in self.fields}
+
+
+    def _string(self, offset, length):
+        start = self._strings_offset + offset
+        return self._mmap[start:start + length].decode('utf-8')
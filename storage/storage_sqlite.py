@@ -0,0 +1,307 @@
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from common.config import *
+from common.metrics import METRICS
+from common.hourly_history import epoch_hour, hour_key
+from .storage_data_interface import DataStorageInterface
+from .storage_subscription_index import SubscriptionIndex
+
+# Maximum number of operator IDs bound in a single IN (...) clause
+SQLITE_MAX_IN_PARAMS = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS operators (
+    operator_id INTEGER PRIMARY KEY,
+    name TEXT,
+    is_vo INTEGER NOT NULL DEFAULT 0,
+    is_private INTEGER NOT NULL DEFAULT 0,
+    validator_count INTEGER NOT NULL DEFAULT 0,
+    address TEXT,
+    last_updated TEXT
+);
+
+CREATE TABLE IF NOT EXISTS performance (
+    operator_id INTEGER NOT NULL,
+    period TEXT NOT NULL,
+    date TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (operator_id, period, date)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS performance_period_date ON performance (period, date);
+
+CREATE TABLE IF NOT EXISTS subscriptions (
+    user_id INTEGER NOT NULL,
+    operator_id INTEGER NOT NULL,
+    subscription_type TEXT NOT NULL,
+    PRIMARY KEY (user_id, subscription_type, operator_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS subscriptions_type_operator ON subscriptions (subscription_type, operator_id);
+
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+# Local SQLite implementation of the storage interface. Performance data is stored
+# as one row per operator, period and date, where period is the performance attribute
+# name (e.g. Performance24h). Operator details and subscriptions have their own tables,
+# and the metadata table keeps a count of performance data imports.
+# A single connection is shared by all threads and serialized with a lock.
+class SQLiteStorage(DataStorageInterface):
+
+    def __init__(self, **kwargs):
+        self.database = kwargs.get('database', ':memory:')
+        self._lock = threading.Lock()
+
+        self.connection = sqlite3.connect(self.database, check_same_thread=False)
+        if self.database != ':memory:':
+            self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+
+    # Returns dict of operator IDs to performance data for all operator IDs
+    @METRICS.measured
+    def get_performance_all(self, fields=None, days=None):
+        return self._load_performance_data(None, fields, days)
+
+
+    # Returns dict of operator IDs to performance data for specified operator IDs
+    @METRICS.measured
+    def get_performance_by_opids(self, op_ids, fields=None, days=None):
+        op_ids = sorted(set(map(int, op_ids))) if op_ids else []
+        if not op_ids:
+            return {}
+
+        return self._load_performance_data(op_ids, fields, days)
+
+
+    def _load_performance_data(self, op_ids, fields, days):
+        perf_data = {}
+        periods = [field for field in PERFORMANCE_DATA_FIELDS + PERFORMANCE_HOURLY_FIELDS if not fields or field in fields]
+
+        try:
+            with self._lock:
+                for chunk in self._chunks(op_ids):
+                    where, params = self._operator_filter(chunk)
+                    rows = self.connection.execute(
+                        f"SELECT operator_id, name, is_vo, is_private, validator_count, address FROM operators{where}",
+                        params).fetchall()
+
+                    for operator_id, name, is_vo, is_private, validator_count, address in rows:
+                        row = {
+                            FIELD_OPERATOR_ID: operator_id,
+                            FIELD_OPERATOR_NAME: name,
+                            FIELD_IS_VO: bool(is_vo),
+                            FIELD_IS_PRIVATE: bool(is_private),
+                            FIELD_VALIDATOR_COUNT: validator_count or 0,
+                            FIELD_ADDRESS: address
+                        }
+                        for period in periods:
+                            row[period] = {}
+                        if fields:
+                            row = {field: value for field, value in row.items() if field == FIELD_OPERATOR_ID or field in fields}
+                        perf_data[operator_id] = row
+
+                    for period in periods:
+                        self._load_period(perf_data, period, chunk, days)
+
+        except sqlite3.Error as e:
+            logging.error(f"Failed to load performance data: {e}", exc_info=True)
+
+        return perf_data
+
+
+    # Adds date -> value maps for one period to rows already in perf_data, limited to
+    # the last `days` dates ending at the latest date for the period
+    def _load_period(self, perf_data, period, op_ids, days):
+        where, params = self._operator_filter(op_ids)
+        where = f"{where} AND period = ?" if where else " WHERE period = ?"
+        params.append(period)
+
+        if days:
+            latest = self.connection.execute(
+                "SELECT MAX(date) FROM performance WHERE period = ?", (period,)).fetchone()[0]
+            if latest is None:
+                return
+            cutoff = (datetime.strptime(latest[:10], '%Y-%m-%d') - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+            where += " AND date >= ?"
+            params.append(cutoff)
+
+        rows = self.connection.execute(
+            f"SELECT operator_id, date, value FROM performance{where}", params)
+
+        for operator_id, date, value in rows:
+            if operator_id in perf_data:
+                perf_data[operator_id][period][date] = value
+
+
+    @METRICS.measured(count_result=False)
+    def get_latest_perf_data_date(self):
+        try:
+            with self._lock:
+                return self.connection.execute(
+                    "SELECT MAX(date) FROM performance WHERE period = ?", (FIELD_PERF_DATA_24H,)).fetchone()[0]
+        except sqlite3.Error as e:
+            logging.error(f"Failed to get latest performance data date: {e}", exc_info=True)
+            return None
+
+
+    # Latest date per daily period plus the number of performance data imports, both
+    # stored in the database, so versions stay comparable across connections and
+    # restarts. As with DynamoDB, hourly periods are not part of the version.
+    @METRICS.measured(count_result=False)
+    def get_data_version(self):
+        try:
+            with self._lock:
+                latest = [(period, date) for period, date in self.connection.execute(
+                    "SELECT period, MAX(date) FROM performance GROUP BY period ORDER BY period")
+                          if period not in PERFORMANCE_HOURLY_FIELDS]
+                imports = self.connection.execute(
+                    "SELECT value FROM metadata WHERE key = 'import_count'").fetchone()
+                return tuple(latest), imports[0] if imports else 0
+        except sqlite3.Error as e:
+            logging.error(f"Failed to get data version: {e}", exc_info=True)
+            return None
+
+
+    # Inserts or replaces operator details and performance data points, taking the same
+    # dict of operator IDs to rows returned by get_performance_all()
+    @METRICS.measured(count_result=False)
+    def import_performance_data(self, perf_data, last_updated=None):
+        operators = []
+        data_points = []
+
+        for operator_id, row in perf_data.items():
+            operators.append((
+                int(operator_id),
+                row.get(FIELD_OPERATOR_NAME),
+                1 if row.get(FIELD_IS_VO) else 0,
+                1 if row.get(FIELD_IS_PRIVATE) else 0,
+                int(row.get(FIELD_VALIDATOR_COUNT) or 0),
+                row.get(FIELD_ADDRESS),
+                last_updated
+            ))
+            for period in PERFORMANCE_DATA_FIELDS + PERFORMANCE_HOURLY_FIELDS:
+                for date, value in (row.get(period) or {}).items():
+                    data_points.append((int(operator_id), period, date, None if value is None else float(value)))
+
+        # Hourly data points are kept for as many hours as the DynamoDB hourly history,
+        # counting back from the newest hour imported
+        hourly_cutoffs = []
+        for period in PERFORMANCE_HOURLY_FIELDS:
+            hours = [date for _, point_period, date, _ in data_points if point_period == period]
+            if hours:
+                newest = epoch_hour(datetime.strptime(max(hours), '%Y-%m-%dT%H:%M'))
+                hourly_cutoffs.append((period, hour_key(newest - PERFORMANCE_HOURLY_HISTORY + 1)))
+
+        try:
+            with self._lock, self.connection:
+                self.connection.executemany(
+                    "INSERT INTO operators (operator_id, name, is_vo, is_private, validator_count, address, last_updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (operator_id) DO UPDATE SET name = excluded.name, is_vo = excluded.is_vo, "
+                    "is_private = excluded.is_private, validator_count = excluded.validator_count, "
+                    "address = excluded.address, last_updated = COALESCE(excluded.last_updated, last_updated)",
+                    operators)
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO performance (operator_id, period, date, value) VALUES (?, ?, ?, ?)",
+                    data_points)
+                self.connection.executemany(
+                    "DELETE FROM performance WHERE period = ? AND date < ?", hourly_cutoffs)
+                self.connection.execute(
+                    "INSERT INTO metadata (key, value) VALUES ('import_count', 1) "
+                    "ON CONFLICT (key) DO UPDATE SET value = value + 1")
+        except sqlite3.Error as e:
+            logging.error(f"Failed to import performance data: {e}", exc_info=True)
+            raise
+
+
+    @METRICS.measured
+    def get_subscriptions_by_type(self, subscription_type):
+        results = SubscriptionIndex()
+
+        try:
+            with self._lock:
+                rows = self.connection.execute(
+                    "SELECT operator_id, user_id FROM subscriptions WHERE subscription_type = ?",
+                    (subscription_type,)).fetchall()
+
+            for op_id, user_id in rows:
+                results.add(user_id, op_id, subscription_type)
+
+        except sqlite3.Error as e:
+            logging.error(f"Failed to get subscriptions by type: {e}", exc_info=True)
+
+        return results
+
+
+    @METRICS.measured
+    def get_subscriptions_by_userid(self, user_id):
+        results = SubscriptionIndex()
+
+        try:
+            with self._lock:
+                rows = self.connection.execute(
+                    "SELECT operator_id, subscription_type FROM subscriptions WHERE user_id = ?",
+                    (int(user_id),)).fetchall()
+
+            for op_id, subscription_type in rows:
+                results.add(user_id, op_id, subscription_type)
+
+        except sqlite3.Error as e:
+            logging.error(f"Failed to get subscriptions by user ID: {e}", exc_info=True)
+
+        return results
+
+
+    @METRICS.measured(count_result=False)
+    def add_user_subscription(self, user_id, op_id, subscription_type):
+        try:
+            with self._lock, self.connection:
+                cursor = self.connection.execute(
+                    "INSERT OR IGNORE INTO subscriptions (user_id, operator_id, subscription_type) VALUES (?, ?, ?)",
+                    (int(user_id), int(op_id), subscription_type))
+                return {'changes': cursor.rowcount}
+
+        except sqlite3.Error as e:
+            logging.error(f"Failed to add user subscription: {e}", exc_info=True)
+            return None
+
+
+    @METRICS.measured(count_result=False)
+    def del_user_subscription(self, user_id, op_id, subscription_type):
+        try:
+            with self._lock, self.connection:
+                cursor = self.connection.execute(
+                    "DELETE FROM subscriptions WHERE user_id = ? AND operator_id = ? AND subscription_type = ?",
+                    (int(user_id), int(op_id), subscription_type))
+                return {'changes': cursor.rowcount}
+
+        except sqlite3.Error as e:
+            logging.error(f"Unexpected error deleting subscription: {e}", exc_info=True)
+            return None
+
+
+    # Yields operator ID lists small enough to bind in one statement, or a single
+    # None meaning all operators
+    @staticmethod
+    def _chunks(op_ids):
+        if op_ids is None:
+            yield None
+            return
+        for start in range(0, len(op_ids), SQLITE_MAX_IN_PARAMS):
+            yield op_ids[start:start + SQLITE_MAX_IN_PARAMS]
+
+
+    @staticmethod
+    def _operator_filter(op_ids):
+        if op_ids is None:
+            return '', []
+        return f" WHERE operator_id IN ({', '.join('?' * len(op_ids))})", list(op_ids)
@@ -0,0 +1,61 @@
+
+# Subscriptions in the shape returned by the storage layer, a dict of
+# {operator_id: {user_id: {subscription_type: True}}}, with a reverse index of
+# {user_id: {operator_id: {subscription_type: True}}} kept alongside it. Both
+# indexes share the same settings dicts. Use add() and remove() to change
+# subscriptions so that the indexes stay in step.
+class SubscriptionIndex(dict):
+
+    def __init__(self):
+        super().__init__()
+        self.by_user = {}
+
+
+    def add(self, user_id, op_id, subscription_type):
+        settings = self.setdefault(op_id, {}).get(user_id)
+        if settings is None:
+            settings = {}
+            self[op_id][user_id] = settings
+            self.by_user.setdefault(user_id, {})[op_id] = settings
+        settings[subscription_type] = True
+
+
+    def remove(self, user_id, op_id, subscription_type):
+        settings = self.get(op_id, {}).get(user_id)
+        if settings is None:
+            return
+
+        settings.pop(subscription_type, None)
+        if not settings:
+            del self[op_id][user_id]
+            del self.by_user[user_id][op_id]
+            if not self[op_id]:
+                del self[op_id]
+            if not self.by_user[user_id]:
+                del self.by_user[user_id]
+
+
+    # Returns sorted operator IDs to which the user is subscribed for the type
+    def user_operator_ids(self, user_id, subscription_type):
+        return sorted(op_id for op_id, settings in self.by_user.get(user_id, {}).items()
+                      if settings.get(subscription_type, False))
+
+
+    # Returns sorted, unique user IDs subscribed to any of the operator IDs for the type
+    def operator_user_ids(self, op_ids, subscription_type):
+        user_ids = set()
+        for op_id in set(op_ids):
+            for user_id, settings in self.get(op_id, {}).items():
+                if settings.get(subscription_type, False):
+                    user_ids.add(user_id)
+        return sorted(user_ids)
+
+
+    # Returns an independent copy, so callers can iterate it while this index changes
+    def copy(self):
+        index = SubscriptionIndex()
+        for user_id, operators in self.by_user.items():
+            for op_id, settings in operators.items():
+                for subscription_type in settings:
+                    index.add(user_id, op_id, subscription_type)
+        return index
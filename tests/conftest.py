@@ -0,0 +1,43 @@
+import os
+import sys
+import pytest
+
+# The repository is not an installed package, so tests import its modules from the
+# repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# A local DynamoDB, provided by moto, with fake credentials
+@pytest.fixture
+def dynamodb(monkeypatch):
+    import moto
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.delenv('AWS_SESSION_TOKEN', raising=False)
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+
+    with moto.mock_aws():
+        import boto3
+        yield boto3.resource('dynamodb')
+
+
+# The performance data table, with the staleness index used by the collectors
+@pytest.fixture
+def performance_table(dynamodb):
+    from common.config import DYNDB_PERF_STALENESS_INDEX
+
+    return dynamodb.create_table(
+        TableName='SSVPerformanceData',
+        KeySchema=[{'AttributeName': 'OperatorID', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[
+            {'AttributeName': 'OperatorID', 'AttributeType': 'N'},
+            {'AttributeName': 'isVO', 'AttributeType': 'N'},
+            {'AttributeName': 'last_updated', 'AttributeType': 'S'}
+        ],
+        GlobalSecondaryIndexes=[{
+            'IndexName': DYNDB_PERF_STALENESS_INDEX,
+            'KeySchema': [{'AttributeName': 'isVO', 'KeyType': 'HASH'},
+                          {'AttributeName': 'last_updated', 'KeyType': 'RANGE'}],
+            'Projection': {'ProjectionType': 'KEYS_ONLY'}
+        }],
+        BillingMode='PAY_PER_REQUEST')
\ No newline at end of file
@@ -0,0 +1,66 @@
+import random
+import pytest
+from vo_performance_bot.vopb_bundles import Section, SECTION_SEPARATOR, split_fragment, bundle_sections, bundle_messages
+
+
+def test_split_fragment_prefers_line_breaks():
+    assert split_fragment('short', 10) == ['short']
+    assert split_fragment('aaaa\nbbbb\ncccc', 9) == ['aaaa\nbbbb', 'cccc']
+    assert split_fragment('a' * 25, 10) == ['a' * 10, 'a' * 10, 'a' * 5]
+
+
+def test_sections_share_messages_and_repeat_headers():
+    sections = [Section('**24h**', ['- a', '- b', '- c']), Section('**30d**', ['- d'])]
+
+    assert bundle_sections(sections, 100) == ['**24h**\n- a\n- b\n- c' + SECTION_SEPARATOR + '**30d**\n- d']
+    assert bundle_sections(sections, 20) == ['**24h**\n- a\n- b\n- c', '**30d**\n- d']
+    assert bundle_sections(sections, 15) == ['**24h**\n- a\n- b', '**24h**\n- c', '**30d**\n- d']
+
+
+def test_headers_are_not_left_without_a_fragment():
+    sections = [Section(None, ['x' * 10]), Section('header', ['y' * 5])]
+
+    assert bundle_sections(sections, 20) == ['x' * 10, 'header\n' + 'y' * 5]
+
+
+def test_long_headers_keep_messages_within_the_limit():
+    header = 'h' * 30
+    bundles = bundle_sections([Section(header, ['f' * 100])], 40)
+
+    assert all(len(bundle) <= 40 for bundle in bundles)
+    assert all(bundle.startswith(header + '\n') for bundle in bundles)
+    assert ''.join(bundle[len(header) + 1:] for bundle in bundles) == 'f' * 100
+
+
+def test_header_without_room_for_a_fragment_raises():
+    with pytest.raises(ValueError):
+        bundle_sections([Section('h' * 39, ['f'])], 40)
+    with pytest.raises(ValueError):
+        bundle_sections([Section('h' * 50, ['f'])], 40)
+
+
+def test_random_sections_fit_and_keep_their_text():
+    rng = random.Random(25)
+
+    for _ in range(2000):
+        max_length = rng.randrange(5, 200)
+        sections = []
+        for _ in range(rng.randrange(1, 5)):
+            header = rng.choice([None, 'h' * rng.randrange(1, max_length - 1)])
+            fragments = ['\n'.join('f' * rng.randrange(0, 60) for _ in range(rng.randrange(1, 4)))
+                         for _ in range(rng.randrange(1, 6))]
+            sections.append(Section(header, fragments))
+
+        bundles = bundle_sections(sections, max_length)
+
+        assert all(len(bundle) <= max_length for bundle in bundles)
+        text = ''.join(bundles)
+        assert text.count('f') == sum(fragment.count('f') for section in sections for fragment in section.fragments)
+
+
+def test_bundle_messages_first_fit():
+    messages = ['a' * 6, 'b' * 6, 'c' * 2]
+
+    assert bundle_messages(messages, 10) == ['a' * 6, 'b' * 6 + '\n' + 'c' * 2]
+    assert bundle_messages(messages, 10, first_fit=True) == ['a' * 6 + '\n' + 'c' * 2, 'b' * 6]
+    assert all(len(bundle) <= 10 for bundle in bundle_messages(['x' * 25] + messages, 10, first_fit=True))
\ No newline at end of file
@@ -0,0 +1,85 @@
+from datetime import datetime
+from decimal import Decimal
+import pytest
+from common.config import *
+from common.hourly_history import HourlyHistory, epoch_hour
+from collector.dynamodb_writer import DynamoDBWriter, OperatorUpdate
+
+DATE = '2026-10-17'
+HOUR = epoch_hour(datetime(2026, 10, 17, 5))
+
+
+@pytest.fixture
+def writer(performance_table):
+    return DynamoDBWriter(performance_table.name, max_workers=2, batch_size=3)
+
+
+def update(operator_id, value, **attributes):
+    return OperatorUpdate(operator_id, dict({'Name': f'Operator {operator_id}', 'isVO': 1}, **attributes),
+                          {FIELD_PERF_DATA_24H: value, FIELD_PERF_DATA_30D: value})
+
+
+def test_write_operators_creates_items_and_maps(writer, performance_table):
+    written, failed = writer.write_operators([update(op_id, Decimal('0.9')) for op_id in range(1, 8)], DATE)
+
+    assert (written, failed) == (7, [])
+    item = performance_table.get_item(Key={'OperatorID': 4})['Item']
+    assert item['Name'] == 'Operator 4'
+    assert item[FIELD_PERF_DATA_24H] == {DATE: Decimal('0.9')}
+    assert item[FIELD_PERF_DATA_30D] == {DATE: Decimal('0.9')}
+
+
+def test_write_operators_keeps_existing_values_unless_overwriting(writer, performance_table):
+    performance_table.put_item(Item={'OperatorID': 1, FIELD_PERF_DATA_24H: {'2026-10-16': Decimal('0.8'), DATE: Decimal('0.7')},
+                                     FIELD_PERF_DATA_30D: 'not a map'})
+
+    writer.write_operators([update(1, Decimal('0.9'))], DATE)
+    item = performance_table.get_item(Key={'OperatorID': 1})['Item']
+    assert item[FIELD_PERF_DATA_24H] == {'2026-10-16': Decimal('0.8'), DATE: Decimal('0.7')}
+    assert item[FIELD_PERF_DATA_30D] == {DATE: Decimal('0.9')}
+
+    writer.write_operators([update(1, Decimal('0.95'))], DATE, overwrite=True)
+    item = performance_table.get_item(Key={'OperatorID': 1})['Item']
+    assert item[FIELD_PERF_DATA_24H] == {'2026-10-16': Decimal('0.8'), DATE: Decimal('0.95')}
+    assert item[FIELD_PERF_DATA_30D] == {DATE: Decimal('0.95')}
+
+
+def test_update_watermark_only_moves_forward(writer, performance_table):
+    latest = FIELD_LATEST_DATE_PREFIX + FIELD_PERF_DATA_24H
+
+    writer.update_watermark([FIELD_PERF_DATA_24H], DATE)
+    watermark = performance_table.get_item(Key={'OperatorID': WATERMARK_OPERATOR_ID})['Item']
+    assert watermark[latest] == DATE
+
+    writer.update_watermark([FIELD_PERF_DATA_24H], '2026-10-16')
+    watermark = performance_table.get_item(Key={'OperatorID': WATERMARK_OPERATOR_ID})['Item']
+    assert watermark[latest] == DATE
+
+    # Hourly runs record their latest hour without changing the update timestamp
+    writer.update_watermark([FIELD_PERF_DATA_1H], '2026-10-17T05:00', touch_updated=False)
+    item = performance_table.get_item(Key={'OperatorID': WATERMARK_OPERATOR_ID})['Item']
+    assert item[FIELD_LATEST_DATE_PREFIX + FIELD_PERF_DATA_1H] == '2026-10-17T05:00'
+    assert item[FIELD_WATERMARK_UPDATED] == watermark[FIELD_WATERMARK_UPDATED]
+
+
+def test_write_hourly_skips_operators_without_an_item(writer, performance_table):
+    for op_id in (1, 2):
+        performance_table.put_item(Item={'OperatorID': op_id, 'isVO': 1})
+
+    written, skipped, failed = writer.write_hourly({1: 0.5, 2: 0.25, 3: 1.0}, HOUR, FIELD_PERF_DATA_1H)
+
+    assert (written, skipped, failed) == (2, 1, [])
+    assert 'Item' not in performance_table.get_item(Key={'OperatorID': 3})
+    history = HourlyHistory.decode(performance_table.get_item(Key={'OperatorID': 1})['Item'][FIELD_PERF_DATA_1H].value)
+    assert history.to_dict(1) == {'2026-10-17T05:00': 0.5}
+
+
+def test_write_hourly_adds_to_existing_history(writer, performance_table):
+    performance_table.put_item(Item={'OperatorID': 1, 'isVO': 1})
+    writer.write_hourly({1: 0.5}, HOUR, FIELD_PERF_DATA_1H)
+
+    assert writer.write_hourly({1: 0.5}, HOUR, FIELD_PERF_DATA_1H) == (0, 1, [])
+    assert writer.write_hourly({1: 0.75}, HOUR + 2, FIELD_PERF_DATA_1H) == (1, 0, [])
+
+    history = HourlyHistory.decode(performance_table.get_item(Key={'OperatorID': 1})['Item'][FIELD_PERF_DATA_1H].value)
+    assert history.to_dict(3) == {'2026-10-17T05:00': 0.5, '2026-10-17T07:00': 0.75}
\ No newline at end of file
@@ -0,0 +1,116 @@
+from datetime import datetime, timezone, timedelta
+from decimal import Decimal
+from common.config import *
+from collector.dynamodb_writer import OperatorUpdate
+from collector.fingerprint_cache import FingerprintCache, LAST_UPDATED
+from ssv_performance_log_dyndb import cleanup_outdated_records
+
+
+def update(date_key, validator_count=4, value=Decimal('0.9')):
+    return OperatorUpdate(1, {'Name': 'Operator 1', 'ValidatorCount': validator_count, LAST_UPDATED: date_key},
+                          {FIELD_PERF_DATA_24H: value})
+
+
+def test_unchanged_operators_only_write_last_updated(tmp_path):
+    cache = FingerprintCache(str(tmp_path / 'cache.json'), 'SSVPerformanceData')
+
+    first = cache.filter_update(update('2026-10-16'), '2026-10-16')
+    assert first.attributes == update('2026-10-16').attributes
+    cache.record(first, '2026-10-16')
+
+    # Same details and no new date: nothing to write
+    assert cache.filter_update(update('2026-10-16'), '2026-10-16') is None
+    assert cache.skipped_operators == 1
+
+    # Same details on a new date: last_updated is written even without new performance
+    second = cache.filter_update(OperatorUpdate(1, update('2026-10-17').attributes, {}), '2026-10-17')
+    assert second.attributes == {LAST_UPDATED: '2026-10-17'}
+    assert second.performance == {}
+
+    # last_updated never moves back
+    assert cache.filter_update(update('2026-10-18'), '2026-10-18').attributes == {LAST_UPDATED: '2026-10-18'}
+    cache.record(update('2026-10-18'), '2026-10-18')
+    assert cache.filter_update(OperatorUpdate(1, update('2026-10-17').attributes, {}), '2026-10-17') is None
+
+
+def test_failed_writes_are_not_seen(tmp_path):
+    cache = FingerprintCache(str(tmp_path / 'cache.json'), 'SSVPerformanceData')
+
+    cache.filter_update(update('2026-10-17'), '2026-10-17')
+    assert not cache.seen_since(1, '2026-10-17')
+    assert cache.filter_update(update('2026-10-17'), '2026-10-17') is not None
+
+    cache.record(update('2026-10-17'), '2026-10-17')
+    assert cache.seen_since(1, '2026-10-17')
+
+
+def test_changed_attributes_and_overwrites(tmp_path):
+    cache = FingerprintCache(str(tmp_path / 'cache.json'), 'SSVPerformanceData')
+    cache.record(update('2026-10-17'), '2026-10-17')
+
+    changed = cache.filter_update(update('2026-10-17', validator_count=5), '2026-10-17')
+    assert changed.attributes == {'ValidatorCount': 5}
+    assert changed.performance == {}
+
+    assert cache.filter_update(update('2026-10-17', value=Decimal('0.8')), '2026-10-17') is None
+    overwrite = cache.filter_update(update('2026-10-17', value=Decimal('0.8')), '2026-10-17', overwrite=True)
+    assert overwrite.performance == {FIELD_PERF_DATA_24H: Decimal('0.8')}
+
+
+def test_cache_file_round_trip(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    cache = FingerprintCache(path, 'SSVPerformanceData')
+    cache.record(update('2026-10-17'), '2026-10-17')
+    cache.save()
+
+    loaded = FingerprintCache(path, 'SSVPerformanceData')
+    assert loaded.filter_update(update('2026-10-17'), '2026-10-17') is None
+    assert loaded.seen_since(1, '2026-10-17')
+    assert not loaded.seen_since(1, '2026-10-18')
+    assert not loaded.seen_since(2, '2026-10-01')
+
+    # A cache written for another table is ignored
+    assert FingerprintCache(path, 'OtherTable').operators == {}
+
+
+def test_cleanup_skips_operators_seen_by_the_cache(tmp_path, performance_table):
+    today = datetime.now(timezone.utc)
+    old = (today - timedelta(days=30)).strftime('%Y-%m-%d')
+    recent = (today - timedelta(days=1)).strftime('%Y-%m-%d')
+
+    for op_id in (1, 2):
+        performance_table.put_item(Item={'OperatorID': op_id, 'isVO': 1, 'ValidatorCount': 4, LAST_UPDATED: old})
+
+    # Operator 1 was written recently by this cache's writer; operator 2 has not been
+    # written since
+    cache = FingerprintCache(str(tmp_path / 'cache.json'), performance_table.name)
+    cache.record(update(recent), recent)
+    cache.record(OperatorUpdate(2, {LAST_UPDATED: old}, {}), old)
+
+    cleanup_outdated_records(performance_table.name, cache, write_workers=1)
+
+    assert performance_table.get_item(Key={'OperatorID': 1})['Item']['ValidatorCount'] == 4
+    zeroed = performance_table.get_item(Key={'OperatorID': 2})['Item']
+    assert zeroed['ValidatorCount'] == 0
+    assert zeroed[LAST_UPDATED] == today.strftime('%Y-%m-%d')
+    assert '2' not in cache.operators and '1' in cache.operators
+
+
+def test_cleanup_keeps_operators_written_without_the_cache(tmp_path, performance_table):
+    from collector.dynamodb_writer import DynamoDBWriter
+    from ssv_performance_log_dyndb import write_operator_updates
+
+    today = datetime.now(timezone.utc)
+    old = (today - timedelta(days=30)).strftime('%Y-%m-%d')
+    recent = (today - timedelta(days=1)).strftime('%Y-%m-%d')
+    writer = DynamoDBWriter(performance_table.name, max_workers=1)
+
+    cache = FingerprintCache(str(tmp_path / 'cache.json'), performance_table.name)
+    write_operator_updates(writer, [update(old)], old, False, cache)
+    write_operator_updates(writer, [OperatorUpdate(1, update(recent).attributes, {})], recent, False, cache)
+    assert performance_table.get_item(Key={'OperatorID': 1})['Item'][LAST_UPDATED] == recent
+
+    # A fresh cache, as on another host, does not hide the operator from cleanup
+    cleanup_outdated_records(performance_table.name, FingerprintCache(str(tmp_path / 'other.json'), performance_table.name),
+                             write_workers=1)
+    assert performance_table.get_item(Key={'OperatorID': 1})['Item']['ValidatorCount'] == 4
\ No newline at end of file
@@ -0,0 +1,66 @@
+import random
+from datetime import datetime, timezone
+import pytest
+from common.hourly_history import HourlyHistory, epoch_hour, hour_key
+
+
+def test_hour_keys():
+    hour = epoch_hour(datetime(2026, 10, 17, 5, 59))
+    assert hour == epoch_hour(datetime(2026, 10, 17, 5, tzinfo=timezone.utc))
+    assert hour_key(hour) == '2026-10-17T05:00'
+
+
+def test_set_and_decode():
+    history = HourlyHistory(4)
+    assert list(history.items()) == []
+    assert history.set(100, 0.5)
+    assert history.set(102, 0.25)
+
+    decoded = HourlyHistory.decode(history.encode(), 4)
+    assert decoded.slots == 4 and decoded.newest == 102
+    assert list(decoded.items()) == [(102, 0.25), (100, 0.5)]
+    assert decoded.to_dict(2) == {hour_key(102): 0.25}
+
+
+def test_old_hours_are_rejected_and_skipped_hours_cleared():
+    history = HourlyHistory(4)
+    for hour in range(100, 104):
+        history.set(hour, 1.0)
+
+    assert not history.set(99, 0.5)
+    assert history.set(101, 0.5)
+
+    # Hours 104 and 105 reuse the slots of 100 and 101; 102 and 103 are still held
+    history.set(106, 0.75)
+    assert list(history.items()) == [(106, 0.75), (103, 1.0)]
+
+
+def test_matches_dict_of_hours():
+    rng = random.Random(20)
+    history = HourlyHistory(24)
+    expected = {}
+
+    for _ in range(2000):
+        newest = max(expected, default=1000)
+        hour = rng.randrange(newest - 30, newest + 5)
+        value = round(rng.random(), 6)
+
+        if hour <= newest - 24 and expected:
+            assert not history.set(hour, value)
+            continue
+        assert history.set(hour, value)
+        expected[hour] = value
+        expected = {h: v for h, v in expected.items() if h > max(expected) - 24}
+
+        if rng.random() < 0.1:
+            history = HourlyHistory.decode(history.encode(), 24)
+        assert history.to_dict() == {hour_key(h): v for h, v in expected.items()}
+
+
+def test_decode_rejects_unknown_data():
+    assert HourlyHistory.decode(None, 4).newest is None
+
+    encoded = HourlyHistory(4).encode()
+    for data in (b'', encoded[:-1], b'\x02' + encoded[1:]):
+        with pytest.raises(ValueError):
+            HourlyHistory.decode(data)
\ No newline at end of file
@@ -0,0 +1,57 @@
+import threading
+from common.config import *
+from vo_performance_bot.vopb_render_cache import RenderCache
+
+
+def make_cache():
+    cache = RenderCache()
+    renders = []
+
+    def render(operator_data):
+        renders.append(operator_data[FIELD_OPERATOR_ID])
+        return f"{operator_data[FIELD_OPERATOR_NAME]}: {operator_data[FIELD_PERF_DATA_24H]}"
+
+    cache.register('operator', render)
+    return cache, renders
+
+
+def test_primed_rows_are_served_without_rendering():
+    cache, renders = make_cache()
+    perf_data = {op_id: {FIELD_OPERATOR_ID: op_id, FIELD_OPERATOR_NAME: f'Operator {op_id}',
+                         FIELD_PERF_DATA_24H: {'2026-10-17': 0.99}} for op_id in range(1, 4)}
+
+    cache.prime(perf_data)
+    assert cache.render('operator', perf_data[2]) == "Operator 2: {'2026-10-17': 0.99}"
+    assert renders == [1, 2, 3]
+    assert cache.stats == {'hits': 1, 'misses': 0, 'primed': 3}
+
+
+def test_other_rows_are_rendered_again():
+    cache, renders = make_cache()
+    row = {FIELD_OPERATOR_ID: 1, FIELD_OPERATOR_NAME: 'Operator 1', FIELD_PERF_DATA_24H: {'2026-10-17': 0.99}}
+    cache.render('operator', row)
+
+    # Same latest date, changed name
+    changed = dict(row, **{FIELD_OPERATOR_NAME: 'Renamed'})
+    assert cache.render('operator', changed) == "Renamed: {'2026-10-17': 0.99}"
+    assert cache.render('operator', changed) == "Renamed: {'2026-10-17': 0.99}"
+    assert renders == [1, 1]
+    assert cache.stats['hits'] == 1 and cache.stats['misses'] == 2
+
+
+def test_concurrent_stats_are_counted():
+    cache, _ = make_cache()
+    row = {FIELD_OPERATOR_ID: 1, FIELD_OPERATOR_NAME: 'Operator 1', FIELD_PERF_DATA_24H: {}}
+    cache.render('operator', row)
+
+    def render():
+        for _ in range(2000):
+            cache.render('operator', row)
+
+    threads = [threading.Thread(target=render) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.stats['hits'] == 16000
\ No newline at end of file
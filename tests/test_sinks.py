@@ -0,0 +1,53 @@
+from common.config import *
+from collector.sinks import GoogleSheetSink
+
+
+# In-memory stand-in for a gspread worksheet
+class FakeWorksheet:
+
+    def __init__(self, values):
+        self.values = [list(row) for row in values]
+
+    def get_all_values(self):
+        return [list(row) for row in self.values]
+
+    def clear(self):
+        self.values = []
+
+    def update(self, values, range_name, value_input_option):
+        assert range_name == 'A1'
+        for i, row in enumerate(values):
+            if i < len(self.values):
+                self.values[i][:len(row)] = row
+            else:
+                self.values.append(list(row))
+
+
+def record(op_id, value):
+    return {FIELD_OPERATOR_ID: op_id, FIELD_OPERATOR_NAME: f'Operator {op_id}', FIELD_IS_VO: True,
+            FIELD_IS_PRIVATE: False, FIELD_VALIDATOR_COUNT: 4, FIELD_ADDRESS: f'0x{op_id}',
+            FIELD_PERF_DATA_24H: {'2026-10-17': value}}
+
+
+def test_google_sheet_is_rewritten_without_stale_cells():
+    sink = GoogleSheetSink.__new__(GoogleSheetSink)
+    sink.worksheet = FakeWorksheet([
+        GoogleSheetSink.HEADER + ['2026-10-16', 'stale'],
+        ['1', 'Operator 1', '1', '0', '4', '0x1', '0.9', 'x'],
+        ['not an operator', '', '', '', '', '', '', 'x'],
+        ['', '', '', '', '', '', '', 'x'],
+        ['', '', '', '', '', '', '', 'x']
+    ])
+    sink.attribute = FIELD_PERF_DATA_24H
+    sink.target_date = '2026-10-17'
+    sink.name = 'Google Sheets test'
+    sink.records = {}
+
+    sink.write_batch([record(1, 0.95), record(2, None)])
+    sink.close()
+
+    assert sink.worksheet.values == [
+        GoogleSheetSink.HEADER + ['2026-10-17', '2026-10-16', 'stale'],
+        [1, 'Operator 1', 1, 0, 4, '0x1', 0.95, '0.9', 'x'],
+        [2, 'Operator 2', 1, 0, 4, '0x2', None, '', '']
+    ]
\ No newline at end of file
@@ -0,0 +1,123 @@
+import time
+import threading
+from storage.storage_cache import CachedStorage
+
+
+# Storage stand-in whose full loads block until released
+class BlockingStorage:
+
+    def __init__(self):
+        self.version = 1
+        self.loads = 0
+        self.release = threading.Event()
+
+    def get_data_version(self):
+        return self.version
+
+    def get_performance_all(self, fields=None, days=None):
+        self.loads += 1
+        self.release.wait(5)
+        return {1: {'OperatorID': 1, 'ValidatorCount': days or 0}}
+
+    def get_performance_by_opids(self, op_ids, fields=None, days=None):
+        return {op_id: {'OperatorID': op_id} for op_id in op_ids}
+
+    def get_latest_perf_data_date(self):
+        return '2026-10-17'
+
+
+def test_concurrent_misses_share_one_load_and_do_not_block_other_reads():
+    storage = BlockingStorage()
+    cache = CachedStorage(storage, check_interval=0)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(cache.get_performance_all(days=7))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+
+    # Served while the snapshot load is still running
+    assert cache.get_performance_by_opids([2], days=30) == {2: {'OperatorID': 2}}
+    assert cache.get_latest_perf_data_date() == '2026-10-17'
+
+    storage.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert storage.loads == 1
+    assert len(results) == 4 and all(result is results[0] for result in results)
+    assert cache.get_performance_all(days=7) is results[0]
+
+
+def test_version_change_drops_snapshot():
+    storage = BlockingStorage()
+    storage.release.set()
+    cache = CachedStorage(storage, check_interval=0)
+
+    first = cache.get_performance_all()
+    storage.version = 2
+
+    assert cache.get_performance_all() is not first
+    assert storage.loads == 2
+
+
+def test_failed_load_is_raised_to_every_waiter():
+    class FailingStorage(BlockingStorage):
+        def get_performance_all(self, fields=None, days=None):
+            self.loads += 1
+            time.sleep(0.2)
+            raise RuntimeError('scan failed')
+
+    storage = FailingStorage()
+    cache = CachedStorage(storage, check_interval=0)
+    errors = []
+
+    def load():
+        try:
+            cache.get_performance_all()
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=load) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == ['scan failed'] * 3
+    assert storage.loads == 1
+
+def test_subscriptions_are_passed_to_the_wrapped_storage():
+    import asyncio
+    from storage.storage_sqlite import SQLiteStorage
+
+    storage = SQLiteStorage()
+    cache = CachedStorage(storage, check_interval=0)
+
+    cache.add_user_subscription(10, 1, 'alerts')
+    asyncio.run(cache.add_user_subscription_async(10, 2, 'alerts'))
+    assert cache.get_subscriptions_by_type('alerts') == storage.get_subscriptions_by_type('alerts')
+    assert asyncio.run(cache.get_subscriptions_by_userid_async(10)) == storage.get_subscriptions_by_userid(10)
+
+    asyncio.run(cache.del_user_subscription_async(10, 2, 'alerts'))
+    cache.del_user_subscription(10, 1, 'alerts')
+    assert not cache.get_subscriptions_by_userid(10)
+
+def test_snapshot_files_are_written_and_loaded_per_key(tmp_path):
+    storage = BlockingStorage()
+    storage.release.set()
+    path = str(tmp_path / 'perf.snapshot')
+
+    cache = CachedStorage(storage, check_interval=0, snapshot_path=path)
+    cache.get_performance_all(days=7)
+    cache.get_performance_all(fields=['OperatorID', 'ValidatorCount'], days=30)
+
+    deadline = time.monotonic() + 5
+    while len(list(tmp_path.glob('perf-*.snapshot'))) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.2)
+
+    restarted = CachedStorage(storage, check_interval=0, snapshot_path=path)
+    assert restarted.get_performance_all(days=7) == {1: {'OperatorID': 1, 'ValidatorCount': 7}}
+    assert restarted.get_performance_all(fields=['ValidatorCount', 'OperatorID'], days=30) == {1: {'OperatorID': 1, 'ValidatorCount': 30}}
+    assert storage.loads == 2
\ No newline at end of file
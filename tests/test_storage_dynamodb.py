@@ -0,0 +1,113 @@
+from decimal import Decimal
+import pytest
+from common.config import *
+from storage.storage_dynamodb import DynamoDBStorage
+
+DATES = ['2026-10-13', '2026-10-14', '2026-10-15', '2026-10-16', '2026-10-17']
+
+
+@pytest.fixture
+def storage(performance_table):
+    with performance_table.batch_writer() as batch:
+        for op_id in range(1, 251):
+            batch.put_item(Item={
+                'OperatorID': op_id,
+                'Name': f'Operator {op_id}',
+                'isVO': op_id % 2,
+                'ValidatorCount': op_id % 7,
+                FIELD_PERF_DATA_24H: {date: Decimal('0.99') for date in DATES},
+                FIELD_PERF_DATA_30D: {DATES[-1]: Decimal('0.98')}
+            })
+        batch.put_item(Item={'OperatorID': WATERMARK_OPERATOR_ID,
+                             FIELD_LATEST_DATE_PREFIX + FIELD_PERF_DATA_24H: DATES[-1],
+                             FIELD_LATEST_DATE_PREFIX + FIELD_PERF_DATA_30D: DATES[-1],
+                             FIELD_WATERMARK_UPDATED: '2026-10-17T01:00:00+00:00'})
+
+    return DynamoDBStorage(table=performance_table.name)
+
+
+def test_get_performance_by_opids_reads_only_requested_operators(storage):
+    # More IDs than one BatchGetItem request takes, plus an ID that does not exist
+    op_ids = list(range(1, 151)) + [999]
+
+    perf_data = storage.get_performance_by_opids(op_ids)
+
+    assert sorted(perf_data) == list(range(1, 151))
+    assert perf_data[7] == {
+        FIELD_OPERATOR_ID: 7,
+        FIELD_OPERATOR_NAME: 'Operator 7',
+        FIELD_IS_VO: True,
+        FIELD_IS_PRIVATE: False,
+        FIELD_VALIDATOR_COUNT: 0,
+        FIELD_ADDRESS: None,
+        FIELD_PERF_DATA_24H: {date: 0.99 for date in DATES},
+        FIELD_PERF_DATA_30D: {DATES[-1]: 0.98},
+        FIELD_PERF_DATA_1H: {}
+    }
+
+
+@pytest.mark.parametrize('scan_segments', [1, 4])
+def test_get_performance_all_skips_watermark_item(performance_table, storage, scan_segments):
+    storage = DynamoDBStorage(table=performance_table.name, scan_segments=scan_segments)
+
+    perf_data = storage.get_performance_all()
+
+    assert sorted(perf_data) == list(range(1, 251))
+
+
+def test_fields_and_days_limit_what_is_read(storage):
+    perf_data = storage.get_performance_by_opids([3], fields=[FIELD_OPERATOR_NAME, FIELD_PERF_DATA_24H], days=2)
+
+    assert perf_data[3] == {
+        FIELD_OPERATOR_ID: 3,
+        FIELD_OPERATOR_NAME: 'Operator 3',
+        FIELD_PERF_DATA_24H: {'2026-10-16': 0.99, '2026-10-17': 0.99}
+    }
+    assert storage.get_performance_all(days=3)[3][FIELD_PERF_DATA_24H] == {date: 0.99 for date in DATES[-3:]}
+
+
+def test_latest_date_and_data_version_come_from_the_watermark(performance_table, storage):
+    assert storage.get_latest_perf_data_date() == DATES[-1]
+    version = storage.get_data_version()
+
+    performance_table.update_item(Key={'OperatorID': WATERMARK_OPERATOR_ID},
+                                  UpdateExpression='SET #h = :hour',
+                                  ExpressionAttributeNames={'#h': FIELD_LATEST_DATE_PREFIX + FIELD_PERF_DATA_1H},
+                                  ExpressionAttributeValues={':hour': '2026-10-17T05:00'})
+    assert storage.get_data_version() == version
+
+    performance_table.update_item(Key={'OperatorID': WATERMARK_OPERATOR_ID},
+                                  UpdateExpression='SET #u = :updated',
+                                  ExpressionAttributeNames={'#u': FIELD_WATERMARK_UPDATED},
+                                  ExpressionAttributeValues={':updated': '2026-10-18T01:00:00+00:00'})
+    assert storage.get_data_version() != version
+
+def test_subscription_index_is_cached_and_replaced_on_change(dynamodb):
+    dynamodb.create_table(
+        TableName='SSVSubscriptions',
+        KeySchema=[{'AttributeName': 'UserID', 'KeyType': 'HASH'},
+                   {'AttributeName': 'SubscriptionInfo', 'KeyType': 'RANGE'}],
+        AttributeDefinitions=[
+            {'AttributeName': 'UserID', 'AttributeType': 'S'},
+            {'AttributeName': 'SubscriptionInfo', 'AttributeType': 'S'},
+            {'AttributeName': 'SubscriptionType', 'AttributeType': 'S'}
+        ],
+        GlobalSecondaryIndexes=[{
+            'IndexName': DYNDB_SUB_TYPE_INDEX,
+            'KeySchema': [{'AttributeName': 'SubscriptionType', 'KeyType': 'HASH'}],
+            'Projection': {'ProjectionType': 'ALL'}
+        }],
+        BillingMode='PAY_PER_REQUEST')
+    storage = DynamoDBStorage(table='SSVSubscriptions')
+
+    storage.add_user_subscription(10, 1, 'daily')
+    first = storage.get_subscriptions_by_type('daily')
+    assert first == {1: {10: {'daily': True}}}
+    assert storage.get_subscriptions_by_type('daily') is first
+
+    # Changes replace the cached index, leaving indexes already returned unchanged
+    storage.add_user_subscription(11, 2, 'daily')
+    storage.del_user_subscription(10, 1, 'daily')
+    assert first == {1: {10: {'daily': True}}}
+    assert storage.get_subscriptions_by_type('daily') == {2: {11: {'daily': True}}}
+    assert storage.get_subscriptions_by_type('daily').user_operator_ids(11, 'daily') == [2]
\ No newline at end of file
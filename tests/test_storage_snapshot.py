@@ -0,0 +1,79 @@
+import random
+import pytest
+from common.config import *
+from storage.storage_snapshot import write_performance_snapshot, PerformanceSnapshot
+
+
+def random_perf_data(rng, count):
+    dates = [f'2026-10-{day:02d}' for day in range(1, 18)]
+    perf_data = {}
+
+    for op_id in rng.sample(range(1, 10000), count):
+        row = {
+            FIELD_OPERATOR_ID: op_id,
+            FIELD_OPERATOR_NAME: rng.choice([None, '', f'Operator {op_id}', 'Ünïcødé 🚀']),
+            FIELD_IS_VO: rng.random() < 0.5,
+            FIELD_IS_PRIVATE: rng.random() < 0.2,
+            FIELD_VALIDATOR_COUNT: rng.randrange(0, 500),
+            FIELD_ADDRESS: rng.choice([None, f'0x{op_id:040x}'])
+        }
+        for period in PERFORMANCE_DATA_FIELDS:
+            row[period] = {date: rng.choice([None, 0.0, 1.0, round(rng.random(), 6)])
+                           for date in rng.sample(dates, rng.randrange(0, len(dates)))}
+        row[FIELD_PERF_DATA_1H] = {f'2026-10-17T{hour:02d}:00': round(rng.random(), 6)
+                                   for hour in rng.sample(range(24), rng.randrange(0, 5))}
+        perf_data[op_id] = row
+
+    return perf_data
+
+
+def test_round_trip(tmp_path):
+    perf_data = random_perf_data(random.Random(8), 300)
+    path = tmp_path / 'perf.snapshot'
+
+    write_performance_snapshot(path, perf_data, metadata={'version': [['Performance24h', '2026-10-17']]})
+    snapshot = PerformanceSnapshot(path)
+
+    assert snapshot.metadata == {'version': [['Performance24h', '2026-10-17']]}
+    assert len(snapshot) == len(perf_data)
+    assert set(snapshot) == set(perf_data)
+    assert dict(snapshot) == perf_data
+    snapshot.close()
+
+
+def test_only_written_fields_are_read(tmp_path):
+    perf_data = {
+        5: {FIELD_OPERATOR_ID: 5, FIELD_IS_VO: True, FIELD_PERF_DATA_24H: {'2026-10-17': 0.5}},
+        3: {FIELD_OPERATOR_ID: 3, FIELD_IS_VO: False, FIELD_PERF_DATA_24H: {}}
+    }
+    path = tmp_path / 'perf.snapshot'
+
+    write_performance_snapshot(path, perf_data)
+    snapshot = PerformanceSnapshot(path)
+
+    assert snapshot.fields == {FIELD_OPERATOR_ID, FIELD_IS_VO, FIELD_PERF_DATA_24H}
+    assert list(snapshot) == [3, 5]
+    assert snapshot[5] == perf_data[5]
+    assert 4 not in snapshot
+    with pytest.raises(KeyError):
+        snapshot[4]
+    snapshot.close()
+
+
+def test_empty_snapshot(tmp_path):
+    path = tmp_path / 'perf.snapshot'
+
+    write_performance_snapshot(path, {})
+    snapshot = PerformanceSnapshot(path)
+
+    assert dict(snapshot) == {}
+    assert snapshot.metadata == {}
+    snapshot.close()
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'perf.snapshot'
+    path.write_bytes(b'not a snapshot' * 4)
+
+    with pytest.raises(ValueError):
+        PerformanceSnapshot(path)
\ No newline at end of file
@@ -0,0 +1,49 @@
+from common.config import *
+from storage.storage_sqlite import SQLiteStorage
+
+PERF_DATA = {
+    1: {FIELD_OPERATOR_ID: 1, FIELD_OPERATOR_NAME: 'Operator 1', FIELD_IS_VO: True, FIELD_IS_PRIVATE: False,
+        FIELD_VALIDATOR_COUNT: 4, FIELD_ADDRESS: '0x01',
+        FIELD_PERF_DATA_24H: {'2026-10-16': 0.99, '2026-10-17': None},
+        FIELD_PERF_DATA_30D: {'2026-10-17': 0.98}},
+    2: {FIELD_OPERATOR_ID: 2, FIELD_OPERATOR_NAME: None, FIELD_IS_VO: False, FIELD_IS_PRIVATE: True,
+        FIELD_VALIDATOR_COUNT: 0, FIELD_ADDRESS: None,
+        FIELD_PERF_DATA_24H: {'2026-10-17': 0.5}}
+}
+
+
+def test_import_round_trip(tmp_path):
+    storage = SQLiteStorage(database=str(tmp_path / 'perf.db'))
+    storage.import_performance_data(PERF_DATA)
+
+    perf_data = storage.get_performance_all()
+    assert perf_data[1][FIELD_PERF_DATA_24H] == PERF_DATA[1][FIELD_PERF_DATA_24H]
+    assert perf_data[2][FIELD_PERF_DATA_30D] == {}
+    assert storage.get_performance_by_opids([2], fields=[FIELD_IS_PRIVATE]) == {2: {FIELD_OPERATOR_ID: 2, FIELD_IS_PRIVATE: True}}
+    assert storage.get_performance_all(days=1)[1][FIELD_PERF_DATA_24H] == {'2026-10-17': None}
+    assert storage.get_latest_perf_data_date() == '2026-10-17'
+
+
+def test_data_version_is_shared_across_connections(tmp_path):
+    database = str(tmp_path / 'perf.db')
+    writer = SQLiteStorage(database=database)
+    reader = SQLiteStorage(database=database)
+    empty = reader.get_data_version()
+
+    writer.import_performance_data(PERF_DATA)
+    imported = reader.get_data_version()
+    assert imported != empty
+    assert imported == writer.get_data_version() == SQLiteStorage(database=database).get_data_version()
+
+    # Re-importing data for the same dates still changes the version
+    writer.import_performance_data(PERF_DATA)
+    assert reader.get_data_version() != imported
+
+
+def test_hourly_dates_are_not_part_of_data_version(tmp_path):
+    storage = SQLiteStorage(database=str(tmp_path / 'perf.db'))
+    storage.import_performance_data(PERF_DATA)
+    latest, _ = storage.get_data_version()
+
+    storage.import_performance_data({1: dict(PERF_DATA[1], **{FIELD_PERF_DATA_1H: {'2026-10-17T05:00': 1.0}})})
+    assert storage.get_data_version()[0] == latest
\ No newline at end of file
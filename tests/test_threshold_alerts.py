@@ -0,0 +1,80 @@
+import random
+from decimal import Decimal
+from common.config import *
+from vo_performance_bot.vopb_operator_threshold_alerts import evaluate_threshold_alerts, ThresholdAlert
+
+
+# The alerts of one period and threshold, as found by the per-period functions that
+# evaluate_threshold_alerts() replaced: (operator ID, date, value) per operator with
+# validators whose most recent data point is below the threshold
+def per_period_alerts(perf_data, field, threshold):
+    alerts = []
+
+    for operator in perf_data.values():
+        if not operator[FIELD_IS_VO]:
+            continue
+        validator_count = operator[FIELD_VALIDATOR_COUNT]
+        if validator_count is None or int(validator_count) <= 0:
+            continue
+        if not operator.get(field):
+            continue
+
+        most_recent_date = max(operator[field])
+        data_point = operator[field][most_recent_date]
+        try:
+            if data_point is None:
+                continue
+            data_point = float(data_point)
+        except (ValueError, TypeError):
+            continue
+
+        if data_point < threshold:
+            alerts.append((operator[FIELD_OPERATOR_ID], most_recent_date, data_point))
+
+    return alerts
+
+
+def random_perf_data(rng, count):
+    dates = [f'2026-10-{day:02d}' for day in range(10, 18)]
+    values = [None, 'n/a', 0, 0.5, 0.75, 0.7499, 0.95, 0.9500001, 1, Decimal('0.8'), Decimal('0.99')]
+    perf_data = {}
+
+    for op_id in range(1, count + 1):
+        operator = {
+            FIELD_OPERATOR_ID: op_id,
+            FIELD_OPERATOR_NAME: f'Operator {op_id}',
+            FIELD_IS_VO: rng.random() < 0.8,
+            FIELD_VALIDATOR_COUNT: rng.choice([None, 0, 1, 4, 100])
+        }
+        for field in PERFORMANCE_DATA_FIELDS:
+            if rng.random() < 0.9:
+                operator[field] = {date: rng.choice(values) for date in rng.sample(dates, rng.randrange(0, 4))}
+        perf_data[op_id] = operator
+
+    return perf_data
+
+
+def test_matches_per_period_alerts():
+    perf_data = random_perf_data(random.Random(23), 2000)
+    alerts = evaluate_threshold_alerts(perf_data)
+
+    assert list(alerts) == list(ALERTS_PERIODS)
+    for label, (field, thresholds) in ALERTS_PERIODS.items():
+        assert all(alert.period == label for alert in alerts[label])
+        for threshold in thresholds:
+            expected = per_period_alerts(perf_data, field, threshold)
+            assert expected
+            assert [(alert.operator_id, alert.date, alert.value) for alert in alerts[label]
+                    if threshold in alert.thresholds] == expected
+
+
+def test_alert_details():
+    perf_data = {7: {FIELD_OPERATOR_ID: 7, FIELD_OPERATOR_NAME: 'Operator 7', FIELD_IS_VO: True, FIELD_VALIDATOR_COUNT: 4,
+                     FIELD_PERF_DATA_24H: {'2026-10-16': 0.1, '2026-10-17': Decimal('0.7')},
+                     FIELD_PERF_DATA_30D: {'2026-10-17': 0.96}}}
+
+    assert evaluate_threshold_alerts(perf_data) == {
+        '24h': [ThresholdAlert(7, 'Operator 7', 4, '24h', '2026-10-17', 0.7, (0.75, 0.95))],
+        '30d': []
+    }
+    assert evaluate_threshold_alerts(perf_data, {'1h': (FIELD_PERF_DATA_1H, {0.5})}) == {'1h': []}
\ No newline at end of file
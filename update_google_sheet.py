@@ -48,6 +48,8 @@ def main():
                         help='The DynamoDB table from which performance data should be queried')
     parser.add_argument('-a', '--attribute', type=str, required=True,
                         help='The DynamoDB table attribute from which JSON performance data should be pulled')
+    parser.add_argument('--scan_segments', type=int, default=1,
+                        help='Number of parallel scan segments used to read the performance table (default: 1)')
 
     args = parser.parse_args()
 
@@ -74,7 +76,7 @@ def main():
 
     try:
         # Initialize storage and retrieve performance data
-        StorageFactory.initialize('performance', 'DynamoDB', table=performance_data_table)
+        StorageFactory.initialize('performance', 'DynamoDB', table=performance_data_table, scan_segments=args.scan_segments)
         storage = StorageFactory.get_storage('performance')
         perf_data = storage.get_performance_all()
         logging.info("Retrieved performance data from DynamoDB.")
@@ -6,7 +6,9 @@ import discord
 import vo_performance_bot.vopb_commands as vopb_commands
 from discord.ext import commands
 from storage.storage_factory import StorageFactory
+from storage.storage_cache import CachedStorage
 from vo_performance_bot.vopb_loops import LoopTasks
+from vo_performance_bot.vopb_render_cache import RENDER_CACHE
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -21,12 +23,17 @@ def parse_arguments():
     parser.add_argument("-p", "--performance_table", required=True, type=str, help="AWS DynamoDB table from which to pull operator performance data")
     parser.add_argument("-s", "--subscription_table", required=True, type=str, help="AWS DynamoDB table in which to store subscription data")
     parser.add_argument("-l", "--limit_user_ids", nargs="*", required=False, help="Limit direct messages and @mentions to the listed user IDs, for QA")
+    parser.add_argument("--scan_segments", type=int, default=1, help="Number of parallel scan segments used when loading all performance data (default: 1)")
+    parser.add_argument("--storage_type", type=str, choices=["DynamoDB", "SQLite"], default="DynamoDB", help="Storage backend for performance and subscription data (default: DynamoDB)")
+    parser.add_argument("--sqlite_database", type=str, default="vo_performance.db", help="SQLite database file, used with --storage_type SQLite (default: vo_performance.db)")
+    parser.add_argument("--cache_ttl", type=int, default=3600, help="Seconds to keep performance data cached in memory, 0 to disable (default: 3600)")
+    parser.add_argument("--snapshot_file", type=str, help="Base name of the binary snapshot files used to persist cached performance data across restarts")
 
     args = parser.parse_args()
 
     allowed_user_ids = list(map(int, args.limit_user_ids)) if args.limit_user_ids else []
 
-    return args.discord_token_file, args.channel_id, args.alert_time, args.extra_message, args.performance_table, args.subscription_table, allowed_user_ids
+    return args.discord_token_file, args.channel_id, args.alert_time, args.extra_message, args.performance_table, args.subscription_table, allowed_user_ids, args.scan_segments, args.cache_ttl, args.storage_type, args.sqlite_database, args.snapshot_file
 
 def read_discord_token_from_file(token_file_path):
     try:
@@ -38,15 +45,20 @@ def read_discord_token_from_file(token_file_path):
 
 async def main():
     try:
-        discord_token_file, channel_id, alert_time, extra_message, performance_data_table, subscription_data_table, allowed_user_ids = parse_arguments()
+        discord_token_file, channel_id, alert_time, extra_message, performance_data_table, subscription_data_table, allowed_user_ids, scan_segments, cache_ttl, storage_type, sqlite_database, snapshot_file = parse_arguments()
     except SystemExit as e:
         if e.code != 0:
             logging.error("Argument parsing failed", exc_info=True)
         sys.exit(e.code)
 
     try:
-        StorageFactory.initialize('performance', 'DynamoDB', table=performance_data_table)
-        StorageFactory.initialize('subscription', 'DynamoDB', table=subscription_data_table)
+        StorageFactory.initialize('performance', storage_type, table=performance_data_table, database=sqlite_database, scan_segments=scan_segments, cache_ttl=cache_ttl, snapshot_path=snapshot_file)
+        StorageFactory.initialize('subscription', storage_type, table=subscription_data_table, database=sqlite_database)
+
+        # Render operator messages whenever a new performance snapshot is loaded
+        performance_storage = StorageFactory.get_storage('performance')
+        if isinstance(performance_storage, CachedStorage):
+            performance_storage.add_snapshot_listener(RENDER_CACHE.prime)
         logging.info("Storage initialized successfully.")
     except Exception as e:
         logging.error(f"Error initializing storage: {e}", exc_info=True)
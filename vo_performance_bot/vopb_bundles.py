@@ -0,0 +1,107 @@
+from typing import List, NamedTuple, Optional
+from common.config import MAX_DISCORD_MESSAGE_LENGTH
+
+# Text placed between two sections in the same message
+SECTION_SEPARATOR = '\n\n'
+
+
+# A group of fragments for bundle_sections(), e.g. the alert lines for one threshold.
+# The header, if any, is placed above the section's fragments in every message the
+# section spans. Fragments are joined with separator.
+class Section(NamedTuple):
+    header: Optional[str]
+    fragments: List[str]
+    separator: str = '\n'
+
+
+# Splits text longer than max_length into chunks of at most max_length characters,
+# at line breaks where possible
+def split_fragment(text, max_length):
+    if len(text) <= max_length:
+        return [text]
+
+    chunks = []
+    lines, length = [], -1
+
+    for line in text.split('\n'):
+        if lines and length + 1 + len(line) > max_length:
+            chunks.append('\n'.join(lines))
+            lines, length = [], -1
+
+        while len(line) > max_length:
+            chunks.append(line[:max_length])
+            line = line[max_length:]
+
+        lines.append(line)
+        length += 1 + len(line)
+
+    chunks.append('\n'.join(lines))
+    return chunks
+
+
+# Packs sections, in order, into as few messages of at most max_length characters as
+# possible: each message takes as many fragments as fit before the next message is
+# started. A section continued in a new message repeats its header, and a header is
+# never left at the end of a message without a fragment below it. Fragments too long
+# for a message are split. Each message is joined once, so bundling is linear in the
+# total length of the fragments. Raises ValueError if a header, with the line break
+# after it, leaves no room for a fragment.
+def bundle_sections(sections, max_length=MAX_DISCORD_MESSAGE_LENGTH):
+    bundles = []
+    parts, length = [], 0
+
+    for header, fragments, separator in sections:
+        prefix = header + '\n' if header else ''
+        fragment_length = max_length - len(prefix)
+        if fragment_length < 1:
+            raise ValueError(f"Section header of {len(header)} characters does not fit messages of {max_length} characters")
+        continued = False
+
+        for fragment in fragments:
+            for chunk in split_fragment(fragment, fragment_length):
+                if continued:
+                    addition = (separator, chunk)
+                elif parts:
+                    addition = (SECTION_SEPARATOR, prefix, chunk)
+                else:
+                    addition = (prefix, chunk)
+                added = sum(map(len, addition))
+
+                if parts and length + added > max_length:
+                    bundles.append(''.join(parts))
+                    addition = (prefix, chunk)
+                    parts, length = [], 0
+                    added = len(prefix) + len(chunk)
+
+                parts.extend(addition)
+                length += added
+                continued = True
+
+    if parts:
+        bundles.append(''.join(parts))
+
+    return bundles
+
+
+# Break messages into bundles of at most max_length characters, each message on its
+# own line. Messages keep their order unless first_fit is set; then each message goes
+# into the first bundle with room for it, so short messages fill space left at the
+# end of earlier bundles and fewer bundles are sent. Messages too long for a bundle
+# are split.
+def bundle_messages(messages, max_length=MAX_DISCORD_MESSAGE_LENGTH, first_fit=False):
+    if not first_fit:
+        return bundle_sections([Section(None, messages)], max_length)
+
+    bundles = []  # [fragments, length] per bundle
+
+    for message in messages:
+        for chunk in split_fragment(message, max_length):
+            for bundle in bundles:
+                if bundle[1] + 1 + len(chunk) <= max_length:
+                    bundle[0].append(chunk)
+                    bundle[1] += 1 + len(chunk)
+                    break
+            else:
+                bundles.append([[chunk], len(chunk)])
+
+    return ['\n'.join(fragments) for fragments, _ in bundles]
\ No newline at end of file
@@ -1,7 +1,9 @@
+import asyncio
 import traceback
 import logging
 from discord.commands import Option
 from storage.storage_factory import StorageFactory
+from common.config import OPERATOR_24H_HISTORY_COUNT
 from vo_performance_bot.vopb_messages import (
     create_subscriptions_message,
     send_operator_performance_messages,
@@ -55,7 +57,7 @@ Thresholds displayed are subject to change.
     async def send_user_subscriptions(ctx, ephemeral, followup):
         try:
             storage = StorageFactory.get_storage('subscription')
-            subscriptions = storage.get_subscriptions_by_userid(ctx.author.id)
+            subscriptions = await storage.get_subscriptions_by_userid_async(ctx.author.id)
             message = create_subscriptions_message(subscriptions, ctx.author).strip()
             if message:
                 if not followup:
@@ -111,9 +113,9 @@ Thresholds displayed are subject to change.
         try:
             storage = StorageFactory.get_storage('subscription')
 
-            # Individually store user subscriptions
-            for op_id in operator_ids:
-                storage.add_user_subscription(ctx.author.id, op_id, notification_type)
+            # Individually store user subscriptions, concurrently
+            await asyncio.gather(*[storage.add_user_subscription_async(ctx.author.id, op_id, notification_type)
+                                   for op_id in operator_ids])
 
             # Notify user of updated status
             if not responded:
@@ -155,9 +157,9 @@ Thresholds displayed are subject to change.
         try:
             storage = StorageFactory.get_storage('subscription')
 
-            # Individually delete user subscriptions
-            for op_id in operator_ids:
-                storage.del_user_subscription(ctx.author.id, op_id, notification_type)
+            # Individually delete user subscriptions, concurrently
+            await asyncio.gather(*[storage.del_user_subscription_async(ctx.author.id, op_id, notification_type)
+                                   for op_id in operator_ids])
 
             await ctx.respond("Your subscriptions have been updated.", ephemeral=False)
             responded = True
@@ -190,7 +192,7 @@ Thresholds displayed are subject to change.
 
         try:
             storage = StorageFactory.get_storage('performance')
-            perf_data = storage.get_performance_by_opids(operator_ids_list)
+            perf_data = await storage.get_performance_by_opids_async(operator_ids_list, days=OPERATOR_24H_HISTORY_COUNT)
 
             if not perf_data:
                 logging.info(f"operator() perf_data empty for {operator_ids} [077003]")
@@ -217,7 +219,9 @@ Thresholds displayed are subject to change.
 
         try:
             storage = StorageFactory.get_storage('performance')
-            perf_data = storage.get_performance_all()
+            # Alerts only use the latest data point, but reading the same window as /operator
+            # lets both commands share one cached snapshot
+            perf_data = await storage.get_performance_all_async(days=OPERATOR_24H_HISTORY_COUNT)
 
             if not perf_data:
                 logging.error(f"alerts() perf_data empty [077001]")
@@ -246,7 +250,7 @@ Thresholds displayed are subject to change.
         try:
             storage = StorageFactory.get_storage('performance')
 
-            latest_date = storage.get_latest_perf_data_date()
+            latest_date = await storage.get_latest_perf_data_date_async()
 
             hello = "Hello! This is VO Performance Bot!\n"
             if latest_date:
@@ -0,0 +1,139 @@
+import time
+import random
+import asyncio
+import logging
+import aiohttp
+import discord
+from common.config import DM_MAX_CONCURRENCY, DM_MAX_RETRIES, DM_RETRY_BASE_DELAY
+from vo_performance_bot.vopb_user_cache import USER_RESOLVER
+
+# Longest wait honoured from a Discord Retry-After header, in seconds
+DM_MAX_RETRY_AFTER = 60.0
+
+# Rate limit route shared by all user lookups. Messages are limited per DM channel,
+# so each user has their own route.
+ROUTE_FETCH_USER = 'fetch_user'
+
+
+# Sends direct messages to many users concurrently, at most max_concurrency users at
+# a time. py-cord already waits on the rate limit buckets it knows about; requests
+# that still fail with HTTP 429, or with a connection that could not be opened, are
+# retried with backoff. User lookups are also retried after HTTP 5xx, other connection
+# errors and timeouts. Messages are not, as they may have been delivered.
+# A 429 pauses its route (or every route, for a global limit) until Retry-After has
+# passed, so other users' requests on that route wait instead of being limited too.
+# Users are resolved through USER_RESOLVER. Users that cannot be messaged (e.g. DMs
+# closed, HTTP 403) are not retried, and are skipped by later runs until the
+# resolver's negative cache entry expires.
+class DirectMessageDispatcher:
+
+    def __init__(self, bot, max_concurrency=DM_MAX_CONCURRENCY, max_retries=DM_MAX_RETRIES,
+                 base_delay=DM_RETRY_BASE_DELAY):
+        self.bot = bot
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+
+        self._global_until = 0.0
+        self._route_until = {}
+        self.stats = {}
+
+
+    # Sends each user in user_messages, a dict of user IDs to lists of messages, their
+    # messages in order. Returns the run stats: users sent to, users failed, users
+    # skipped as unknown or unreachable, messages sent, retries, rate limited requests
+    # and elapsed seconds.
+    async def send(self, user_messages):
+        self.stats = {'sent': 0, 'failed': 0, 'skipped': 0, 'messages': 0, 'retries': 0, 'rate_limited': 0,
+                      'elapsed': 0.0}
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        start = time.monotonic()
+
+        async def send_user(user_id, messages):
+            async with semaphore:
+                try:
+                    user = await self._request(ROUTE_FETCH_USER, lambda: USER_RESOLVER.fetch_user(self.bot, user_id))
+                    if user is None:
+                        self.stats['skipped'] += 1
+                        return
+
+                    for message in messages:
+                        await self._request(f"dm:{user_id}", lambda: user.send(message), idempotent=False)
+                        self.stats['messages'] += 1
+                    self.stats['sent'] += 1
+                except discord.Forbidden as e:
+                    USER_RESOLVER.mark_missing(user_id)
+                    self.stats['failed'] += 1
+                    logging.error(f"Direct messages refused by {user_id}: {e}")
+                except Exception as e:
+                    self.stats['failed'] += 1
+                    logging.error(f"Failed sending direct message to {user_id}: {e}")
+
+        await asyncio.gather(*(send_user(user_id, messages) for user_id, messages in user_messages.items()))
+
+        self.stats['elapsed'] = time.monotonic() - start
+        return self.stats
+
+
+    # Awaits request(), retrying rate limited requests and requests that were never
+    # sent on the given route. Unless idempotent is False, requests that may have been
+    # processed (HTTP 5xx, dropped connections, timeouts) are retried too.
+    async def _request(self, route, request, idempotent=True):
+        for attempt in range(self.max_retries + 1):
+            await self._wait(route)
+
+            try:
+                return await request()
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    self.stats['rate_limited'] += 1
+                    delay = self._rate_limited(route, e)
+                elif e.status >= 500 and idempotent:
+                    delay = self._backoff_delay(attempt)
+                else:
+                    raise
+                if attempt == self.max_retries:
+                    raise
+            except aiohttp.ClientConnectorError:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if not idempotent or attempt == self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+
+            self.stats['retries'] += 1
+            await asyncio.sleep(delay)
+
+
+    # Waits until neither the route nor the global rate limit is paused
+    async def _wait(self, route):
+        while True:
+            delay = max(self._global_until, self._route_until.get(route, 0.0)) - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+
+    # Pauses the route, or all routes for a global limit, for the Retry-After of a 429
+    # response and returns the delay
+    def _rate_limited(self, route, error):
+        headers = getattr(error.response, 'headers', None) or {}
+        try:
+            delay = min(DM_MAX_RETRY_AFTER, max(0.0, float(headers.get('Retry-After', ''))))
+        except ValueError:
+            delay = self.base_delay
+
+        until = time.monotonic() + delay
+        if headers.get('X-RateLimit-Global') == 'true' or headers.get('X-RateLimit-Scope') == 'global':
+            self._global_until = max(self._global_until, until)
+            logging.warning(f"Discord global rate limit, pausing direct messages for {delay:.1f}s")
+        else:
+            self._route_until[route] = max(self._route_until.get(route, 0.0), until)
+
+        return delay
+
+
+    def _backoff_delay(self, attempt):
+        return self.base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
\ No newline at end of file
@@ -2,6 +2,8 @@ import logging
 from datetime import datetime, timedelta
 from discord.ext import tasks
 from storage.storage_factory import StorageFactory
+from common.config import OPERATOR_24H_HISTORY_COUNT, STORAGE_METRICS_INTERVAL_HOURS
+from common.metrics import METRICS
 from vo_performance_bot.vopb_messages import send_daily_direct_messages, send_vo_threshold_messages
 import asyncio
 
@@ -30,6 +32,9 @@ class LoopTasks:
             logging.warning("All expected tasks running. Skipping start delay and task starts.")
             return
 
+        if not self.storage_metrics_loop.is_running():
+            self.storage_metrics_loop.start()
+
         if now >= target + timedelta(minutes=1):
             target += timedelta(days=1)
 
@@ -50,7 +55,7 @@ class LoopTasks:
 
         try:
             sub_storage = StorageFactory.get_storage('subscription')
-            subscriptions = sub_storage.get_subscriptions_by_type('daily')
+            subscriptions = await sub_storage.get_subscriptions_by_type_async('daily')
 
             if not subscriptions:
                 logging.warning("Subscription data empty in daily_notification_task()")
@@ -59,7 +64,7 @@ class LoopTasks:
             op_ids = list(subscriptions.keys())
 
             perf_storage = StorageFactory.get_storage('performance')
-            perf_data = perf_storage.get_performance_by_opids(op_ids)
+            perf_data = await perf_storage.get_performance_by_opids_async(op_ids, days=OPERATOR_24H_HISTORY_COUNT)
 
             if not perf_data:
                 logging.warning(f"Performance data empty for {op_ids} in daily_notification_task()")
@@ -77,14 +82,14 @@ class LoopTasks:
 
         try:
             perf_storage = StorageFactory.get_storage('performance')
-            perf_data = perf_storage.get_performance_all()
+            perf_data = await perf_storage.get_performance_all_async(days=OPERATOR_24H_HISTORY_COUNT)
 
             if not perf_data:
                 logging.warning("Performance data unavailable.")
                 return
 
             sub_storage = StorageFactory.get_storage('subscription')
-            subscriptions = sub_storage.get_subscriptions_by_type('alerts')
+            subscriptions = await sub_storage.get_subscriptions_by_type_async('alerts')
 
             if not subscriptions:
                 logging.warning("Subscription data unavailable.")
@@ -101,3 +106,13 @@ class LoopTasks:
                     await channel.send(f"An error has occurred attempting to send daily alert messages.")
             except Exception as send_e:
                 logging.error(f"{type(send_e).__name__} exception attempting to notify channel of exception in performance_status_all_loop(): {send_e}", exc_info=True)
+
+
+    # Logs storage call metrics (latency, items scanned and returned, consumed
+    # capacity) accumulated since the previous summary
+    @tasks.loop(hours=STORAGE_METRICS_INTERVAL_HOURS)
+    async def storage_metrics_loop(self):
+        try:
+            METRICS.log_summary(reset=True)
+        except Exception as e:
+            logging.error(f"{type(e).__name__} exception in storage_metrics_loop(): {e}", exc_info=True)
\ No newline at end of file
@@ -1,32 +1,13 @@
 from vo_performance_bot.vopb_mentions import create_subscriber_mentions
 from vo_performance_bot.vopb_subscriptions import get_user_subscriptions_by_type
+from vo_performance_bot.vopb_dispatcher import DirectMessageDispatcher
+from vo_performance_bot.vopb_user_cache import USER_RESOLVER
+from vo_performance_bot.vopb_render_cache import RENDER_CACHE
+from vo_performance_bot.vopb_bundles import Section, bundle_messages, bundle_sections
 from vo_performance_bot.vopb_operator_threshold_alerts import *
 from datetime import datetime, timedelta
-from common.config import OPERATOR_24H_HISTORY_COUNT, ALERTS_THRESHOLDS_30D, ALERTS_THRESHOLDS_24H
-
-
-# Break messages into < MAX_DISCORD_MESSAGE_LENGTH characters chunks, called bundles
-# Returns list of separate bundles, each < MAX_DISCORD_MESSAGE_LENGTH
-# Inputs already over MAX_DISCORD_MESSAGE_LENGTH are not truncated or split
-def bundle_messages(messages, max_length=MAX_DISCORD_MESSAGE_LENGTH):
-
-    bundles = []
-    cur_bundle = ''
-
-    for message in messages:
-        # Check if adding the next cur_message exceeds the limit
-        if len(cur_bundle) + len(message) + 1 > max_length:  # +1 for the newline character
-            bundles.append(cur_bundle)  # cur_bundle is full
-            cur_bundle = message  # message we are processing becomes first in new cur_bundle
-        else:
-            # Room for more message. Add it to the end of cur_bundle
-            cur_bundle += "\n" + message if cur_bundle else message
-
-    # Add the cur_bundle if there's anything there
-    if cur_bundle:
-        bundles.append(cur_bundle)
-
-    return bundles
+import discord
+from common.config import OPERATOR_24H_HISTORY_COUNT, ALERTS_PERIODS
 
 
 # Creates a message listing subscriptions for a particular user.
@@ -52,26 +33,36 @@ def create_subscriptions_message(user_data, subscriber):
     return message
 
 
+# Render cache template names
+TEMPLATE_OPERATOR = 'operator'
+TEMPLATE_DAILY = 'daily'
+
+
 # Create message reporting a single operator's recent performance. Overall assumption in this
 # code is that the performance data for any single operator is not longer than the
 # maximum Discord message length. Otherwise, each operator's message would have to be broken up.
+# Messages are rendered once per operator and snapshot by RENDER_CACHE.
 def create_operator_performance_message(operator_data):
+    return RENDER_CACHE.render(TEMPLATE_OPERATOR, operator_data)
+
+
+def render_operator_performance_message(operator_data):
     message = ''
 
     # Display 24h performance second
     if FIELD_PERF_DATA_24H in operator_data and operator_data[FIELD_PERF_DATA_24H]:
         message += f"Recent 24h Performance:\n"
 
-        # Get a list of dates in the last OPERATOR_24H_HISTORY_COUNT calendar days of performance data
-        # Filter the performance data to data points in the last OPERATOR_24H_HISTORY_COUNT days
+        # Filter the performance data to data points in the last OPERATOR_24H_HISTORY_COUNT calendar days
         # Sort the performance data by date descending
-        last_x_days = [(datetime.today() - timedelta(days=x)).strftime('%Y-%m-%d') for x in range(OPERATOR_24H_HISTORY_COUNT)]
-        filtered_data_points = {date: performance for date, performance in operator_data[FIELD_PERF_DATA_24H].items() if date in last_x_days}
-        sorted_filtered_data_points = dict(sorted(filtered_data_points.items(), key=lambda item: item[0], reverse=True))
+        today = datetime.today()
+        first_date = (today - timedelta(days=OPERATOR_24H_HISTORY_COUNT - 1)).strftime('%Y-%m-%d')
+        last_date = today.strftime('%Y-%m-%d')
+        sorted_filtered_data_points = sorted(((date, performance) for date, performance in operator_data[FIELD_PERF_DATA_24H].items()
+                                              if first_date <= date <= last_date), key=lambda item: item[0], reverse=True)
 
         if sorted_filtered_data_points:
-            for data_date in sorted_filtered_data_points.keys():
-                data_value = sorted_filtered_data_points[data_date]
+            for data_date, data_value in sorted_filtered_data_points:
                 if data_value is not None:
                     message += f"- {data_date}: {data_value * 100:.2f}%\n"
                 else:
@@ -134,98 +125,54 @@ async def send_operator_performance_messages(perf_data, ctx, operator_ids):
             await ctx.send_followup(bundle.strip(), ephemeral=False)
 
 
-def create_alerts_24h(perf_data):
-    alert_msgs_24h = {threshold: [] for threshold in ALERTS_THRESHOLDS_24H}
-    operator_ids = []
-
-    for op_id in perf_data.keys():
-        operator = perf_data[op_id]
-
-        if not operator[FIELD_IS_VO]:
-            continue
-
-        validator_count = operator[FIELD_VALIDATOR_COUNT]
-        if validator_count is None or int(validator_count) <= 0:
-            continue
-
-        for threshold, alert_list in alert_msgs_24h.items():
-            result = operator_threshold_alert_24h(operator, threshold)
-            if result and validator_count > 0:
-                operator_ids.append(result[FIELD_OPERATOR_ID])
-                performance_str = "N/A" if result['Performance Data Point'] is None else f"{result['Performance Data Point']}"
-                alert = f"- {result[FIELD_OPERATOR_NAME]} - {performance_str}    (ID: {result[FIELD_OPERATOR_ID]}, Validators: {validator_count})"
-                alert_list.append(alert)
-
-    return operator_ids, alert_msgs_24h
-
-
-def create_alerts_30d(perf_data):
-    alert_msgs_30d = {threshold: [] for threshold in ALERTS_THRESHOLDS_30D}
+# Evaluates threshold alerts for every period in ALERTS_PERIODS. Returns the IDs of
+# operators with alerts, and for each period label a dict of thresholds to the alert
+# lines for operators below that threshold.
+def create_alerts(perf_data):
+    alert_msgs = {label: {threshold: [] for threshold in thresholds} for label, (_, thresholds) in ALERTS_PERIODS.items()}
     operator_ids = []
 
-    for op_id in perf_data.keys():
-        operator = perf_data[op_id]
-
-        if not operator[FIELD_IS_VO]:
-            continue
-
-        validator_count = operator[FIELD_VALIDATOR_COUNT]
-        if validator_count is None or int(validator_count) <= 0:
-            continue
-
-        for threshold, alert_list in alert_msgs_30d.items():
-            result = operator_threshold_alert_30d(operator, threshold)
-            if result and validator_count > 0:
-                operator_ids.append(result[FIELD_OPERATOR_ID])
-                performance_str = "N/A" if result['Performance Data Point'] is None else f"{result['Performance Data Point']}"
-                alert = f"- {result[FIELD_OPERATOR_NAME]} - {performance_str}    (ID: {result[FIELD_OPERATOR_ID]}, Validators: {validator_count})"
-                alert_list.append(alert)
+    for label, alerts in evaluate_threshold_alerts(perf_data).items():
+        for alert in alerts:
+            alert_line = f"- {alert.name} - {alert.value * 100:.2f}%    (ID: {alert.operator_id}, Validators: {alert.validator_count})"
+            for threshold in alert.thresholds:
+                operator_ids.append(alert.operator_id)
+                alert_msgs[label][threshold].append(alert_line)
 
-    return operator_ids, alert_msgs_30d
+    return operator_ids, alert_msgs
 
 
-def compile_alert_threshold_groups(alerts, period_label):
-    messages = []
-
-    for threshold, alert_list in alerts.items():
-        title = f"\n**__{period_label} < {threshold:.0%}:__**\n"
-        message_bundles = bundle_messages(alert_list, MAX_DISCORD_MESSAGE_LENGTH - len(title))
-
-        for bundle in message_bundles:
-            messages.append(title + bundle)
-
-    return messages
+# Returns a titled section of alert lines for each threshold of a period
+def compile_alert_threshold_sections(alerts, period_label):
+    return [Section(f"**__{period_label} < {threshold:.0%}:__**", alert_list) for threshold, alert_list in alerts.items()]
 
 
 # Compile alerts, mentions and any extra message into a single set of separate messages to be sent to Discord.
-# This attempts to push everything into as few messages as possible to not bomb Discord with excessive messages.
+# Everything is bundled in one pass into as few messages as possible to not bomb Discord with excessive messages.
+# Alert titles are repeated at the top of each message an alert group continues into.
 def compile_vo_threshold_messages(perf_data, extra_message=None, display_mentions=False, subscriptions=None, guild=None, allowed_user_ids=[]):
 
-    # Get alerts for different time periods
-    operator_ids_24h, alerts_24h = create_alerts_24h(perf_data)
-    operator_ids_30d, alerts_30d = create_alerts_30d(perf_data)
+    # Get alerts for all time periods
+    operator_ids, alerts = create_alerts(perf_data)
 
-    messages = []
+    sections = []
 
-    # Bundle up messages for same time periods into titled groups
-    messages.extend(compile_alert_threshold_groups(alerts_24h, "24h"))
-    messages.extend(compile_alert_threshold_groups(alerts_30d, "30d"))
+    # Group alert lines for same time periods and thresholds into titled sections
+    for period_label, period_alerts in alerts.items():
+        sections.extend(compile_alert_threshold_sections(period_alerts, period_label))
 
     # Add mentions to our messages
     if display_mentions and subscriptions and guild:
         # Unique list of operator IDs to find subscribed users
-        operator_ids = list(set(operator_ids_24h + operator_ids_30d))
+        operator_ids = list(set(operator_ids))
         mentions = create_subscriber_mentions(guild, subscriptions, operator_ids, 'alerts', allowed_user_ids)
-        messages.extend(mentions)
+        sections.append(Section(None, mentions, ' '))
 
     # Include an extra message, if configured
     if extra_message and len(extra_message) > 0:
-        messages.append(extra_message)
+        sections.append(Section(None, [extra_message]))
 
-    # Rebundle everything up again to reduce down to the fewest messages to post to Discord
-    bundles = bundle_messages(messages)
-
-    return(bundles)
+    return bundle_sections(sections)
 
 
 async def send_vo_threshold_messages(channel, perf_data, extra_message=None, subscriptions=None, allowed_user_ids=[]):
@@ -280,8 +227,13 @@ def get_latest_performance(period, operator, attribute):
         return f"- {period}: {period} performance data is not available\n"
 
 
-# Create a performance message for a single operator
+# Create a performance message for a single operator, rendered once per operator and
+# snapshot by RENDER_CACHE
 def create_daily_operator_message(operator):
+    return RENDER_CACHE.render(TEMPLATE_DAILY, operator)
+
+
+def render_daily_operator_message(operator):
     message = f"\n**__{operator[FIELD_OPERATOR_NAME]} (ID: {operator[FIELD_OPERATOR_ID]}, Validators: {operator[FIELD_VALIDATOR_COUNT]}):__**\n"
 
     message += get_latest_performance("24h", operator, FIELD_PERF_DATA_24H)
@@ -290,6 +242,10 @@ def create_daily_operator_message(operator):
     return message
 
 
+RENDER_CACHE.register(TEMPLATE_OPERATOR, render_operator_performance_message)
+RENDER_CACHE.register(TEMPLATE_DAILY, render_daily_operator_message)
+
+
 # Create a dict of daily performance messages to send to Discord users
 # Loops through subscriptions for each operator ID and appends the
 # operator performance data to a dict of messages to go to each user
@@ -315,40 +271,44 @@ def compile_daily_operator_messages(perf_data, subscriptions):
     return user_messages
 
 
-# Gets dict of all messages going out to all users and sends them,
-# breaking messages into chunks less than maximum message length for Discord.
+# Gets dict of all messages going out to all users and sends them, packing each user's
+# messages into as few direct messages as fit the maximum message length for Discord. Users are messaged
+# concurrently by a DirectMessageDispatcher. Returns the dispatcher run stats.
 async def send_daily_direct_messages(bot, perf_data, subscriptions, allowed_user_ids=[]):
     user_messages = compile_daily_operator_messages(perf_data, subscriptions)
 
-    # Send out the compiled messages to each user
+    # For QA purposes, skip user IDs not in allow list
+    user_bundles = {}
     for user, messages in user_messages.items():
-        try:
-            member = await bot.fetch_user(user)
-        except Exception as e:
-            logging.error(f"Unable to fetch user {user} in send_daily_direct_messages(): {e}", exc_info=True)
+        if allowed_user_ids and int(user) not in allowed_user_ids:
             continue
+        bundles = [bundle.strip() for bundle in bundle_messages(messages, first_fit=True) if bundle.strip()]
+        if bundles:
+            user_bundles[user] = bundles
 
-        if member:
-            if allowed_user_ids and member.id not in allowed_user_ids:
-                continue
-
-            bundles = bundle_messages(messages)
-            for bundle in bundles:
-                message = bundle.strip()
-                if message:
-                    try:
-                        await member.send(bundle.strip())
-                    except Exception as e:
-                        logging.error(f"Failed sending daily operator performance direct message to {user}: {e}", exc_info=True)
+    stats = await DirectMessageDispatcher(bot).send(user_bundles)
+    logging.info(f"Daily direct messages: {stats['sent']} users sent {stats['messages']} messages, "
+                 f"{stats['failed']} failed, {stats['skipped']} skipped, {stats['retries']} retries "
+                 f"({stats['rate_limited']} rate limited) in {stats['elapsed']:.1f}s")
+    logging.info(f"User lookups: {USER_RESOLVER.stats}")
+    return stats
 
 
 # Attempts to send a direct message to a user.
 # Used to notify users of problems sending direct messages to them.
+# Users cached as unreachable are always retried, and cleared from that cache if the
+# message goes through, so reopening DMs takes effect at the next subscribe.
 async def send_direct_message_test(bot, user_id, message):
     try:
-        member = await bot.fetch_user(user_id)
+        member = await USER_RESOLVER.fetch_user(bot, user_id, bypass_missing=True)
+        if member is None:
+            logging.error(f"Failed to send direct message test to {user_id}: user not found")
+            return False
         await member.send(message.strip())
+        USER_RESOLVER.clear_missing(user_id)
         return True
     except Exception as e:
+        if isinstance(e, discord.Forbidden):
+            USER_RESOLVER.mark_missing(user_id)
         logging.error(f"Failed to send direct message test to {user_id}: {e}", exc_info=True)
         return False
\ No newline at end of file
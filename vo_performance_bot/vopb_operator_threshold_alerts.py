@@ -1,72 +1,59 @@
 import logging
+from bisect import bisect_right
+from typing import NamedTuple, Tuple
 from common.config import *
 
 
-# Looks for the most recent 24h data point and returns operator details if that data point violates the threshold
-def operator_threshold_alert_24h(operator, threshold):
-
-    try:
-        # If we have no data points, then there are no alerts
-        if FIELD_PERF_DATA_24H not in operator or not operator[FIELD_PERF_DATA_24H]:
-            return None
-
-        # Get the most recent data point for which we have data points for this operator
-        most_recent_date = max(operator[FIELD_PERF_DATA_24H])
-        data_point = operator[FIELD_PERF_DATA_24H][most_recent_date]
-
-        try:
-            if data_point is not None:
-                data_point = float(data_point)
-            else:
-                return None
-        except (ValueError, TypeError) as e:
-            logging.warning(f"Error converting 24h data point to float for operator {operator[FIELD_OPERATOR_ID]} and date {most_recent_date}: {e}", exc_info=True)
-            return None
-
-        if data_point < threshold:
-            return {
-                FIELD_OPERATOR_ID: operator[FIELD_OPERATOR_ID],
-                FIELD_OPERATOR_NAME: operator[FIELD_OPERATOR_NAME],
-                FIELD_VALIDATOR_COUNT: operator[FIELD_VALIDATOR_COUNT],
-                'Performance Period': most_recent_date,
-                'Performance Data Point': f"{data_point * 100:.2f}%"  # Convert back to percentage string for display
-            }
-    except Exception as e:
-        logging.error(f"Unexpected error in vo_24h_threshold_alerts(): {e}", exc_info=True)
-
-    return None
-
-
-# Looks for the most recent 30d data point and returns operator details if that data point violates the threshold
-def operator_threshold_alert_30d(operator, threshold):
-
-    try:
-        # If we have no data points, then there are no alerts
-        if FIELD_PERF_DATA_30D not in operator or not operator[FIELD_PERF_DATA_30D]:
-            return None
-
-        # Get the most recent data point for which we have data points for this operator
-        most_recent_date = max(operator[FIELD_PERF_DATA_30D])
-        data_point = operator[FIELD_PERF_DATA_30D][most_recent_date]
-
-        try:
-            if data_point is not None:
+# An operator whose most recent data point for a period is below one or more of the
+# period's thresholds
+class ThresholdAlert(NamedTuple):
+    operator_id: int
+    name: str
+    validator_count: int
+    period: str
+    date: str
+    value: float
+    thresholds: Tuple[float, ...]
+
+
+# Checks every Verified Operator with validators against the thresholds of each
+# period in periods (see ALERTS_PERIODS) in one pass. The most recent data point of
+# each period is found once per operator, and the thresholds it is below are found
+# with a binary search over the sorted thresholds. Returns a dict of period labels to
+# lists of ThresholdAlert, in perf_data order.
+def evaluate_threshold_alerts(perf_data, periods=ALERTS_PERIODS):
+    checks = [(label, field, sorted(thresholds)) for label, (field, thresholds) in periods.items()]
+    alerts = {label: [] for label in periods}
+
+    for operator in perf_data.values():
+        if not operator.get(FIELD_IS_VO):
+            continue
+
+        validator_count = operator.get(FIELD_VALIDATOR_COUNT)
+        if validator_count is None or int(validator_count) <= 0:
+            continue
+
+        for label, field, thresholds in checks:
+            data_points = operator.get(field)
+
+            # If we have no data points, then there are no alerts
+            if not data_points:
+                continue
+
+            most_recent_date = max(data_points)
+            data_point = data_points[most_recent_date]
+            if data_point is None:
+                continue
+
+            try:
                 data_point = float(data_point)
-            else:
-                return None
-        except (ValueError, TypeError) as e:
-            logging.warning(f"Error converting 30d data point to float for operator {operator[FIELD_OPERATOR_ID]} and date {most_recent_date}: {e}", exc_info=True)
-            return None
+            except (ValueError, TypeError) as e:
+                logging.warning(f"Error converting {label} data point to float for operator {operator[FIELD_OPERATOR_ID]} and date {most_recent_date}: {e}", exc_info=True)
+                continue
 
-        if data_point < threshold:
-            return {
-                FIELD_OPERATOR_ID: operator[FIELD_OPERATOR_ID],
-                FIELD_OPERATOR_NAME: operator[FIELD_OPERATOR_NAME],
-                FIELD_VALIDATOR_COUNT: operator[FIELD_VALIDATOR_COUNT],
-                'Performance Period': f"30d",
-                'Performance Data Point': f"{data_point * 100:.2f}%"
-            }
-    except Exception as e:
-        logging.error(f"Unexpected error in vo_30d_threshold_alerts(): {e}", exc_info=True)
+            breached = thresholds[bisect_right(thresholds, data_point):]
+            if breached:
+                alerts[label].append(ThresholdAlert(operator[FIELD_OPERATOR_ID], operator[FIELD_OPERATOR_NAME], validator_count,
+                                                    label, most_recent_date, data_point, tuple(breached)))
 
-    return None
+    return alerts
\ No newline at end of file
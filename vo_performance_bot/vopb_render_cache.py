@@ -0,0 +1,87 @@
+import time
+import logging
+import threading
+from datetime import date
+from common.config import RENDER_CACHE_MAX_SIZE, FIELD_OPERATOR_ID
+
+
+# Keeps rendered operator messages in memory so that repeated /operator queries and
+# daily direct messages are dictionary lookups. Templates are registered by name with
+# their render function. Entries are keyed by operator ID and template, and are only
+# served for the operator data object they were rendered from, and on the day they
+# were rendered, since the /operator history window moves with the current date.
+# Snapshot rows are not changed once loaded, so the row object stands in for the
+# snapshot version and a hit costs one identity check; rows read from anywhere else
+# are rendered again.
+#
+# CachedStorage calls prime() with every newly loaded snapshot, so messages for all
+# operators are rendered in the background before they are asked for. The cache is
+# shared by the bot's commands and loops through RENDER_CACHE.
+class RenderCache:
+
+    def __init__(self, max_size=RENDER_CACHE_MAX_SIZE):
+        self.max_size = max(1, max_size)
+
+        self._templates = {}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'primed': 0}
+
+
+    def register(self, template, render):
+        self._templates[template] = render
+
+
+    # Returns the message rendered by the template for operator_data
+    def render(self, template, operator_data):
+        key = (operator_data.get(FIELD_OPERATOR_ID), template)
+        today = date.today()
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == today and entry[1] is operator_data:
+            with self._lock:
+                self.stats['hits'] += 1
+            return entry[2]
+
+        message = self._templates[template](operator_data)
+        with self._lock:
+            self.stats['misses'] += 1
+        self._store({key: (today, operator_data, message)})
+        return message
+
+
+    # Renders every registered template for every operator in perf_data
+    def prime(self, perf_data):
+        start = time.monotonic()
+        today = date.today()
+        entries = {}
+
+        for operator_data in perf_data.values():
+            op_id = operator_data.get(FIELD_OPERATOR_ID)
+            for template, render in self._templates.items():
+                try:
+                    entries[(op_id, template)] = (today, operator_data, render(operator_data))
+                except Exception as e:
+                    logging.error(f"Failed to render {template} message for operator {op_id}: {e}", exc_info=True)
+
+        self._store(entries)
+        with self._lock:
+            self.stats['primed'] += len(entries)
+        logging.info(f"Rendered {len(entries)} operator messages in {time.monotonic() - start:.2f}s")
+
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+
+
+    # Each snapshot replaces the entries of the one before it, so a full cache is
+    # emptied rather than evicted entry by entry
+    def _store(self, entries):
+        with self._lock:
+            if len(self._entries) + len(entries) > self.max_size:
+                self._entries = {}
+            self._entries.update(entries)
+
+
+RENDER_CACHE = RenderCache()
\ No newline at end of file
@@ -1,8 +1,15 @@
 
+from storage.storage_subscription_index import SubscriptionIndex
+
+
 # Returns list of operator IDs to which the provided user ID is subscribed
 # Used primarily to determine which operators to send daily DMs for
 def get_user_subscriptions_by_type(subscriptions, user_id, sub_type):
 
+    # Storage returns indexed subscriptions, so look up the user directly
+    if isinstance(subscriptions, SubscriptionIndex):
+        return subscriptions.user_operator_ids(user_id, sub_type)
+
     subscribed_operator_ids = []
 
     # Find all operator IDs to which the user ID is subscribed
@@ -17,6 +24,9 @@ def get_user_subscriptions_by_type(subscriptions, user_id, sub_type):
 # Used to find list of users to tag in alerts message based on all operators for which there are alerts
 def get_operator_subscriptions_by_type(subscriptions, operator_ids, sub_type):
 
+    if isinstance(subscriptions, SubscriptionIndex):
+        return subscriptions.operator_user_ids(operator_ids, sub_type)
+
     operator_ids = list(set(operator_ids))
     subscribed_user_ids = []
 
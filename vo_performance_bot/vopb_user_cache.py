@@ -0,0 +1,128 @@
+import time
+from collections import OrderedDict
+import discord
+from common.config import USER_CACHE_MAX_SIZE, USER_CACHE_TTL, USER_CACHE_NEGATIVE_TTL
+
+
+# Resolves Discord user IDs to users, and to guild members for @mentions, with as few
+# REST calls as possible. User lookups try the gateway cache first (bot.get_user),
+# then an LRU cache of earlier REST results with a TTL, and only then REST
+# (bot.fetch_user). Users that do not exist or cannot be sent direct messages are
+# cached as missing for USER_CACHE_NEGATIVE_TTL seconds. Member lookups only use the
+# gateway cache, which costs no API calls, so they are not cached here.
+#
+# The cache is shared by the bot's commands and loops through USER_RESOLVER. All
+# calls are made from the event loop thread.
+class UserResolver:
+
+    def __init__(self, max_size=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL, negative_ttl=USER_CACHE_NEGATIVE_TTL):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self._users = OrderedDict()
+        self._missing = {}
+        self.stats = {'gateway': 0, 'cached': 0, 'rest': 0, 'missing': 0}
+
+
+    # Returns the user for user_id, or None if the user does not exist or is cached as
+    # unreachable. With bypass_missing, a user cached as unreachable is looked up again.
+    # Errors other than an unknown user (e.g. rate limits) are raised, not cached.
+    async def fetch_user(self, bot, user_id, bypass_missing=False):
+        user_id = int(user_id)
+
+        if not bypass_missing and self._is_missing(('user', user_id)):
+            self.stats['missing'] += 1
+            return None
+
+        user = bot.get_user(user_id)
+        if user is not None:
+            self.stats['gateway'] += 1
+            return user
+
+        user = self._get(self._users, user_id)
+        if user is not None:
+            self.stats['cached'] += 1
+            return user
+
+        self.stats['rest'] += 1
+        try:
+            user = await bot.fetch_user(user_id)
+        except discord.NotFound:
+            self.mark_missing(user_id)
+            return None
+
+        self._put(self._users, user_id, user)
+        self._missing.pop(('user', user_id), None)
+        return user
+
+
+    # Returns the guild member for user_id from the gateway cache, or None if the user
+    # is not a member. The gateway keeps the cache current, so members who join later
+    # are found by the next lookup.
+    def get_member(self, guild, user_id):
+        member = guild.get_member(int(user_id))
+        if member is not None:
+            self.stats['gateway'] += 1
+        return member
+
+
+    # Caches a user as unreachable, e.g. after a direct message was refused
+    def mark_missing(self, user_id):
+        self._add_missing(('user', int(user_id)))
+        self._users.pop(int(user_id), None)
+
+
+    # Removes a user from the unreachable cache, e.g. after a direct message succeeded
+    def clear_missing(self, user_id):
+        self._missing.pop(('user', int(user_id)), None)
+
+
+    def clear(self):
+        self._users.clear()
+        self._missing.clear()
+
+
+    def _is_missing(self, key):
+        expires = self._missing.get(key)
+        if expires is None:
+            return False
+        if expires <= time.monotonic():
+            del self._missing[key]
+            return False
+        return True
+
+
+    def _get(self, cache, key):
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= time.monotonic():
+            del cache[key]
+            return None
+        cache.move_to_end(key)
+        return value
+
+
+    def _put(self, cache, key, value):
+        cache[key] = (time.monotonic() + self.ttl, value)
+        cache.move_to_end(key)
+        while len(cache) > self.max_size:
+            cache.popitem(last=False)
+
+
+    # Expired entries are dropped once the negative cache is full, and the entries
+    # closest to expiry if it is still full
+    def _add_missing(self, key):
+        self._missing[key] = time.monotonic() + self.negative_ttl
+
+        if len(self._missing) > self.max_size:
+            now = time.monotonic()
+            for missing_key in [k for k, expires in self._missing.items() if expires <= now]:
+                del self._missing[missing_key]
+            for missing_key in sorted(self._missing, key=self._missing.get)[:len(self._missing) - self.max_size]:
+                del self._missing[missing_key]
+
+
+USER_RESOLVER = UserResolver()
\ No newline at end of file